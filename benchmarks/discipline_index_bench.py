@@ -0,0 +1,94 @@
+"""
+学科检索基准：比较 DisciplineIndex（NumPy 精确检索）与 Chroma（discipline_cm_db, HNSW）、
+Milvus Lite（discipline.db, FLAT）三条路径在 1 / 100 / 10k 个查询下的耗时。
+查询向量为随机向量，不调用 embedding 接口；Chroma / Milvus 未安装或库文件不存在时跳过对应路径。
+
+用法：python benchmarks/discipline_index_bench.py [--top-k 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+
+CHROMA_PATH = "./discipline_cm_db"
+MILVUS_URI = "./discipline.db"
+COLLECTION_NAME = "discipline_embeddings"
+QUERY_COUNTS = [1, 100, 10_000]
+
+
+def _timeit(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _load_index():
+    try:
+        return DisciplineIndex.from_chroma(CHROMA_PATH, COLLECTION_NAME), "chroma export"
+    except Exception as e:
+        print(f"[warn] cannot export {CHROMA_PATH} ({e}); using 500 random 1024-d disciplines")
+        rng = np.random.default_rng(0)
+        return DisciplineIndex([f"d{i}" for i in range(500)], rng.standard_normal((500, 1024))), "synthetic"
+
+
+def _chroma_runner():
+    try:
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=CHROMA_PATH).get_collection(COLLECTION_NAME)
+        return lambda queries, k: collection.query(query_embeddings=queries.tolist(), n_results=k)
+    except Exception as e:
+        print(f"[skip] chroma: {e}")
+        return None
+
+
+def _milvus_runner():
+    try:
+        from pymilvus import MilvusClient
+
+        client = MilvusClient(MILVUS_URI)
+        client.load_collection(COLLECTION_NAME)
+        return lambda queries, k: client.search(
+            COLLECTION_NAME, data=queries.tolist(), limit=k, output_fields=["discipline_name"],
+            search_params={"metric_type": "COSINE"},
+        )
+    except Exception as e:
+        print(f"[skip] milvus: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index, source = _load_index()
+    print(f"DisciplineIndex: {len(index)} disciplines x {index.matrix.shape[1]} dims ({source})")
+    runners = {
+        "numpy": lambda queries, k: index.search(queries, k),
+        "chroma": _chroma_runner(),
+        "milvus": _milvus_runner(),
+    }
+    rng = np.random.default_rng(42)
+    print(f"{'queries':>8} " + " ".join(f"{name:>12}" for name in runners))
+    for n in QUERY_COUNTS:
+        queries = rng.standard_normal((n, index.matrix.shape[1])).astype(np.float32)
+        cells = []
+        for name, run in runners.items():
+            if run is None:
+                cells.append(f"{'-':>12}")
+                continue
+            cells.append(f"{_timeit(lambda: run(queries, args.top_k)) * 1000:>10.2f}ms")
+        print(f"{n:>8} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
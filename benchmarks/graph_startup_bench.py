@@ -0,0 +1,73 @@
+"""
+图启动基准：比较每份申请书新建 ProposalAgentGraph（重建 LLM 客户端、memory、工具节点并重新编译主图与辩论子图）
+与通过 factory.get_proposal_graph 复用已编译图时，处理一份新申请书前的准备耗时。
+不调用任何模型接口；传入 --pdf 时额外测量首次运行到第一个状态更新（intention_node 完成）的延迟。
+
+用法：python benchmarks/graph_startup_bench.py [--repeat 5] [--pdf proposal.pdf]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_start = time.perf_counter()
+from proposalAgent.graphs.factory import clear_graph_cache, get_proposal_graph
+from proposalAgent.graphs.propagation import Propagator
+from proposalAgent.graphs.proposal_graph import ProposalAgentGraph
+from proposalAgent.model_config import TONGYI_CONFIG
+
+IMPORT_TIME = time.perf_counter() - _start
+
+
+def _timings(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(name, timings):
+    print(f"{name:<40} median {statistics.median(timings) * 1000:10.2f} ms   max {max(timings) * 1000:10.2f} ms")
+
+
+async def _first_update_latency(graph, propagator, pdf):
+    args = propagator.get_graph_args(f"bench-{time.time_ns()}")
+    state = propagator.create_initial_state("请对这份科研项目申请书进行全面评审", [], pdf)
+    start = time.perf_counter()
+    async for _ in graph.graph.astream(state, **args):
+        return time.perf_counter() - start
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--pdf", default=None, help="optional proposal PDF for the first-run latency (calls the LLM)")
+    args = parser.parse_args()
+    config = TONGYI_CONFIG
+    propagator = Propagator(config.get("max_recur_limit", 100))
+
+    print(f"{'import proposalAgent.graphs':<40} {IMPORT_TIME * 1000:17.2f} ms")
+    clear_graph_cache()
+    _report("factory, first call (cold build)", _timings(lambda: get_proposal_graph(config), 1))
+    _report("ProposalAgentGraph() per proposal", _timings(lambda: ProposalAgentGraph(config=config), args.repeat))
+    _report("factory, cached", _timings(lambda: get_proposal_graph(config), args.repeat))
+    _report(
+        "cached graph + create_initial_state",
+        _timings(lambda: (get_proposal_graph(config), propagator.create_initial_state("评审", [], "proposal.pdf")), args.repeat),
+    )
+
+    if args.pdf:
+        graph = get_proposal_graph(config)
+        latency = asyncio.run(_first_update_latency(graph, propagator, args.pdf))
+        print(f"{'first run, time to first update':<40} {latency * 1000:17.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+新闻解析基准：在 benchmarks/fixtures 下保存的 Google News 搜索结果页上，比较
+- baseline：原 getNewsData 的做法（BeautifulSoup html.parser + 每条结果 5 次 select_one）；
+- bs4：news_parser 的 BeautifulSoup 回退路径（含规范化）；
+- lxml：news_parser 的 lxml + 预编译选择器路径（含规范化），
+的每秒解析页数，并给出 NearDuplicateFilter 在这些页上的过滤结果与吞吐。
+
+用法：python benchmarks/news_parse_bench.py [--repeat 20]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from proposalAgent.tools import news_parser
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def baseline_parse(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    news_results = []
+    for el in soup.select("div.SoaBEf"):
+        try:
+            news_results.append(
+                {
+                    "link": el.find("a")["href"],
+                    "title": el.select_one("div.MBeuO").get_text(),
+                    "snippet": el.select_one(".GI74Re").get_text(),
+                    "date": el.select_one(".LfVVr").get_text(),
+                    "source": el.select_one(".NUnG9d span").get_text(),
+                }
+            )
+        except Exception:
+            continue
+    return news_results, soup.find("a", id="pnnext") is not None
+
+
+def _pages_per_second(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "google_news_*.html"))):
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    print(f"{len(pages)} fixture pages, {sum(map(len, pages)) / 1024:.0f} KiB total")
+
+    parsers = {"baseline": baseline_parse, "bs4": news_parser.parse_news_page_bs4}
+    if news_parser.lxml_html is not None:
+        parsers["lxml"] = news_parser.parse_news_page_lxml
+    else:
+        print("[skip] lxml: lxml / cssselect not installed")
+    for name, parse in parsers.items():
+        counts = [len(parse(page)[0]) for page in pages]
+        print(f"{name:>10}: {_pages_per_second(parse, pages, args.repeat):>8.1f} pages/s  results per page {counts}")
+
+    items = [item for page in pages for item in news_parser.parse_news_page(page)[0]]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        kept = news_parser.NearDuplicateFilter().filter(items)
+    elapsed = (time.perf_counter() - start) / args.repeat
+    print(f"     dedup: {len(items)} -> {len(kept)} items, {len(items) / elapsed:>8.0f} items/s")
+    for item in items:
+        if item not in kept:
+            print(f"            dropped: [{item['source']}] {item['title']}")
+
+
+if __name__ == "__main__":
+    main()
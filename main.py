@@ -0,0 +1,227 @@
+"""
+申请书批量评审入口。
+
+- 输入为 PDF 目录，或 manifest 文件（jsonl：每行 {"path": ..., "id": ..., "prompt": ..., "interest": [...]}，
+  也可以是每行一个路径的纯文本）；
+- 每个进程只构建一次图（factory.get_proposal_graph），LLM 客户端、响应缓存、限流器和 memory 由该进程内的所有申请书共享，
+  同一事件循环中最多 --concurrency 份申请书同时运行；--workers > 1 时按申请书切分到多个进程；
+- 每份申请书有独立的初始状态、checkpoint thread_id 和日志 trace_id（= 申请书 id），日志可以按 trace_id 过滤；
+- 每完成一份就向 --output 追加一行 JSON，批次中断后已完成的结果仍然可用；
+- checkpoint thread_id 由 PDF 哈希和任务 id、提示词、侧重点共同决定。--resume 时跳过输出中已完成的申请书，
+  未完成的从各自的 checkpoint 继续；不加 --resume 时丢弃同一 thread 的旧 checkpoint，总是重新评审；
+- 结束时输出吞吐（份/小时）与每份申请书的平均 token 数。
+
+用法：python main.py ./proposals --output results/batch.jsonl --concurrency 4 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from proposalAgent.agents.stage1.structure import discard_pending_structure
+from proposalAgent.graphs.factory import get_proposal_graph
+from proposalAgent.graphs.propagation import Propagator
+from proposalAgent.graphs.proposal_graph import ProposalAgentGraph
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.file_rag import release_proposal_index
+from proposalAgent.utils.logger import get_logger, set_logging_context
+
+logger = get_logger("batch")
+
+DEFAULT_PROMPT = "请对这份科研项目申请书进行全面评审"
+
+
+def load_jobs(source: str, default_prompt: str = DEFAULT_PROMPT, default_interest: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """读取 PDF 目录或 manifest，返回 [{"id", "path", "prompt", "interest"}]。"""
+    default_interest = default_interest or []
+    path = pathlib.Path(source)
+    if path.is_dir():
+        entries = [{"path": str(pdf)} for pdf in sorted(path.rglob("*.pdf"))]
+    else:
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                entries.append(json.loads(line) if line.startswith("{") else {"path": line})
+    jobs = []
+    for entry in entries:
+        jobs.append({
+            "id": entry.get("id") or pathlib.Path(entry["path"]).stem,
+            "path": entry["path"],
+            "prompt": entry.get("prompt") or default_prompt,
+            "interest": entry.get("interest") or default_interest,
+        })
+    return jobs
+
+
+def completed_ids(output: str) -> set:
+    if not os.path.exists(output):
+        return set()
+    done = set()
+    with open(output, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "done":
+                done.add(record["id"])
+    return done
+
+
+def append_result(output: str, record: Dict[str, Any]):
+    """每条结果一次 write 追加到文件末尾（O_APPEND），多个工作进程可以同时写同一个输出文件。"""
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _total_tokens(usage: Dict[str, Any]) -> int:
+    return sum(int(item.get("total_tokens", 0) or 0) for item in usage.values())
+
+
+async def run_proposal(
+    graph: ProposalAgentGraph, propagator: Propagator, job: Dict[str, Any], batch_id: str, resume: bool = False
+) -> Dict[str, Any]:
+    """
+    运行单份申请书。图在人工评审前暂停时记为 awaiting_review，之后可用同一个 thread_id 继续。
+    resume 为 False 时先删除该 thread 已有的 checkpoint，不会把上一次运行的结果当作本次结果返回。
+    """
+    # 在任务内部设置，contextvars 只影响当前任务，各申请书的日志互不串扰
+    set_logging_context(trace_id=job["id"], parent_span_id=batch_id, sw_ctx="batch")
+    started = time.perf_counter()
+    usage = UsageMetadataCallbackHandler()
+    thread_id = None
+    record: Dict[str, Any] = {"id": job["id"], "path": job["path"], "thread_id": None}
+    try:
+        # 计算 thread_id 要读取并哈希整份 PDF：放到线程中，文件缺失或不可读时记为这份申请书失败，不影响批次中的其他申请书
+        thread_id = await asyncio.to_thread(propagator.thread_id_for, job["path"], job["id"], job["prompt"], job["interest"])
+        record["thread_id"] = thread_id
+        args = propagator.get_graph_args(thread_id)
+        args["config"]["callbacks"] = [usage]
+        if not resume:
+            await graph.checkpointer.adelete_thread(thread_id)
+        snapshot = await graph.graph.aget_state(args["config"])
+        if snapshot.values and not snapshot.next:
+            # 之前已经跑完（例如输出文件丢失），直接取回结果
+            final_state = snapshot.values
+        elif snapshot.next:
+            logger.info(f"resuming {job['id']} from checkpoint before {list(snapshot.next)}")
+            final_state = await graph.graph.ainvoke(None, **args) if "human_review_node" not in snapshot.next else snapshot.values
+        else:
+            initial_state = propagator.create_initial_state(job["prompt"], job["interest"], job["path"])
+            final_state = await graph.graph.ainvoke(initial_state, **args)
+        snapshot = await graph.graph.aget_state(args["config"])
+        record["status"] = "awaiting_review" if "human_review_node" in (snapshot.next or ()) else "done"
+        record["final_report"] = final_state.get("final_report")
+    except Exception as e:
+        logger.exception(f"proposal {job['id']} failed: {e}")
+        record["status"] = "failed"
+        record["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        # 流式结构抽取在 structure_finalize_node 之前失败时，后台任务不能留在模块级字典里
+        if thread_id is not None:
+            discard_pending_structure(thread_id, job["path"])
+    record["elapsed"] = round(time.perf_counter() - started, 2)
+    record["usage"] = usage.usage_metadata
+    record["tokens"] = _total_tokens(usage.usage_metadata)
+    logger.info(f"proposal {job['id']} {record['status']} in {record['elapsed']}s, {record['tokens']} tokens")
+    return record
+
+
+async def run_batch(
+    jobs: List[Dict[str, Any]], output: str, concurrency: int, batch_id: str, resume: bool = False, config: Optional[dict] = None
+) -> List[Dict[str, Any]]:
+    """在当前事件循环中运行一批申请书，共享同一个图实例，最多 concurrency 份同时进行。"""
+    config = config or TONGYI_CONFIG
+    graph = get_proposal_graph(config)
+    propagator = Propagator(config.get("max_recur_limit", 100))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(job):
+        async with semaphore:
+            record = await run_proposal(graph, propagator, job, batch_id, resume)
+        # 申请书片段索引只对当前申请书有用，跑完即释放，长批次的内存不随申请书数量增长
+        try:
+            release_proposal_index(job["path"])
+        except Exception as e:
+            logger.warning(f"failed to release the proposal index of {job['id']}: {e}")
+        append_result(output, record)
+        return record
+
+    records = list(await asyncio.gather(*[worker(job) for job in jobs]))
+    logger.info(f"rate limits: {json.dumps(graph.rate_limit_stats(), ensure_ascii=False, default=str)}")
+    logger.info(f"llm cache: {json.dumps(graph.llm_cache_stats(), ensure_ascii=False, default=str)}")
+    return records
+
+
+def _run_shard(jobs: List[Dict[str, Any]], output: str, concurrency: int, batch_id: str, resume: bool) -> List[Dict[str, Any]]:
+    # 工作进程入口：每个进程一个事件循环、一个图实例
+    return asyncio.run(run_batch(jobs, output, concurrency, batch_id, resume))
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    done = [record for record in records if record["status"] == "done"]
+    tokens = [record["tokens"] for record in records if record.get("tokens")]
+    return {
+        "proposals": len(records),
+        "done": len(done),
+        "awaiting_review": sum(record["status"] == "awaiting_review" for record in records),
+        "failed": sum(record["status"] == "failed" for record in records),
+        "wall_time_s": round(wall_time, 1),
+        "proposals_per_hour": round(len(done) / wall_time * 3600, 2) if wall_time > 0 else 0.0,
+        "tokens_per_proposal": round(sum(tokens) / len(tokens)) if tokens else 0,
+        "mean_latency_s": round(sum(record["elapsed"] for record in records) / len(records), 1) if records else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch proposal review")
+    parser.add_argument("source", help="directory of PDFs or a manifest (jsonl or one path per line)")
+    parser.add_argument("--output", default=os.path.join(TONGYI_CONFIG["results_dir"], "batch.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=4, help="proposals running concurrently per process")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--interest", nargs="*", default=[])
+    parser.add_argument("--resume", action="store_true", help="skip proposals already marked done in --output and continue unfinished ones from their checkpoints")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.source, args.prompt, args.interest)
+    duplicated = [job_id for job_id, count in Counter(job["id"] for job in jobs).items() if count > 1]
+    if duplicated:
+        parser.error(f"duplicated proposal ids: {sorted(duplicated)}")
+    if args.resume:
+        done = completed_ids(args.output)
+        jobs = [job for job in jobs if job["id"] not in done]
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    batch_id = f"batch-{int(time.time())}"
+    logger.info(f"{batch_id}: {len(jobs)} proposals, {args.workers} worker(s) x {args.concurrency} concurrent")
+
+    started = time.perf_counter()
+    if args.workers <= 1 or len(jobs) <= 1:
+        records = _run_shard(jobs, args.output, args.concurrency, batch_id, args.resume)
+    else:
+        # 轮流分配，各进程拿到的长短申请书大致均衡
+        shards = [jobs[i::args.workers] for i in range(args.workers)]
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(_run_shard, shard, args.output, args.concurrency, batch_id, args.resume) for shard in shards if shard]
+            records = [record for future in futures for record in future.result()]
+
+    summary = summarize(records, time.perf_counter() - started)
+    logger.info(f"{batch_id} finished: {json.dumps(summary, ensure_ascii=False)}")
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
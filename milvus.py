@@ -46,61 +46,12 @@ async def get_emb(s:str) -> List[float]:
 
 
 import json
-from pymilvus import MilvusClient, connections, Collection, FieldSchema, CollectionSchema, DataType, utility
+from proposalAgent.tools.feasibility_analysis.build_discipline_index import build_index
 
 async def main():
     json_file_path = "/Users/peelsannaw/Desktop/disciplines.json"
-
-    with open(json_file_path, "r", encoding='utf-8') as f:
-        data = json.load(f)
-
-    seconds = []
-
-    for first_level_dict in data:
-        for second_level_list in first_level_dict.values():
-            for second_level_dict in second_level_list:
-                for second_level_key in second_level_dict.keys():
-                    seconds.append(second_level_key)
-
-    # connections.connect("./discipline.db")
-    client = MilvusClient("./discipline.db")
-    dim = 1024  # Vector dimension
-    fields = [
-        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-        FieldSchema(name="discipline_name", dtype=DataType.VARCHAR, max_length=50),
-        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim)
-    ]
-    schema = CollectionSchema(fields=fields, description="discipline embeddings")
-    index = client.prepare_index_params()
-    collection_name = "discipline_embeddings"
-    
-    index_params = {
-        "metric_type": "COSINE",
-        "index_type": "FLAT",
-        "params": {}
-    }
-    
-    index.add_index(field_name="embedding", index_params=index_params)
-    client.create_collection(collection_name, dimension=dim, schema=schema,index_params=index)
-    semaphore = asyncio.Semaphore(5)
-    
-    async def get_emb_with_semaphore(discipline: str) -> List[float]:
-        async with semaphore:
-            return await get_emb(discipline)
-    
-    tasks = [get_emb_with_semaphore(discipline) for discipline in seconds]
-    embeddings = await asyncio.gather(*tasks)
-    
-    names = seconds
-
-    data = [
-       {"discipline_name": name, "embedding": emb} for name, emb in zip(names, embeddings)
-    ]
-    
-    client.insert(collection_name, data)
-    client.flush(collection_name=collection_name)
-    print(client.list_collections())
-    print("flush done")
+    # 批量请求 + checkpoint 的增量构建，只写入新增 / 删除的学科
+    await build_index(json_file_path, backends=["milvus"])
 
 if __name__ == "__main__":
     asyncio.run(main())
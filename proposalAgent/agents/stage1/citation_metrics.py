@@ -0,0 +1,71 @@
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.agents.utils.agent_states import AgentState
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.structure_util import parse_proposal_output
+from typing import List
+import json
+import re
+
+logger = get_logger("citation_metrics_node")
+
+TEAM_MEMBERS_PROMPT = """
+    ### 任务描述
+    下面是一份国家自然基金项目申请书中申请人与项目团队成员的信息。
+    请列出申请人和所有团队成员的姓名，申请人排在第一位；如果信息中给出了 Google Scholar 主页链接，用链接代替姓名。
+    只输出一个 JSON 字符串数组，例如 ["张三", "李四"]，不要输出其他内容。
+    ### 申请人与团队信息
+    {team_info}
+    """
+
+_JSON_ARRAY = re.compile(r"\[.*\]", re.S)
+
+
+def parse_team_members(text: str) -> List[str]:
+    """从模型输出中取出 JSON 数组形式的成员列表，去重并保持顺序；无法解析时返回空列表。"""
+    match = _JSON_ARRAY.search(text or "")
+    if match is None:
+        return []
+    try:
+        members = json.loads(match.group(0))
+    except ValueError:
+        return []
+    return list(dict.fromkeys(str(member).strip() for member in members if str(member).strip()))
+
+
+def create_citation_metrics_node(llm, config=None):
+    """
+    学术分析前的准备节点：从 research_structure 的申请人 / 团队部分取出成员名单，
+    用 abuild_team_citation_metrics 一次性构建团队引文图，把 CitationMetrics.to_dict() 写入 citation_metrics，
+    学术分析师直接读取这份指标，而不是逐个成员、逐篇论文地调用检索工具。
+    每份申请书只计算一次：状态中已有 citation_metrics（包括失败时记录的 error）时直接跳过。
+    """
+    config = config or TONGYI_CONFIG
+    max_members = config.get("citation_metrics_max_members", 8)
+    max_papers = config.get("citation_metrics_max_papers", 5)
+    max_cited_by = config.get("citation_metrics_max_cited_by", 10)
+
+    async def citation_metrics_node(state: AgentState):
+        if state.get("citation_metrics") is not None:
+            return {}
+        structure = parse_proposal_output(state.get("research_structure") or "")
+        team_info = "\n".join([structure.applicant_info, structure.project_team_info]) if structure else ""
+        if not team_info.strip():
+            logger.warning("no applicant / team section in research_structure, skip citation metrics")
+            return {"citation_metrics": {"error": "no applicant or team information"}}
+        try:
+            response = await llm.ainvoke(TEAM_MEMBERS_PROMPT.format(team_info=team_info))
+            team = parse_team_members(response.content)[:max_members]
+            if not team:
+                return {"citation_metrics": {"error": "no team members found"}}
+            # 检索客户端只在这里用到，导入放在函数内
+            from proposalAgent.tools.academic_analysis.citation_graph import abuild_team_citation_metrics
+
+            metrics = await abuild_team_citation_metrics(team, max_papers=max_papers, max_cited_by=max_cited_by)
+        except Exception as e:
+            # 指标只是学术分析的输入之一，检索失败不影响申请书的其余评审
+            logger.exception(f"citation metrics failed: {e}")
+            return {"citation_metrics": {"error": f"{type(e).__name__}: {e}"}}
+        logger.info(f"citation metrics built for {len(team)} team members over {len(metrics.graph)} papers")
+        return {"citation_metrics": metrics.to_dict()}
+
+    return citation_metrics_node
@@ -1,72 +1,107 @@
-from turtle import st
 from proposalAgent.utils.logger import get_logger
 from proposalAgent.agents.utils.agent_states import AgentState
-from google.genai import types
-import pathlib
-import time
-import json
-from google import genai
-from google.genai import types
-import pathlib
-import time
-from dataclasses import dataclass
-from numpy._core.defchararray import str_len
-import requests
-from datetime import datetime
-import time
-import json
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
-)
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.structure_util import SECTION_SEPARATOR, extract_structure, stream_extract_structure
+from langchain_core.runnables import RunnableConfig
+from typing import Dict, Optional
 import asyncio
-import sys
-
-client = genai.Client()
-
-async def get_genai_output(prompt: str,filepath:pathlib.Path):
-    client = genai.Client()
-    asyncClient = client.aio
-    response = await asyncClient.models.generate_content(
-        model="gemini-2.5-flash-lite",
-        contents=[
-        types.Part.from_bytes(
-            data=filepath.read_bytes(),
-            mime_type='application/pdf',
-        ),
-        prompt],
-    )
-    return response.text
-
-def create_structure_node(llm,toolkit):
-    
-    async def get_structure_output_node(state:AgentState):
+import pathlib
+
+logger = get_logger("structure_node")
+
+# 流式模式下仍在后台生成其余部分的抽取任务，由 structure_finalize_node 收尾。
+# 多份申请书共用同一个编译好的图并发运行，因此键为本次运行的 checkpoint thread_id（加上文件路径），
+# 同一文件的两次运行不会互相取走对方的任务
+_pending_structures: Dict[str, asyncio.Task] = {}
+
+
+def _pending_key(config: Optional[RunnableConfig], filepath) -> str:
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    return f"{thread_id}|{filepath}"
+
+
+def discard_pending_structure(thread_id: Optional[str], filepath) -> None:
+    """
+    运行在 structure_finalize_node 之前失败或被放弃时，取消并移除这次运行仍在后台的抽取任务。
+    批量运行器在每份申请书结束后调用；正常完成的运行里任务已被 finalize 取走，这里什么也不做。
+    """
+    task = _pending_structures.pop(_pending_key({"configurable": {"thread_id": thread_id}}, pathlib.Path(filepath)), None)
+    if task is not None and not task.done():
+        task.cancel()
+
+
+def _get_stream_writer():
+    """图运行时返回 LangGraph 的自定义流写入器（stream_mode="custom" 可见），否则返回空操作。"""
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except Exception:
+        return lambda chunk: None
+
+
+def create_structure_node(llm,toolkit,config=None):
+    config = config or TONGYI_CONFIG
+    # 抽取结果按 PDF 内容哈希缓存，人工反馈循环或重复提交同一份申请书时直接命中
+    cache_dir = config.get("cache_dir")
+    # "single": 整篇一次抽取；"chunked": 按页分块并发抽取，适合 80 页以上的长申请书；
+    # "stream": 流式抽取，正文部分一完成就返回，其余部分由 structure_finalize_node 收尾
+    mode = config.get("structure_mode", "single")
+    pages_per_chunk = config.get("structure_pages_per_chunk", 15)
+    max_concurrency = config.get("structure_max_concurrency", 6)
+
+    async def get_streaming_structure_output(filepath: pathlib.Path, key: str):
+        writer = _get_stream_writer()
+        body_ready = asyncio.Event()
+        sections = {}
+
+        def on_section(field: str, text: str):
+            sections[field] = text
+            writer({"structure_section": field, "text": text})
+            if field == "report_body_summary":
+                body_ready.set()
+
+        task = asyncio.create_task(stream_extract_structure(filepath, cache_dir, on_section))
+        body_waiter = asyncio.create_task(body_ready.wait())
+        await asyncio.wait([task, body_waiter], return_when=asyncio.FIRST_COMPLETED)
+        body_waiter.cancel()
+        if task.done():
+            res, _ = task.result()
+            return {"research_structure": res}
+        _pending_structures[key] = task
+        logger.info(f"report body of {filepath.name} extracted, the remaining sections keep streaming")
+        return {"research_structure": sections["report_body_summary"]}
+
+    async def get_structure_output_node(state:AgentState, config: RunnableConfig):
         filepath =  pathlib.Path(state["filepath"])
-        tools = toolkit.get_tools["output"]
-        
-        prompt = """
-            ### 角色描述
-            你是一个专业的抽取和总结pdf机器人
-            ### 任务描述
-            将这篇国家自然基金项目申请书中的重要数据进行抽取。
-            包含了以下内容：
-            - 申请人的个人履历,相关经历和论文背景
-            - 项目团队成员及其个人履历,相关经历和论文背景
-            - 项目申请信息(表格数据等内容)
-            - 报告正文,对于报告正文部分可以做总结,但是要保留完整意思。项目正文部分往往包括：1、项目的立项依据(项目背景和意义)；2、项目的主要内容以及目标或拟解决的关键问题；3、拟采取的方案的可行性分析；4、本项目的特色与创新之处；5、年度计划及预期结果；6、工作基础及保障措施(工作条件、个人相关方面的研究基础和保障措施)。
-            需要给出对应的出现的[页面],比如[P10]
-            输出这四个部分内容同时使用: ============= 进行分割
-            """
-
-        res = await get_genai_output(prompt,filepath)
-        
+
+        if mode == "stream":
+            return await get_streaming_structure_output(filepath, _pending_key(config, filepath))
+
+        res, _ = await extract_structure(filepath, cache_dir, mode, pages_per_chunk, max_concurrency)
+
         return {
             "research_structure": res
         }
-        
+
     return get_structure_output_node
-        
 
-        
+
+def create_structure_finalize_node(config=None):
+    config = config or TONGYI_CONFIG
+    cache_dir = config.get("cache_dir")
+
+    async def structure_finalize_node(state:AgentState, config: RunnableConfig):
+        """等待流式抽取的其余部分完成，用完整的结构化结果覆盖 research_structure。"""
+        filepath = pathlib.Path(state["filepath"])
+        task = _pending_structures.pop(_pending_key(config, filepath), None)
+        if task is not None:
+            res, _ = await task
+        elif SECTION_SEPARATOR in (state.get("research_structure") or ""):
+            # 抽取已在 structure_node 内全部完成
+            return {}
+        else:
+            # 进程重启等情况下只剩正文部分且没有进行中的任务：重新走带缓存的流式抽取
+            res, _ = await stream_extract_structure(filepath, cache_dir)
+        return {"research_structure": res}
+
+    return structure_finalize_node
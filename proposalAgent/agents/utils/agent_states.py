@@ -7,6 +7,23 @@ from langgraph.prebuilt import ToolNode
 from langgraph.graph import END, StateGraph, START, MessagesState
 from typing import List,Dict
 
+
+# 写入 merge_report 字段时表示“清空”的值，用于人工反馈循环回到某个分析阶段前丢弃上一轮的结果
+REPORT_RESET = "__reset__"
+
+
+def merge_report(left, right):
+    """
+    阶段二报告字段的 reducer：并行分支各自只写自己的报告，
+    空值（None / "" / []）不会覆盖已有内容，非空值以最新写入为准；
+    写入 REPORT_RESET 时清空该字段（列表字段变为 []，报告变为 ""），之后的空值写入保持清空状态。
+    """
+    if isinstance(right, str) and right == REPORT_RESET:
+        return [] if isinstance(left, list) else ""
+    if right is None or right == "" or right == []:
+        return left
+    return right
+
 # 这个 TypedDict 类定义了在“可行性”或“创新性”辩论环节中的状态。
 # 它是一个可复用的结构，用于清晰地记录每一场正反方辩论的详细过程和结果。
 class DebateState(TypedDict):
@@ -49,12 +66,16 @@ class AgentState(MessagesState):
 
     # --- 阶段 2: 信息收集 ---
     # 每个字段都存储了对应分析节点产出的报告或关键信息。
-    academic_analysis_report: Annotated[Optional[str], "Report from the academic analysis"] # 学术分析节点的产出报告。
-    social_analysis_report: Annotated[Optional[str], "Report from the social analysis"] # 社会分析节点的产出报告。
-    future_influence_report: Annotated[Optional[str], "Report from the future influence analysis"] # 未来影响分析节点的产出报告。
+    # 并行模式下四个分析师同时写入状态，因此这些字段带有 merge_report reducer。
+    academic_analysis_report: Annotated[Optional[str], "Report from the academic analysis", merge_report] # 学术分析节点的产出报告。
+    social_analysis_report: Annotated[Optional[str], "Report from the social analysis", merge_report] # 社会分析节点的产出报告。
+    future_influence_report: Annotated[Optional[str], "Report from the future influence analysis", merge_report] # 未来影响分析节点的产出报告。
     interdisciplinary_results: Annotated[
-        List[str], "List of disciplines identified for debate"
+        List[str], "List of disciplines identified for debate", merge_report
     ] # 跨学科分析节点识别出的、需要进行后续辩论的学科领域列表。
+    citation_metrics: Annotated[
+        Optional[Dict], "Precomputed citation-graph metrics of the applicant team"
+    ] # citation_metrics_node 在学术分析前一次性算好的团队引文指标（CitationMetrics.to_dict()），失败时为 {"error": ...}。
 
     # --- 阶段 2: 辩论 ---
     # 这个字段结构比较复杂，用于存储所有并行辩论的结果。
@@ -26,4 +26,28 @@ class Toolkit:
         return self._config
     
     def set_config(self, config: dict):
-        self._config = config
\ No newline at end of file
+        self._config = config
+
+    @property
+    def get_tools(self) -> dict:
+        """
+        各智能体 bind_tools 使用的工具，键与 ProposalAgentGraph 中的 ToolNode 一致。
+        阶段二的分析师和辩论双方都绑定 search_proposal，按需检索申请书原文片段，而不是把整份 research_structure 放进提示词。
+        """
+        if getattr(self, "_tools", None) is None:
+            from proposalAgent.tools.file_rag import create_state_proposal_search_tool
+
+            search_proposal = create_state_proposal_search_tool(self._config)
+            self._tools = {
+                "intention": [],
+                "output": [],
+                **{name: [search_proposal] for name in ("academic", "social", "influence", "interdisciplinary", "feasibility", "innovation")},
+            }
+        return self._tools
+
+    async def aget_proposal_search_tool(self, filepath: str = None, research_structure: str = None):
+        """当前申请书的片段检索工具（search_proposal），索引按申请书缓存，整个运行期间只构建一次。"""
+        from proposalAgent.tools.file_rag import aget_proposal_index, create_proposal_search_tool
+
+        index = await aget_proposal_index(filepath, research_structure, self._config)
+        return create_proposal_search_tool(index, self._config.get("rag_top_k"))
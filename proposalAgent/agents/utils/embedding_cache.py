@@ -0,0 +1,92 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+
+class EmbeddingCache:
+    """
+    以内容哈希为键的向量缓存：sha256(模型名 + 文本) -> embedding。
+    第一层是进程内 LRU，第二层是可选的 SQLite 文件（float32 BLOB），
+    因此同一段文本无论被哪个 memory、哪次运行查询，都只会请求一次 embedding 接口。
+    """
+
+    def __init__(self, max_items: int = 4096, db_path: Optional[str] = None):
+        self.max_items = max_items
+        self.db_path = db_path
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._lru[key] = embedding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_items:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """按顺序返回每段文本的缓存向量，未命中的位置为 None。"""
+        keys = [self.make_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(keys)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    results[i] = self._lru[key]
+                else:
+                    missing.setdefault(key, []).append(i)
+            if missing and self._conn is not None:
+                placeholders = ",".join("?" * len(missing))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    list(missing),
+                ).fetchall()
+                for key, blob in rows:
+                    embedding = array("f", blob).tolist()
+                    self._remember(key, embedding)
+                    for i in missing[key]:
+                        results[i] = embedding
+        return results
+
+    def set_many(self, model: str, texts: Sequence[str], embeddings: Sequence[List[float]]):
+        keys = [self.make_key(model, text) for text in texts]
+        with self._lock:
+            for key, embedding in zip(keys, embeddings):
+                self._remember(key, list(embedding))
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, array("f", embedding).tobytes()) for key, embedding in zip(keys, embeddings)],
+                )
+                self._conn.commit()
+
+
+_shared_caches: Dict[Optional[str], EmbeddingCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(config: dict) -> EmbeddingCache:
+    """返回进程内共享的 EmbeddingCache，同一个 db_path 只创建一次，供所有 EmbeddingMemory 复用。"""
+    db_path = config.get("embedding_cache_path")
+    with _shared_caches_lock:
+        if db_path not in _shared_caches:
+            _shared_caches[db_path] = EmbeddingCache(
+                max_items=config.get("embedding_cache_size", 4096),
+                db_path=db_path,
+            )
+        return _shared_caches[db_path]
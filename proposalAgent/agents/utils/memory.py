@@ -1,51 +1,125 @@
-import chromadb
-from chromadb.config import Settings
-from openai import OpenAI
-from proposalAgent.config import TONGYI_CONFIG
+import asyncio
+import hashlib
+from functools import lru_cache
 
-class EmbeddingMemory:
-    def __init__(self, name, config):
+from openai import AsyncOpenAI, OpenAI
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.agents.utils.embedding_cache import get_embedding_cache
+from proposalAgent.agents.utils.memory_backends import create_memory_collection
+from proposalAgent.utils.rate_limiter import estimate_tokens, get_governor
+
+
+@lru_cache(maxsize=None)
+def get_embedding_clients(base_url):
+    """Return the (sync, async) OpenAI-compatible clients shared by every memory hitting base_url,
+    so all memories reuse the same HTTP connection pools."""
+    return OpenAI(base_url=base_url), AsyncOpenAI(base_url=base_url)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None)
+
+
+class Embedder:
+    """Batched, cached embeddings for the configured backend, without any memory collection."""
+
+    def __init__(self, config):
         if config["backend_url"] == "http://localhost:11434/v1":
             self.embedding = "nomic-embed-text"
         else:
             self.embedding = "text-embedding-v3"
-        self.client = OpenAI(base_url=config["backend_url"])
-        self.chroma_client = chromadb.Client(Settings(allow_reset=True))
-        self.situation_collection = self.chroma_client.create_collection(name=name)
+        self.client, self.async_client = get_embedding_clients(config["backend_url"])
+        # DashScope accepts at most 10 inputs per embeddings request
+        self.batch_size = config.get("embedding_batch_size", 10)
+        self.embedding_cache = get_embedding_cache(config)
+        provider = "ollama" if config["backend_url"] == "http://localhost:11434/v1" else config["llm_provider"]
+        self.governor = get_governor(provider, self.embedding, config)
+
+    def _split_cached(self, texts):
+        """Look texts up in the embedding cache; return cached results and the unique texts still to embed."""
+        cached = self.embedding_cache.get_many(self.embedding, texts)
+        missing = list(dict.fromkeys(text for text, emb in zip(texts, cached) if emb is None))
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        return cached, batches
+
+    def _merge_embedded(self, texts, cached, batches, responses):
+        embedded = {}
+        for batch, response in zip(batches, responses):
+            vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            self.embedding_cache.set_many(self.embedding, batch, vectors)
+            embedded.update(zip(batch, vectors))
+        return [emb if emb is not None else embedded[text] for text, emb in zip(texts, cached)]
+
+    def get_embeddings(self, texts):
+        """Get embeddings for many texts, one embeddings request per batch of cache misses"""
+        cached, batches = self._split_cached(texts)
+        responses = [
+            self.governor.call(
+                self.client.embeddings.create, model=self.embedding, input=batch,
+                estimated_tokens=sum(map(estimate_tokens, batch)), usage=_usage_tokens,
+            )
+            for batch in batches
+        ]
+        return self._merge_embedded(texts, cached, batches, responses)
+
+    async def aget_embeddings(self, texts):
+        """Async version of get_embeddings; the batches are requested concurrently"""
+        cached, batches = self._split_cached(texts)
+        responses = await asyncio.gather(
+            *[
+                self.governor.acall(
+                    self.async_client.embeddings.create, model=self.embedding, input=batch,
+                    estimated_tokens=sum(map(estimate_tokens, batch)), usage=_usage_tokens,
+                )
+                for batch in batches
+            ]
+        )
+        return self._merge_embedded(texts, cached, batches, responses)
 
     def get_embedding(self, text):
         """Get OpenAI embedding for a text"""
-        response = self.client.embeddings.create(
-            model=self.embedding, input=text
-        )
-        return response.data[0].embedding
+        return self.get_embeddings([text])[0]
 
-    def add_situations(self, situations_and_advice):
-        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
-        situations = []
-        advice = []
-        ids = []
-        embeddings = []
-
-        offset = self.situation_collection.count()
-
-        for i, (situation, recommendation) in enumerate(situations_and_advice):
-            situations.append(situation)
-            advice.append(recommendation)
-            ids.append(str(offset + i))
-            embeddings.append(self.get_embedding(situation))
-
-        self.situation_collection.add(
-            documents=situations,
-            metadatas=[{"recommendation": rec} for rec in advice],
+
+class EmbeddingMemory(Embedder):
+    def __init__(self, name, config):
+        super().__init__(config)
+        # persistent and shared across graphs by default, see memory_backends.create_memory_collection
+        self.situation_collection = create_memory_collection(name, config)
+
+    def _add_embedded_situations(self, situations_and_advice, embeddings):
+        if not situations_and_advice:
+            return
+        # content-derived ids: concurrent graphs sharing a collection never collide, and re-adding
+        # the same (situation, advice) pair across runs is a no-op instead of a duplicate
+        ids = [
+            hashlib.sha256(f"{situation}\x00{rec}".encode("utf-8")).hexdigest()[:32]
+            for situation, rec in situations_and_advice
+        ]
+        self.situation_collection.upsert(
+            documents=[situation for situation, _ in situations_and_advice],
+            metadatas=[{"recommendation": rec} for _, rec in situations_and_advice],
             embeddings=embeddings,
             ids=ids,
         )
 
-    def get_memories(self, current_situation, n_matches=1):
-        """Find matching recommendations using OpenAI embeddings"""
-        query_embedding = self.get_embedding(current_situation)
-
+    def add_situations(self, situations_and_advice):
+        """Add financial situations and their corresponding advice. Parameter is a list of tuples (situation, rec)"""
+        situations_and_advice = list(situations_and_advice)
+        embeddings = self.get_embeddings([situation for situation, _ in situations_and_advice])
+        self._add_embedded_situations(situations_and_advice, embeddings)
+
+    async def aadd_situations(self, situations_and_advice):
+        """Async version of add_situations"""
+        situations_and_advice = list(situations_and_advice)
+        embeddings = await self.aget_embeddings([situation for situation, _ in situations_and_advice])
+        self._add_embedded_situations(situations_and_advice, embeddings)
+
+    def _query_embedded(self, query_embedding, n_matches):
+        n_matches = min(n_matches, self.situation_collection.count())
+        if n_matches == 0:
+            return []
         results = self.situation_collection.query(
             query_embeddings=[query_embedding],
             n_results=n_matches,
@@ -64,6 +138,15 @@ class EmbeddingMemory:
 
         return matched_results
 
+    def get_memories(self, current_situation, n_matches=1):
+        """Find matching recommendations using OpenAI embeddings"""
+        return self._query_embedded(self.get_embedding(current_situation), n_matches)
+
+    async def aget_memories(self, current_situation, n_matches=1):
+        """Async version of get_memories"""
+        query_embedding = (await self.aget_embeddings([current_situation]))[0]
+        return self._query_embedded(query_embedding, n_matches)
+
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,142 @@
+import json
+import os
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+
+def _collection_name(name):
+    """Chroma collection names only allow [a-zA-Z0-9._-] (3-63 chars), e.g. "planning analysis" -> "planning_analysis"."""
+    return re.sub(r"[^a-zA-Z0-9._-]", "_", name).strip("_.-")[:63].ljust(3, "_")
+
+
+@lru_cache(maxsize=None)
+def get_chroma_client(path):
+    """One PersistentClient per directory, shared by every memory in the process."""
+    import chromadb
+
+    return chromadb.PersistentClient(path=path)
+
+
+@lru_cache(maxsize=None)
+def get_ephemeral_chroma_client():
+    import chromadb
+    from chromadb.config import Settings
+
+    return chromadb.Client(Settings(allow_reset=True))
+
+
+class NumpyMemoryCollection:
+    """
+    Minimal drop-in for the chromadb Collection methods used by EmbeddingMemory (count / upsert / query),
+    backed by a normalized float32 .npy matrix that is memory-mapped on load plus a JSON sidecar for
+    ids, documents and metadatas. Avoids Chroma's startup cost for small memories.
+    """
+
+    def __init__(self, name, directory):
+        self.name = name
+        os.makedirs(directory, exist_ok=True)
+        self._matrix_path = os.path.join(directory, f"{name}.npy")
+        self._records_path = os.path.join(directory, f"{name}.json")
+        self._lock = threading.Lock()
+        if os.path.exists(self._records_path) and os.path.exists(self._matrix_path):
+            with open(self._records_path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            self._matrix = np.load(self._matrix_path, mmap_mode="r")
+        else:
+            records = {"ids": [], "documents": [], "metadatas": []}
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = records["ids"]
+        self._documents = records["documents"]
+        self._metadatas = records["metadatas"]
+        self._positions = {id_: i for i, id_ in enumerate(self._ids)}
+
+    def count(self):
+        return len(self._ids)
+
+    def _save(self, matrix):
+        # write to temp files and swap in, so a crash never leaves a half-written memory
+        matrix_tmp = self._matrix_path + ".tmp.npy"
+        records_tmp = self._records_path + ".tmp"
+        np.save(matrix_tmp, matrix)
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "documents": self._documents, "metadatas": self._metadatas}, f, ensure_ascii=False)
+        os.replace(matrix_tmp, self._matrix_path)
+        os.replace(records_tmp, self._records_path)
+        self._matrix = np.load(self._matrix_path, mmap_mode="r")
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        # an id repeated within one call keeps its last value, as in chromadb's upsert
+        latest = {id_: (vector, document, metadata) for id_, vector, document, metadata in zip(ids, vectors, documents, metadatas)}
+        with self._lock:
+            matrix = np.array(self._matrix) if self._matrix.size else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            new_rows = []
+            for id_, (vector, document, metadata) in latest.items():
+                if id_ in self._positions:
+                    row = self._positions[id_]
+                    matrix[row] = vector
+                    self._documents[row] = document
+                    self._metadatas[row] = metadata
+                else:
+                    self._positions[id_] = len(self._ids)
+                    self._ids.append(id_)
+                    self._documents.append(document)
+                    self._metadatas.append(metadata)
+                    new_rows.append(vector)
+            if new_rows:
+                matrix = np.vstack([matrix, np.stack(new_rows)])
+            self._save(matrix)
+
+    def query(self, query_embeddings, n_results=1, include=None):
+        """Exact cosine search; returns the same nested layout as chromadb's Collection.query."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        n = min(n_results, self.count())
+        for q in queries:
+            if n == 0:
+                top = np.zeros(0, dtype=np.int64)
+                sims = np.zeros(0, dtype=np.float32)
+            else:
+                sims = np.asarray(self._matrix @ q)
+                top = np.argpartition(-sims, n - 1)[:n]
+                top = top[np.argsort(-sims[top])]
+            results["ids"].append([self._ids[i] for i in top])
+            results["documents"].append([self._documents[i] for i in top])
+            results["metadatas"].append([self._metadatas[i] for i in top])
+            results["distances"].append([float(1 - sims[i]) for i in top])
+        return results
+
+
+_numpy_collections = {}
+_numpy_collections_lock = threading.Lock()
+
+
+def create_memory_collection(name, config):
+    """
+    Build the vector store behind an EmbeddingMemory according to config["memory_backend"]:
+    - "chroma": collection in the persistent, process-wide PersistentClient at config["memory_dir"] (default)
+    - "numpy": memory-mapped NumpyMemoryCollection under config["memory_dir"]
+    - "ephemeral": in-memory Chroma, lost at exit (old behaviour)
+    Collections are opened with get_or_create, so several graphs in one process share the same memories.
+    """
+    backend = config.get("memory_backend", "chroma")
+    memory_dir = config.get("memory_dir", "./memory_db")
+    collection_name = _collection_name(name)
+    if backend == "numpy":
+        key = (os.path.abspath(memory_dir), collection_name)
+        with _numpy_collections_lock:
+            if key not in _numpy_collections:
+                _numpy_collections[key] = NumpyMemoryCollection(collection_name, os.path.join(memory_dir, "numpy"))
+            return _numpy_collections[key]
+    if backend == "chroma":
+        client = get_chroma_client(os.path.abspath(memory_dir))
+    elif backend == "ephemeral":
+        client = get_ephemeral_chroma_client()
+    else:
+        raise ValueError(f"Unsupported memory backend: {backend}")
+    return client.get_or_create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
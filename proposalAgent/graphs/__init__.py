@@ -1,17 +1,18 @@
-# TradingAgents/graph/__init__.py
+# proposalAgent/graphs/__init__.py
 
-from .trading_graph import TradingAgentsGraph
+from .proposal_graph import ProposalAgentGraph
+from .factory import get_proposal_graph, clear_graph_cache
 from .conditional_logic import ConditionalLogic
 from .setup import GraphSetup
 from .propagation import Propagator
 from .reflection import Reflector
-from .signal_processing import SignalProcessor
 
 __all__ = [
-    "TradingAgentsGraph",
+    "ProposalAgentGraph",
+    "get_proposal_graph",
+    "clear_graph_cache",
     "ConditionalLogic",
     "GraphSetup",
     "Propagator",
     "Reflector",
-    "SignalProcessor",
 ]
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sqlite3
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from proposalAgent.utils.logger import get_logger
+
+logger = get_logger("checkpointer")
+
+
+class SqliteCheckpointer(SqliteSaver):
+    """
+    图编译时使用的 SQLite checkpointer，同时支持 invoke 和 ainvoke / astream。
+    AsyncSqliteSaver 的连接和锁绑定创建它时正在运行的事件循环，而图在构造时（没有事件循环）就要编译，
+    并且会在多个 asyncio.run 中复用，因此这里在 SqliteSaver（内部有线程锁，连接允许跨线程）
+    的基础上把异步接口放到线程池中执行，不阻塞图所在的事件循环。
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL 下写 checkpoint 不会阻塞并发的读取（如 get_state），批量运行时多个图可共用一个文件
+        conn.execute("PRAGMA journal_mode=WAL")
+        super().__init__(conn)
+        self.db_path = db_path
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer(config: dict) -> BaseCheckpointSaver:
+    """按配置 checkpoint_path 创建 SQLite checkpointer；为 None 时退回到进程内的 InMemorySaver。"""
+    db_path = config.get("checkpoint_path")
+    if not db_path:
+        return InMemorySaver()
+    logger.info(f"graph checkpoints are persisted to {db_path}")
+    return SqliteCheckpointer(db_path)
@@ -1,10 +1,21 @@
 # TradingAgents/graph/conditional_logic.py
 
 from proposalAgent.agents.utils.agent_states import AgentState
+from langgraph.types import Send
 import json
 """
 这个文件使用Agent state中的message[-1]来判断llm是否调用工具，如果调用了工具那么就继续走分析师那一步，
 """
+
+# 阶段二并行扇出的分析师节点，以及各自写回全局状态的字段
+STAGE2_ANALYST_NODES = {
+    "academic_analysis_node": ["academic_analysis_report"],
+    "social_analysis_node": ["social_analysis_report"],
+    "future_influence_node": ["future_influence_report"],
+    "interdisciplinary_node": ["interdisciplinary_results"],
+}
+
+
 class ConditionalLogic:
     """Handles conditional logic for determining graph flow."""
     
@@ -81,28 +92,13 @@ class ConditionalLogic:
         return "output_node" if should else "structure_node"
     
     
-    def route_after_planning(self,state: AgentState) -> str | list[str]:
+    def route_after_planning(self, state: AgentState) -> list[Send]:
         """
-        This function now directly decides the next step(s).
-        It returns either a single string (node name) or a list of strings (parallel nodes).
+        规划完成后把当前状态同时分发给所有阶段二信息收集分析师（LangGraph Send 扇出）。
+        这些分析师互不读取对方的报告，可以并行执行，最后在 stage2_join_node 汇合。
         """
-        print("--- Deciding next step after planning ---")
-        # Add the self. prefix to the method call
-        if self.should_route_to_output(state):
-            print(">>> Routing to: output_tool")
-            return "output_node"
-        else:
-            print(">>> Routing to: parallel analysis nodes")
-            parallel_nodes = [
-                "impact analyst",
-                "future influence analyst",
-                "risk analyst",
-                "interdisciplinary analyst",
-                "academic analyst",
-                "feasibility analyst",
-                "innovation analyst",
-            ]
-            return parallel_nodes
+        print(">>> Routing to: parallel analysis nodes")
+        return [Send(node, state) for node in STAGE2_ANALYST_NODES]
 
 
 
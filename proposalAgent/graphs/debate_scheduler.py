@@ -0,0 +1,132 @@
+import asyncio
+import weakref
+from typing import Any, Dict, List, Optional
+
+from proposalAgent.agents.utils.agent_states import AgentState
+from proposalAgent.utils.logger import get_logger
+
+logger = get_logger("debate_scheduler")
+
+
+class DebateScheduler:
+    """
+    辩论调度器：一次性为所有学科启动可行性/创新性辩论子图，并用信号量限制并发。
+    - 全局并发上限 max_concurrency 限制同时运行的辩论子图数量；
+    - provider_limits 按 LLM 提供方（tongyi/openai/google...）再单独限流；
+    - discipline_timeout 为单场辩论设置超时，超时或失败的辩论记为 None，其余结果照常返回；
+    - 辩论子图带 checkpointer 时，每场辩论使用独立的 thread_id（主图 thread_id + 本次 debate_controller 任务 + 辩论 + 学科），
+      辩论节点崩溃后重跑时已完成的辩论直接取回结果，中途失败的辩论从最后完成的发言继续。
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        provider_limits: Optional[Dict[str, int]] = None,
+        discipline_timeout: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.provider_limits = provider_limits or {}
+        self.discipline_timeout = discipline_timeout
+        # asyncio.Semaphore 会绑定首次使用它的事件循环，因此按事件循环分别创建
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DebateScheduler":
+        return cls(
+            max_concurrency=config.get("max_debate_concurrency", 4),
+            provider_limits=config.get("max_debate_concurrency_per_provider"),
+            discipline_timeout=config.get("debate_timeout"),
+        )
+
+    def _get_semaphore(self, key: str, limit: int) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.setdefault(loop, {})
+        if key not in semaphores:
+            semaphores[key] = asyncio.Semaphore(limit)
+        return semaphores[key]
+
+    @staticmethod
+    def debate_thread_id(parent_config: Optional[Dict[str, Any]], name: str, discipline: str) -> Optional[str]:
+        """
+        主图 thread_id 加上 debate_controller 的 checkpoint_ns（由任务 id 决定：同一步骤恢复时不变，
+        反馈循环再次进入辩论节点时会变化），因此恢复时能找回已完成的辩论，新一轮辩论则从头开始。
+        """
+        configurable = (parent_config or {}).get("configurable") or {}
+        thread_id = configurable.get("thread_id")
+        if thread_id is None:
+            return None
+        return f"{thread_id}|{configurable.get('checkpoint_ns', '')}|{name}|{discipline}"
+
+    async def _ainvoke(self, graph: Any, input_state: AgentState, thread_id: Optional[str]):
+        if thread_id is None or getattr(graph, "checkpointer", None) is None:
+            return await graph.ainvoke(input_state)
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = await graph.aget_state(config)
+        if snapshot.values and not snapshot.next:
+            return snapshot.values
+        if snapshot.next:
+            return await graph.ainvoke(None, config, durability="async")
+        return await graph.ainvoke(input_state, config, durability="async")
+
+    async def _run_debate(self, name: str, graph: Any, input_state: AgentState, provider: str, thread_id: Optional[str] = None):
+        discipline = input_state["current_discipline"]
+        global_semaphore = self._get_semaphore("__global__", self.max_concurrency)
+        provider_limit = self.provider_limits.get(provider)
+        provider_semaphore = (
+            self._get_semaphore(provider, provider_limit) if provider_limit else None
+        )
+        if provider_semaphore is None:
+            async with global_semaphore:
+                return await self._invoke_with_timeout(name, graph, input_state, discipline, thread_id)
+        # 先排 provider 的队，再占全局名额：等待限流 provider 的辩论不会占着全局名额，让其他 provider 的辩论饿死
+        async with provider_semaphore:
+            async with global_semaphore:
+                return await self._invoke_with_timeout(name, graph, input_state, discipline, thread_id)
+
+    async def _invoke_with_timeout(self, name: str, graph: Any, input_state: AgentState, discipline: str, thread_id: Optional[str] = None):
+        # 超时只从真正开始执行时计时，排队等待信号量的时间不计入
+        try:
+            return await asyncio.wait_for(self._ainvoke(graph, input_state, thread_id), timeout=self.discipline_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{name} debate for discipline '{discipline}' timed out after {self.discipline_timeout}s")
+        except Exception as e:
+            logger.error(f"{name} debate for discipline '{discipline}' failed: {e}")
+        return None
+
+    async def run(
+        self,
+        state: AgentState,
+        debate_graphs: Dict[str, Any],
+        provider: str,
+        parent_config: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, List[Any]]]:
+        """
+        为 state['interdisciplinary_results'] 中的每个学科并发运行 debate_graphs 中的全部辩论子图。
+
+        Args:
+            state (AgentState): 当前全局状态。
+            debate_graphs (Dict[str, Any]): 辩论名称 -> 编译好的辩论子图，如 {"feasibility": ..., "innovation": ...}。
+            provider (str): 辩论所用 LLM 的提供方，用于按提供方限流。
+            parent_config (Dict[str, Any], optional): debate_controller 节点收到的 RunnableConfig，用于生成各场辩论的 thread_id。
+
+        Returns:
+            List[Dict[str, List[Any]]]: 与学科顺序一致的 [{学科: [各辩论结果]}]，超时或失败的辩论结果为 None。
+        """
+        disciplines = state.get("interdisciplinary_results", []) or []
+        tasks = []
+        for discipline in disciplines:
+            input_state = state.copy()
+            input_state["messages"] = state["messages"] + [("system", f"Starting debates for discipline: {discipline}")]
+            input_state["current_discipline"] = discipline
+            tasks.append([
+                asyncio.create_task(self._run_debate(
+                    name, graph, input_state, provider, self.debate_thread_id(parent_config, name, discipline)
+                ))
+                for name, graph in debate_graphs.items()
+            ])
+
+        all_debate_outputs = []
+        for discipline, discipline_tasks in zip(disciplines, tasks):
+            results = await asyncio.gather(*discipline_tasks)
+            all_debate_outputs.append({discipline: list(results)})
+        return all_debate_outputs
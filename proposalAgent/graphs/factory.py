@@ -0,0 +1,44 @@
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.utils.logger import get_logger
+
+from .proposal_graph import ProposalAgentGraph
+
+logger = get_logger("graph_factory")
+
+# 配置哈希 -> 已构建的图（LLM 客户端、memory、工具节点、编译后的主图与辩论子图）
+_graphs: Dict[str, ProposalAgentGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """配置的稳定哈希：键顺序无关，不能 JSON 序列化的值按 str() 参与计算。"""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def get_proposal_graph(config: Optional[Dict[str, Any]] = None) -> ProposalAgentGraph:
+    """
+    返回按配置缓存的 ProposalAgentGraph，同一进程内相同配置只构建、编译一次。
+    编译后的图不保存任何单次运行的数据：申请书路径、用户提示等都通过初始状态（Propagator.create_initial_state）传入，
+    各次运行由 checkpoint thread_id 隔离，因此可以被并发的多份申请书共用。
+    """
+    config = config or TONGYI_CONFIG
+    key = config_key(config)
+    graph = _graphs.get(key)
+    if graph is not None:
+        return graph
+    with _graphs_lock:
+        if key not in _graphs:
+            logger.info(f"building proposal graph for config {key[:12]}")
+            _graphs[key] = ProposalAgentGraph(config=config)
+        return _graphs[key]
+
+
+def clear_graph_cache():
+    """丢弃已缓存的图，下次 get_proposal_graph 时重新构建（例如修改了提示词或节点实现之后）。"""
+    with _graphs_lock:
+        _graphs.clear()
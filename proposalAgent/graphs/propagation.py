@@ -1,13 +1,17 @@
 # TradingAgents/graph/propagation.py
 
 # 导入必要的类型提示，增强代码的可读性和健壮性
-from typing import Dict, Any
+import hashlib
+import json
+import pathlib
+from typing import Dict, Any, Optional
 # 从项目内部导入定义好的状态类，确保数据结构的一致性
 from proposalAgent.agents.utils.agent_states import (
     AgentState,
     DebateState,
 )
 from typing import List
+from proposalAgent.tools.structure_util import file_sha256
 
 class Propagator:
     """
@@ -28,7 +32,7 @@ class Propagator:
         self.max_recur_limit = max_recur_limit
 
     def create_initial_state(
-        self, user_prompt: str,user_interest:List[str],
+        self, user_prompt: str,user_interest:List[str], filepath: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         为代理图（Agent Graph）创建一个初始状态字典。
@@ -38,6 +42,8 @@ class Propagator:
         Args:
             user_prompt (str): 用户输入的问题或指令。
             user_interest (List[str]): 用户的兴趣列表。
+            filepath (str, optional): 申请书 PDF 路径。单次运行的数据只通过状态传入，
+                                      编译好的图（见 factory.get_proposal_graph）因此可以被所有申请书共用。
 
         Returns:
             Dict[str, Any]: 一个符合 `AgentState` 结构的字典，作为图的起始输入。
@@ -50,6 +56,7 @@ class Propagator:
         return {
             
             "messages": [("human", prompt.format(user_prompt=user_prompt,user_interest=user_interest))],
+            "filepath": filepath or "",
             "research_topic":prompt,
             "intention_decision":"",
             "research_structure":"",
@@ -59,6 +66,7 @@ class Propagator:
             "future_influence_report":"",
             "sentiment_analysis_report":"",
             "interdisciplinary_results":[],
+            "citation_metrics":None,
             "current_discipline":"",
             "debate_results":[],
             "final_analysis_summary":"",
@@ -89,15 +97,38 @@ class Propagator:
             # "news_report": "",
         }
 
-    def get_graph_args(self) -> Dict[str, Any]:
+    @staticmethod
+    def thread_id_for(
+        filepath: str,
+        run_id: Optional[str] = None,
+        user_prompt: Optional[str] = None,
+        user_interest: Optional[List[str]] = None,
+    ) -> str:
+        """
+        申请书的 checkpoint thread_id：PDF 内容哈希加上本次运行参数（run_id、用户提示、侧重点）的摘要。
+        同一份申请书以相同参数重跑时回到同一个 thread，可以从最后完成的节点继续；
+        同一份 PDF 的不同评审任务（如 manifest 中 id 或提示词不同的两行）各自使用独立的 thread，不会互相覆盖。
+        """
+        thread_id = f"proposal-{file_sha256(pathlib.Path(filepath))[:16]}"
+        if run_id is None and user_prompt is None and not user_interest:
+            return thread_id
+        params = json.dumps([run_id, user_prompt, list(user_interest or [])], ensure_ascii=False)
+        return f"{thread_id}-{hashlib.sha256(params.encode('utf-8')).hexdigest()[:12]}"
+
+    def get_graph_args(self, thread_id: Optional[str] = None) -> Dict[str, Any]:
         """
         获取用于调用（invoke）图的参数。
         这个函数将一些通用的、与图运行机制相关的配置打包起来，
         方便在调用图时直接传入。
 
+        Args:
+            thread_id (str, optional): checkpoint 的 thread_id（见 thread_id_for）。
+                                       用同一个 thread_id、以 None 作为输入再次调用图，即从上次中断处继续。
+
         Returns:
             Dict[str, Any]: 一个包含图调用所需配置的字典。
         """
+        configurable = {"thread_id": thread_id} if thread_id else {}
         return {
             # "stream_mode": "values" 指定了图的流式输出模式。
             # "values" 模式意味着每当图中的一个节点执行完毕，
@@ -105,5 +136,7 @@ class Propagator:
             # 这对于实时观察图的执行过程非常有用。
             "stream_mode": "values",
             # "config" 字段用于传递一些运行时的配置
-            "config": {"recursion_limit": self.max_recur_limit},
+            "config": {"recursion_limit": self.max_recur_limit, "configurable": configurable},
+            # checkpoint 在下一步执行的同时异步写入，不增加每个节点的延迟；进程崩溃时最多丢失最后一步
+            "durability": "async",
         }
\ No newline at end of file
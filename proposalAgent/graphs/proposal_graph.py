@@ -19,8 +19,12 @@ from proposalAgent.agents import *
 from proposalAgent.model_config import TONGYI_CONFIG
 from proposalAgent.agents.utils.memory import EmbeddingMemory
 from proposalAgent.agents.utils.agent_states import AgentState
+from proposalAgent.tools.structure_util import get_genai_client
+from proposalAgent.utils.llm_cache import get_llm_cache
+from proposalAgent.utils.rate_limiter import create_governed_chat_model, get_governor, governor_stats
 # from proposalAgent.agents.utils.tools_interface import set_config
 
+from .checkpointer import create_checkpointer
 from .conditional_logic import ConditionalLogic
 from .setup import GraphSetup
 from .propagation import Propagator
@@ -34,20 +38,22 @@ class ProposalAgentGraph:
         config:Optional[Dict[str,Any]] = None
     ):
         self.config = config or TONGYI_CONFIG
-        
+        # 反馈循环回到分析师 / 辩论节点时会重复发出相同的提示词，两个模型共用一个响应缓存
+        self.llm_cache = get_llm_cache(self.config)
+
         if self.config["llm_provider"].lower() == "openai" or self.config["llm_provider"] == "ollama" or self.config["llm_provider"] == "openrouter":
-            self.deep_thinking_llm = ChatOpenAI(model=self.config["deep_think_llm"], base_url=self.config["backend_url"])
-            self.quick_thinking_llm = ChatOpenAI(model=self.config["quick_think_llm"], base_url=self.config["backend_url"])
+            self.deep_thinking_llm = create_governed_chat_model(ChatOpenAI, model=self.config["deep_think_llm"], base_url=self.config["backend_url"], **self._llm_kwargs(self.config["deep_think_llm"]))
+            self.quick_thinking_llm = create_governed_chat_model(ChatOpenAI, model=self.config["quick_think_llm"], base_url=self.config["backend_url"], **self._llm_kwargs(self.config["quick_think_llm"]))
         elif self.config['llm_provider'].lower() == "tongyi":
-            self.deep_thinking_llm = ChatTongyi(model=self.config["deep_think_llm"], api_key=self.config["api_key"])
-            self.quick_thinking_llm = ChatTongyi(model=self.config["quick_think_llm"], api_key=self.config["api_key"])
+            self.deep_thinking_llm = create_governed_chat_model(ChatTongyi, model=self.config["deep_think_llm"], api_key=self.config["api_key"], **self._llm_kwargs(self.config["deep_think_llm"]))
+            self.quick_thinking_llm = create_governed_chat_model(ChatTongyi, model=self.config["quick_think_llm"], api_key=self.config["api_key"], **self._llm_kwargs(self.config["quick_think_llm"]))
         elif self.config["llm_provider"].lower() == "google":
-            self.deep_thinking_llm = ChatGoogleGenerativeAI(model=self.config["deep_think_llm"])
-            self.quick_thinking_llm = ChatGoogleGenerativeAI(model=self.config["quick_think_llm"])
+            self.deep_thinking_llm = create_governed_chat_model(ChatGoogleGenerativeAI, model=self.config["deep_think_llm"], **self._llm_kwargs(self.config["deep_think_llm"]))
+            self.quick_thinking_llm = create_governed_chat_model(ChatGoogleGenerativeAI, model=self.config["quick_think_llm"], **self._llm_kwargs(self.config["quick_think_llm"]))
         else:
             raise ValueError(f"Unsupported LLM provider: {self.config['llm_provider']}")
         
-        self.structure_llm = genai.Client().models
+        self.structure_llm = get_genai_client().models
 
         self.toolkit = Toolkit(config = self.config)
         
@@ -63,6 +69,7 @@ class ProposalAgentGraph:
         self.tool_nodes = self._create_tool_nodes()
         
         self.conditional_logic = ConditionalLogic()
+        self.checkpointer = create_checkpointer(self.config)
         
         self.graph_setup = GraphSetup(
             quick_thinking_llm=self.quick_thinking_llm,
@@ -79,6 +86,8 @@ class ProposalAgentGraph:
             academic_memory=self.academic_memory,
             feasibility_memory=self.feasibility_memory,
             innovation_memory=self.innovation_memory,
+            config=self.config,
+            checkpointer=self.checkpointer,
         )
         self.curr_state = None
 
@@ -87,14 +96,32 @@ class ProposalAgentGraph:
         self.graph = self.graph_setup.setup_graph()
     
     def _create_tool_nodes(self):
+        # 工具节点与智能体 bind_tools 的工具来自同一份 Toolkit.get_tools
+        tools = self.toolkit.get_tools
         return {
-            "academic": ToolNode([]),
-            "social": ToolNode([]),
-            "influence": ToolNode([]),
-            "interdisciplinary": ToolNode([]),
-            "feasibility": ToolNode([]),
-            "innovation": ToolNode([]),
+            name: ToolNode(tools[name])
+            for name in ("academic", "social", "influence", "interdisciplinary", "feasibility", "innovation")
         }
+
+    def _llm_kwargs(self, model: str) -> Dict[str, Any]:
+        """
+        聊天模型共用的构造参数：响应缓存，以及按 (提供方, 模型) 共享的治理器和 token 用量回调。
+        模型由 create_governed_chat_model 构造，每次请求都占用治理器的并发名额并按其退避策略重试。
+        """
+        governor = get_governor(self.config["llm_provider"], model, self.config)
+        return {
+            "cache": self.llm_cache,
+            "governor": governor,
+            "callbacks": [governor.token_callback()],
+        }
+
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各 (提供方, 模型) 的排队深度、等待时间、重试与 token 用量。"""
+        return governor_stats()
+
+    def llm_cache_stats(self) -> Dict[str, Any]:
+        """LLM 响应缓存的命中 / 未命中次数与节省的调用耗时（秒），未启用缓存时为空。"""
+        return self.llm_cache.stats() if self.llm_cache is not None else {}
     
     
     def reflect_and_remember(self, returns_losses):
@@ -1,18 +1,21 @@
 from typing import Dict, Any,Optional, final
 from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph, START
 from langgraph.prebuilt import ToolNode
 from langgraph.prebuilt.chat_agent_executor import F
 from langgraph.types import Send
 from proposalAgent.agents import *
-from proposalAgent.agents.utils.agent_states import AgentState
+from proposalAgent.agents.utils.agent_states import AgentState, REPORT_RESET
 from proposalAgent.agents.utils.agent_utils import Toolkit,create_msg_delete
 from proposalAgent.graphs import workflow
+from proposalAgent.agents.stage1.structure import create_structure_finalize_node
+from proposalAgent.agents.stage1.citation_metrics import create_citation_metrics_node
 from proposalAgent.agents.stage3.feedback_analysis_agent import create_feedback_analysis_agent
 from proposalAgent.agents.stage3.reflection_agent import create_reflection_agent
 from tools import *
-from .conditional_logic import ConditionalLogic
-import asyncio
+from .conditional_logic import ConditionalLogic, STAGE2_ANALYST_NODES
+from .debate_scheduler import DebateScheduler
 
 class GraphSetup:
     """
@@ -36,6 +39,8 @@ class GraphSetup:
         academic_memory:Any,
         feasibility_memory:Any,
         innovation_memory:Any,
+        config:Optional[Dict[str,Any]] = None,
+        checkpointer:Optional[Any] = None,
     ):
         self.quick_thinking_llm = quick_thinking_llm
         self.deep_think_llm = deep_think_llm
@@ -51,7 +56,55 @@ class GraphSetup:
         self.feasibility_memory = feasibility_memory
         self.innovation_memory = innovation_memory
         self.planning_memory = planning_memory
+        self.config = config or {}
+        # 主图和辩论子图共用；阶段二的分析师子图不单独指定，继承主图的 checkpointer
+        self.checkpointer = checkpointer
+        self.debate_scheduler = DebateScheduler.from_config(self.config)
     
+    def _build_stage2_subgraph(self, analyst_node, tool_exc_node, msg_clear_node, should_continue, name: str, prepare_node=None):
+        """
+        把单个信息收集分析师和它的工具调用循环编译成子图，供并行模式扇出使用。
+        prepare_node 在分析师之前执行一次（不参与工具循环），用于预先计算分析师需要的输入。
+        """
+        subgraph = StateGraph(AgentState)
+        subgraph.add_node("analyst_node", analyst_node)
+        subgraph.add_node("tool_exc_node", tool_exc_node)
+        subgraph.add_node("msg_clear_node", msg_clear_node)
+        if prepare_node is not None:
+            subgraph.add_node("prepare_node", prepare_node)
+            subgraph.add_edge(START, "prepare_node")
+            subgraph.add_edge("prepare_node", "analyst_node")
+        else:
+            subgraph.add_edge(START, "analyst_node")
+        subgraph.add_conditional_edges("analyst_node", should_continue, {
+            f"tools_{name}": "tool_exc_node",
+            f"msg_clear_{name}": "msg_clear_node",
+            "final_analyst_node": END,
+        })
+        subgraph.add_edge("tool_exc_node", "analyst_node")
+        subgraph.add_edge("msg_clear_node", END)
+        return subgraph.compile()
+
+    @staticmethod
+    def _create_stage2_branch(subgraph, output_keys):
+        async def stage2_branch(state: AgentState):
+            result = await subgraph.ainvoke(state)
+            # 只回写本分析师负责的字段，工具调用消息留在子图内部，避免并行分支的消息互相穿插
+            return {key: result[key] for key in output_keys if key in result}
+        return stage2_branch
+
+    def _create_feedback_node(self, feedback_analysis_agent):
+        """
+        人工反馈分析节点：除了写回分析结果消息，还把反馈要回到的分析阶段的旧结果清空（REPORT_RESET），
+        否则 merge_report 会保留上一轮的报告 / 学科列表，重新运行的阶段如果产出为空，旧结果会继续流入辩论。
+        """
+        async def feedback_analysis_node(state: AgentState):
+            message = await feedback_analysis_agent.ainvoke(state)
+            route = self.conditional_logic.route_after_feedback({**state, "messages": [*state["messages"], message]})
+            resets = {key: REPORT_RESET for key in STAGE2_ANALYST_NODES.get(f"{route}_node", [])}
+            return {"messages": [message], **resets}
+        return feedback_analysis_node
+
     def setup_graph(self):
         """
         构建并返回工作流图。
@@ -63,7 +116,7 @@ class GraphSetup:
         
         
         # stage 1
-        structure_node = create_structure_node(self.structure_llm,tools=self.toolkit.get_tools['output'])
+        structure_node = create_structure_node(self.structure_llm,self.toolkit,config=self.config or None)
         planning_node = create_planning_agent(self.deep_think_llm,self.planning_memory)
 
         # stage 2
@@ -71,6 +124,8 @@ class GraphSetup:
         academic_analysis_node = create_academic_analysis_agent(self.quick_thinking_llm,self.academic_analysis_memory,tools=self.toolkit.get_tools['academic'])
         academic_tool_exc_node = self.tool_nodes['academic']
         academic_msg_clear_node = create_msg_delete()
+        # 团队引文指标在学术分析前一次性算好，写入 citation_metrics 供学术分析师直接使用
+        citation_metrics_node = create_citation_metrics_node(self.quick_thinking_llm, self.config or None)
         
         social_analysis_node = create_social_analysis_agent(self.quick_thinking_llm,self.social_analysis_memory,tools=self.toolkit.get_tools['social'])
         social_tool_exc_node = self.tool_nodes['social']
@@ -120,28 +175,55 @@ class GraphSetup:
         workflow.add_node("planning_node",planning_node)
         workflow.add_node("output_node",output_node)
         workflow.add_node("structure_node",structure_node)
+        # 流式抽取时 structure_node 拿到正文就返回，规划与其余部分的抽取并行，阶段二开始前在这里汇合
+        streaming_structure = self.config.get("structure_mode") == "stream"
+        if streaming_structure:
+            workflow.add_node("structure_finalize_node",create_structure_finalize_node(self.config))
+        stage2_source = "structure_finalize_node" if streaming_structure else "planning_node"
         
         ## stage 2 nodes
-        ### 信息收集节点
-        ### 学术分析节点
-        workflow.add_node("academic_analysis_node",academic_analysis_node)
-        workflow.add_node("academic_analysis_tool_exc_node",academic_tool_exc_node)
-        workflow.add_node("academic_analysis_msg_clear_node",academic_msg_clear_node)
+        parallel_stage2 = self.config.get("parallel_stage2", True)
+        if parallel_stage2:
+            ### 并行模式：每个信息收集分析师连同其工具循环编译成子图，规划后同时扇出，在 stage2_join_node 汇合
+            stage2_subgraphs = {
+                "academic_analysis_node": self._build_stage2_subgraph(academic_analysis_node, academic_tool_exc_node, academic_msg_clear_node, should_continue_academic_analysis, "academic", citation_metrics_node),
+                "social_analysis_node": self._build_stage2_subgraph(social_analysis_node, social_tool_exc_node, social_msg_clear_node, should_continue_social_analysis, "social"),
+                "future_influence_node": self._build_stage2_subgraph(future_influence_node, future_influence_tool_exc_node, future_influence_msg_clear_node, should_continue_future_influence, "future_influence"),
+                "interdisciplinary_node": self._build_stage2_subgraph(interdisciplinary_node, interdisciplinary_tool_exc_node, interdisciplinary_msg_clear_node, should_continue_interdisciplinary, "interdisciplinary"),
+            }
+            # citation_metrics 不在 STAGE2_ANALYST_NODES 中：人工反馈回到学术分析时不清空，指标不随分析重做而变化
+            stage2_extra_keys = {"academic_analysis_node": ["citation_metrics"]}
+            for node_name, subgraph in stage2_subgraphs.items():
+                workflow.add_node(node_name, self._create_stage2_branch(subgraph, STAGE2_ANALYST_NODES[node_name] + stage2_extra_keys.get(node_name, [])))
+
+            def stage2_join_node(state: AgentState):
+                # 各分支的报告已经由 merge_report reducer 合并进全局状态，这里只作为汇合点
+                return {}
+
+            workflow.add_node("stage2_join_node", stage2_join_node)
+        else:
+            ### 串行模式（调试用）：分析师依次执行
+            ### 信息收集节点
+            ### 学术分析节点
+            workflow.add_node("citation_metrics_node",citation_metrics_node)
+            workflow.add_node("academic_analysis_node",academic_analysis_node)
+            workflow.add_node("academic_analysis_tool_exc_node",academic_tool_exc_node)
+            workflow.add_node("academic_analysis_msg_clear_node",academic_msg_clear_node)
         
-        ### 社会分析节点
-        workflow.add_node("social_analysis_node",social_analysis_node)
-        workflow.add_node("social_analysis_tool_exc_node",social_tool_exc_node)
-        workflow.add_node("social_analysis_msg_clear_node",social_msg_clear_node)
+            ### 社会分析节点
+            workflow.add_node("social_analysis_node",social_analysis_node)
+            workflow.add_node("social_analysis_tool_exc_node",social_tool_exc_node)
+            workflow.add_node("social_analysis_msg_clear_node",social_msg_clear_node)
         
-        ### 未来影响分析节点
-        workflow.add_node("future_influence_node",future_influence_node)
-        workflow.add_node("future_influence_tool_exc_node",future_influence_tool_exc_node)
-        workflow.add_node("future_influence_msg_clear_node",future_influence_msg_clear_node)
+            ### 未来影响分析节点
+            workflow.add_node("future_influence_node",future_influence_node)
+            workflow.add_node("future_influence_tool_exc_node",future_influence_tool_exc_node)
+            workflow.add_node("future_influence_msg_clear_node",future_influence_msg_clear_node)
         
-        ### 跨学科分析节点
-        workflow.add_node("interdisciplinary_node",interdisciplinary_node)
-        workflow.add_node("interdisciplinary_tool_exc_node",interdisciplinary_tool_exc_node)
-        workflow.add_node("interdisciplinary_msg_clear_node",interdisciplinary_msg_clear_node)
+            ### 跨学科分析节点
+            workflow.add_node("interdisciplinary_node",interdisciplinary_node)
+            workflow.add_node("interdisciplinary_tool_exc_node",interdisciplinary_tool_exc_node)
+            workflow.add_node("interdisciplinary_msg_clear_node",interdisciplinary_msg_clear_node)
         
         ### 辩论节点
         ### 可行性辩论节点
@@ -177,37 +259,45 @@ class GraphSetup:
         
         workflow.add_edge("output_node",END)
         workflow.add_edge("structure_node","planning_node")
-        workflow.add_edge("planning_node","academic_analysis_node")
-        workflow.add_conditional_edges("academic_analysis_node",should_continue_academic_analysis,{
-            "tools_academic":"academic_tool_exc_node",
-            "msg_clear_academic":"academic_msg_clear_node",
-            "final_analyst_node":"final_analyst_node"
-        }) 
-        workflow.add_edge("tools_academic","academic_analysis_node")
-        workflow.add_edge("academic_analysis_node","social_analysis_node")
-        workflow.add_conditional_edges("social_analysis_node",should_continue_social_analysis,{
-            "tools_social":"social_analysis_tool_exc_node",
-            "msg_clear_social":"social_analysis_msg_clear_node",
-            "final_analyst_node":"final_analyst_node"
-        })
-        workflow.add_edge("tools_social","social_analysis_node")
-        workflow.add_edge("social_analysis_node","future_influence_node")
+        if streaming_structure:
+            workflow.add_edge("planning_node","structure_finalize_node")
+        if parallel_stage2:
+            workflow.add_conditional_edges(stage2_source, self.conditional_logic.route_after_planning, list(STAGE2_ANALYST_NODES))
+            for node_name in STAGE2_ANALYST_NODES:
+                workflow.add_edge(node_name, "stage2_join_node")
+        else:
+            workflow.add_edge(stage2_source,"citation_metrics_node")
+            workflow.add_edge("citation_metrics_node","academic_analysis_node")
+            workflow.add_conditional_edges("academic_analysis_node",should_continue_academic_analysis,{
+                "tools_academic":"academic_tool_exc_node",
+                "msg_clear_academic":"academic_msg_clear_node",
+                "final_analyst_node":"final_analyst_node"
+            }) 
+            workflow.add_edge("tools_academic","academic_analysis_node")
+            workflow.add_edge("academic_analysis_node","social_analysis_node")
+            workflow.add_conditional_edges("social_analysis_node",should_continue_social_analysis,{
+                "tools_social":"social_analysis_tool_exc_node",
+                "msg_clear_social":"social_analysis_msg_clear_node",
+                "final_analyst_node":"final_analyst_node"
+            })
+            workflow.add_edge("tools_social","social_analysis_node")
+            workflow.add_edge("social_analysis_node","future_influence_node")
 
-        workflow.add_conditional_edges("future_influence_node",should_continue_future_influence,{
-            "tools_future_influence":"future_influence_tool_exc_node",
-            "msg_clear_future_influence":"future_influence_msg_clear_node",
-            "final_analyst_node":"final_analyst_node"
+            workflow.add_conditional_edges("future_influence_node",should_continue_future_influence,{
+                "tools_future_influence":"future_influence_tool_exc_node",
+                "msg_clear_future_influence":"future_influence_msg_clear_node",
+                "final_analyst_node":"final_analyst_node"
 
-        })
-        workflow.add_edge("tools_future_influence","future_influence_node")
-        workflow.add_edge("future_influence_node","interdisciplinary_node")
+            })
+            workflow.add_edge("tools_future_influence","future_influence_node")
+            workflow.add_edge("future_influence_node","interdisciplinary_node")
         
-        workflow.add_conditional_edges("interdisciplinary_node",should_continue_interdisciplinary,{
-            "tools_interdisciplinary":"interdisciplinary_tool_exc_node",
-            "msg_clear_interdisciplinary":"interdisciplinary_msg_clear_node",
-            "final_analyst_node":"final_analyst_node"
-        })
-        workflow.add_edge("tools_interdisciplinary", "interdisciplinary_node")
+            workflow.add_conditional_edges("interdisciplinary_node",should_continue_interdisciplinary,{
+                "tools_interdisciplinary":"interdisciplinary_tool_exc_node",
+                "msg_clear_interdisciplinary":"interdisciplinary_msg_clear_node",
+                "final_analyst_node":"final_analyst_node"
+            })
+            workflow.add_edge("tools_interdisciplinary", "interdisciplinary_node")
 
 
         # 1. 可行性辩论子图
@@ -234,7 +324,7 @@ class GraphSetup:
         )
         feasibility_debate_workflow.add_edge("feasible_bad_tool_exc_node", "feasible_bad_node")
         feasibility_debate_workflow.add_edge("feasible_judge_node", END)
-        compiled_feasibility_debate_graph = feasibility_debate_workflow.compile()
+        compiled_feasibility_debate_graph = feasibility_debate_workflow.compile(checkpointer=self.checkpointer)
 
         # 2. 创新性辩论子图
         innovation_debate_workflow = StateGraph(AgentState)
@@ -260,28 +350,21 @@ class GraphSetup:
         )
         innovation_debate_workflow.add_edge("innovation_bad_tool_exc_node", "innovation_bad_node")
         innovation_debate_workflow.add_edge("innovation_judge_node", END)
-        compiled_innovation_debate_graph = innovation_debate_workflow.compile()
-
-        # 3. 辩论节点
-        async def debate_controller(state: AgentState):
-            disciplines = state.get('interdisciplinary_results', [])
-            all_debate_outputs = []
-            for discipline in disciplines:
-                input_state = state.copy()
-                input_state["messages"] = state["messages"] + [("system", f"Starting debates for discipline: {discipline}")]
-                input_state["current_discipline"] = discipline
-
-                # 并行运行可行性和创新性辩论
-                f_task = compiled_feasibility_debate_graph.ainvoke(input_state)
-                i_task = compiled_innovation_debate_graph.ainvoke(input_state)
-                results = await asyncio.gather(f_task, i_task)
-                all_debate_outputs.append({discipline: results})
-            
-            state['debate_results'] = all_debate_outputs
-            return state
+        compiled_innovation_debate_graph = innovation_debate_workflow.compile(checkpointer=self.checkpointer)
+
+        # 3. 辩论节点: 所有学科的两类辩论一次性提交给调度器，受全局/提供方并发上限和单学科超时约束
+        debate_graphs = {
+            "feasibility": compiled_feasibility_debate_graph,
+            "innovation": compiled_innovation_debate_graph,
+        }
+        llm_provider = self.config.get("llm_provider", "").lower()
+
+        async def debate_controller(state: AgentState, config: RunnableConfig):
+            all_debate_outputs = await self.debate_scheduler.run(state, debate_graphs, provider=llm_provider, parent_config=config)
+            return {"debate_results": all_debate_outputs}
 
         workflow.add_node("debate_controller", debate_controller)
-        workflow.add_edge("interdisciplinary_node", "debate_controller")
+        workflow.add_edge("stage2_join_node" if parallel_stage2 else "interdisciplinary_node", "debate_controller")
         workflow.add_edge("debate_controller", "final_analyst_node")
         
 
@@ -293,7 +376,7 @@ class GraphSetup:
         3、引入评审之后如果人类评审没问题就生成，有问题的话就根据人类的评价，分析出来问题出现在哪里，更新他的记忆，并且重新执行那一部分节点，然后再输出报表。
         """
         reflection_node = create_reflection_agent(self.deep_think_llm)
-        feedback_analysis_node = create_feedback_analysis_agent(self.deep_think_llm)
+        feedback_analysis_node = self._create_feedback_node(create_feedback_analysis_agent(self.deep_think_llm))
 
         # The human review node is a placeholder to allow the graph to interrupt for human input.
         def human_review_node(state: AgentState) -> AgentState:
@@ -343,4 +426,6 @@ class GraphSetup:
 
         # To enable the human-in-the-loop, you need to compile the graph
         # with an instruction to interrupt before the human_review_node.
-        return workflow.compile(interrupt_before=["human_review_node"])
\ No newline at end of file
+        # checkpointer 按 thread_id（每份申请书一个）保存每个节点完成后的状态：人工评审暂停、进程重启或接口故障后
+        # 用同一个 thread_id 继续即可从最后完成的节点恢复，route_after_feedback 也只会重跑它路由到的节点
+        return workflow.compile(checkpointer=self.checkpointer, interrupt_before=["human_review_node"])
\ No newline at end of file
@@ -3,16 +3,84 @@ import os
 TONGYI_CONFIG = {
     "project_dir": os.path.abspath(os.path.join(os.path.dirname(__file__), ".")),
     "results_dir": os.getenv("PROPOSALS_RESULTS_DIR", "./results"),
+    "cache_dir": os.getenv("PROPOSALS_CACHE_DIR", "./cache"),
     "data_dir": "/Users/peelsannaw/Desktop/codes/maas/mas4proposal/proposalAgent/data",
     # LLM settings
     "llm_provider": "tongyi",
     "deep_think_llm": "qwen-plus",
     "quick_think_llm": "qwen-plus",
     "backend_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+    # LLM 响应缓存：精确缓存持久化在 llm_cache_path（None 表示只用内存）；
+    # 语义缓存默认关闭，开启后复用与已缓存提示词余弦相似度不低于阈值的回答
+    "llm_cache_enabled": True,
+    "llm_cache_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "llm_responses.sqlite"),
+    "llm_semantic_cache": False,
+    "llm_semantic_threshold": 0.97,
+    # LLM / embedding 调用的进程级限流（utils.rate_limiter.get_governor）：依次按 "提供方:模型"、"提供方"、"default" 查找，
+    # rpm / tpm 为每分钟请求数与 token 数，max_concurrency 为同时在途的请求数
+    "rate_limits": {
+        "tongyi": {"rpm": 600, "tpm": 1_000_000, "max_concurrency": 8},
+        "google": {"rpm": 300, "tpm": 1_000_000, "max_concurrency": 8},
+        "openai": {"rpm": 500, "tpm": 200_000, "max_concurrency": 8},
+        "tongyi:text-embedding-v3": {"rpm": 1800, "tpm": 1_200_000, "max_concurrency": 10},
+        "default": {"rpm": 60, "max_concurrency": 4},
+    },
+    # 图的 checkpoint（SQLite），人工评审暂停、崩溃或接口故障后按申请书的 thread_id 恢复；None 表示只保存在内存中
+    "checkpoint_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "checkpoints.sqlite"),
     # Debate and discussion settings
     "max_debate_rounds": 1,
     "max_risk_discuss_rounds": 1,
     "max_recur_limit": 30,
+    # 阶段二信息收集分析师是否并行执行（False 时退回串行链路，便于调试）
+    "parallel_stage2": True,
+    # 辩论并发：全局上限、按 LLM 提供方的上限，以及单场辩论超时（秒，None 表示不限）
+    "max_debate_concurrency": 6,
+    "max_debate_concurrency_per_provider": {"tongyi": 4, "google": 4, "openai": 6},
+    "debate_timeout": 600,
+    # 申请书结构抽取："single" 整篇一次抽取，"chunked" 按页分块并发抽取（需要 pypdf），
+    # "stream" 流式抽取，正文一完成就开始规划
+    "structure_mode": "single",
+    "structure_pages_per_chunk": 15,
+    "structure_max_concurrency": 6,
+    # Embedding settings: 单次请求的最大文本数（DashScope 上限 10）、进程内 LRU 容量，以及可选的磁盘缓存（None 表示只用内存）
+    "embedding_batch_size": 10,
+    "embedding_cache_size": 4096,
+    "embedding_cache_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "embeddings.sqlite"),
+    # 申请书 RAG：片段长度 / 重叠（字符数）与每次检索返回的片段数
+    "rag_chunk_size": 800,
+    "rag_chunk_overlap": 100,
+    "rag_top_k": 4,
+    # Memory settings: "chroma"（持久化, 进程内共享）、"numpy"（内存映射, 适合小集合）或 "ephemeral"（进程退出即丢失）
+    "memory_backend": "chroma",
+    "memory_dir": os.getenv("PROPOSALS_MEMORY_DIR", "./memory_db"),
+    # 学科索引：学科树 json、DisciplineIndex 的 .npy 目录，以及向量库构建脚本写入的 Chroma 目录
+    "disciplines_path": os.getenv("PROPOSALS_DISCIPLINES_PATH", "./disciplines.json"),
+    "discipline_index_dir": "./discipline_index",
+    "discipline_chroma_path": "./discipline_cm_db",
+    # 外部检索接口（SerpAPI 等）的持久化响应缓存
+    "response_cache_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "responses.sqlite"),
+    "serpapi_cache_ttl": 30 * 24 * 3600,
+    # SerpAPI 限速（按套餐的每小时吞吐设置）：每秒请求数与允许的突发量
+    "serpapi_requests_per_second": 5,
+    "serpapi_burst": 10,
+    # Google News 抓取：令牌桶限速（每秒请求数 / 突发量）与查询区间切分的日期窗口数
+    "news_requests_per_second": 1,
+    "news_burst": 4,
+    "news_date_slices": 4,
+    # 新闻按 (查询, 天) 缓存，重叠的查询区间只抓取缺失的日期段（None 表示不缓存）
+    "news_cache_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "news.sqlite"),
+    # Web of Science Starter API：每秒请求数、单次检索的最大记录数与响应缓存时长（秒）
+    "wos_requests_per_second": 5,
+    "wos_max_results": 200,
+    "wos_cache_ttl": 7 * 24 * 3600,
+    # 团队引文指标（学术分析前计算一次）：纳入的团队成员数、每位成员的高被引论文数与每篇论文拉取的施引文献数
+    "citation_metrics_max_members": 8,
+    "citation_metrics_max_papers": 5,
+    "citation_metrics_max_cited_by": 10,
+    # arXiv：元数据 / 摘要的本地库、检索式结果的缓存时长（秒）与请求间隔（arXiv 要求不低于 3 秒）
+    "arxiv_cache_path": os.path.join(os.getenv("PROPOSALS_CACHE_DIR", "./cache"), "arxiv.sqlite"),
+    "arxiv_query_ttl": 24 * 3600,
+    "arxiv_request_interval": 3,
     # Tool settings
     "tools": [
         "python_repl",
@@ -0,0 +1,489 @@
+"""
+arXiv 检索与本地全文索引，供创新性辩论对比申请书与近期预印本。
+
+- 通过 arXiv Atom API 分页检索（按 arXiv 要求限速为每 3 秒一个请求），按 id 查询时每批最多 100 个 id 合并成一个 id_list 请求；
+- 论文元数据与摘要写入本地 SQLite（ArxivStore），检索式 -> id 列表也会缓存，重复检索不再访问接口；
+- ArxivLocalIndex 在缓存的摘要上建立 BM25 倒排索引（英文按词、中文按二元组切分），
+  可选地再建立 embedding 索引，之后的查新都在本地毫秒级完成；
+- ArxivStore.load_atom / load_dump 可以从保存的 Atom 响应或 jsonl 导出文件离线构建，便于在无网络环境下测试。
+
+离线用法：python -m proposalAgent.tools.academic_analysis.arxiv_util --fixture benchmarks/fixtures/arxiv_query.atom.xml "graph neural network proposal review"
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+import xml.etree.ElementTree as ET
+from collections import Counter
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+from tenacity import (
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    retry_if_exception_type,
+    retry_if_result,
+)
+
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import TokenBucket
+
+logger = get_logger("arxiv_util")
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+PAGE_SIZE = 100
+ID_BATCH_SIZE = 100
+NAMESPACES = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "opensearch": "http://a9.com/-/spec/opensearch/1.1/",
+    "arxiv": "http://arxiv.org/schemas/atom",
+}
+
+# arXiv API 使用条款：连续请求之间至少间隔 3 秒
+_arxiv_bucket = TokenBucket(rate=1 / TONGYI_CONFIG.get("arxiv_request_interval", 3), capacity=1)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+# ---------- Atom 解析 ----------
+_ID_PATTERN = re.compile(r"abs/(.+?)(v\d+)?$")
+
+
+def _text(element: Optional[ET.Element]) -> str:
+    return " ".join((element.text or "").split()) if element is not None else ""
+
+
+def parse_atom(xml) -> Tuple[int, List[Dict[str, Any]]]:
+    """解析 arXiv Atom 响应，返回 (命中总数, 论文列表)。"""
+    root = ET.fromstring(xml)
+    total = int(_text(root.find("opensearch:totalResults", NAMESPACES)) or 0)
+    papers = []
+    for entry in root.findall("atom:entry", NAMESPACES):
+        match = _ID_PATTERN.search(_text(entry.find("atom:id", NAMESPACES)))
+        if match is None:
+            # id_list 中不存在的 id 会返回一个只有 Error 标题的 entry
+            continue
+        doi = entry.find("arxiv:doi", NAMESPACES)
+        primary = entry.find("arxiv:primary_category", NAMESPACES)
+        papers.append({
+            "id": match.group(1),
+            "version": match.group(2) or "",
+            "title": _text(entry.find("atom:title", NAMESPACES)),
+            "abstract": _text(entry.find("atom:summary", NAMESPACES)),
+            "authors": [_text(author.find("atom:name", NAMESPACES)) for author in entry.findall("atom:author", NAMESPACES)],
+            "categories": [category.get("term") for category in entry.findall("atom:category", NAMESPACES)],
+            "primary_category": primary.get("term") if primary is not None else None,
+            "published": _text(entry.find("atom:published", NAMESPACES))[:10],
+            "updated": _text(entry.find("atom:updated", NAMESPACES))[:10],
+            "doi": _text(doi) or None,
+        })
+    return total, papers
+
+
+# ---------- 本地存储 ----------
+class ArxivStore:
+    """
+    arXiv 元数据与摘要的 SQLite 缓存，外加 检索式 -> id 列表 的缓存。
+    generation 在每次 upsert 新增或修改了论文时加一，本地索引据此判断是否需要重建。
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS papers (id TEXT PRIMARY KEY, record TEXT NOT NULL, fetched_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS queries (key TEXT PRIMARY KEY, ids TEXT NOT NULL, total INTEGER, fetched_at REAL NOT NULL);
+            """
+        )
+        self._conn.commit()
+
+    def upsert(self, papers: Iterable[Dict[str, Any]]):
+        now = time.time()
+        rows = [(paper["id"], json.dumps(paper, ensure_ascii=False), now) for paper in papers]
+        with self._lock:
+            before = self._conn.total_changes
+            # 内容没有变化的论文不改写，重复检索同一批论文不会让本地索引失效
+            self._conn.executemany(
+                """
+                INSERT INTO papers (id, record, fetched_at) VALUES (?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET record = excluded.record, fetched_at = excluded.fetched_at
+                WHERE papers.record != excluded.record
+                """,
+                rows,
+            )
+            self._conn.commit()
+            if self._conn.total_changes != before:
+                self.generation += 1
+
+    def get_many(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = list(ids[start:start + 500])
+                rows = self._conn.execute(
+                    f"SELECT id, record FROM papers WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update((paper_id, json.loads(record)) for paper_id, record in rows)
+        return found
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM papers ORDER BY id").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def get_query(self, key: str, ttl: Optional[float]) -> Optional[Tuple[List[str], int]]:
+        with self._lock:
+            row = self._conn.execute("SELECT ids, total, fetched_at FROM queries WHERE key = ?", (key,)).fetchone()
+        if row is None or (ttl is not None and row[2] + ttl < time.time()):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set_query(self, key: str, ids: List[str], total: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries (key, ids, total, fetched_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(ids), total, time.time()),
+            )
+            self._conn.commit()
+
+    # ---------- 离线导入 / 导出 ----------
+    def load_atom(self, path: str) -> int:
+        with open(path, "rb") as f:
+            _, papers = parse_atom(f.read())
+        self.upsert(papers)
+        return len(papers)
+
+    def load_dump(self, path: str) -> int:
+        with open(path, "r", encoding="utf-8") as f:
+            papers = [json.loads(line) for line in f if line.strip()]
+        self.upsert(papers)
+        return len(papers)
+
+    def dump(self, path: str) -> int:
+        papers = self.all()
+        with open(path, "w", encoding="utf-8") as f:
+            for paper in papers:
+                f.write(json.dumps(paper, ensure_ascii=False) + "\n")
+        return len(papers)
+
+
+@lru_cache(maxsize=None)
+def _open_store(db_path: str) -> ArxivStore:
+    return ArxivStore(db_path)
+
+
+def get_arxiv_store(db_path: Optional[str] = None) -> ArxivStore:
+    """进程内共享的 ArxivStore，默认使用配置 arxiv_cache_path。"""
+    return _open_store(db_path or TONGYI_CONFIG.get("arxiv_cache_path") or os.path.join(TONGYI_CONFIG.get("cache_dir", "./cache"), "arxiv.sqlite"))
+
+
+# ---------- API ----------
+def get_arxiv_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=2, max_keepalive_connections=2))
+        _clients[loop] = client
+    return client
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    return response.status_code in (429, 503)
+
+
+@retry(
+    retry=(retry_if_result(_should_retry) | retry_if_exception_type(httpx.TransportError)),
+    wait=wait_exponential(multiplier=1, min=3, max=60),
+    stop=stop_after_attempt(5),
+)
+async def _request(params: Dict[str, Any]) -> httpx.Response:
+    await _arxiv_bucket.acquire()
+    response = await get_arxiv_client().get(ARXIV_API_URL, params=params)
+    if not _should_retry(response):
+        response.raise_for_status()
+    return response
+
+
+async def asearch_arxiv(
+    query: str,
+    max_results: int = 200,
+    sort_by: str = "relevance",
+    store: Optional[ArxivStore] = None,
+) -> List[Dict[str, Any]]:
+    """
+    分页检索 arXiv（search_query 语法，如 'all:"graph neural network" AND cat:cs.LG'）。
+    检索结果的 id 列表与论文元数据都写入本地缓存，缓存有效期内的相同检索不访问接口。
+    """
+    store = store or get_arxiv_store()
+    key = json.dumps([query, sort_by, max_results])
+    cached = store.get_query(key, TONGYI_CONFIG.get("arxiv_query_ttl", 24 * 3600))
+    if cached is not None:
+        ids, _ = cached
+        papers = store.get_many(ids)
+        return [papers[paper_id] for paper_id in ids if paper_id in papers]
+
+    ids: List[str] = []
+    total = None
+    start = 0
+    while start < max_results and (total is None or start < total):
+        size = min(PAGE_SIZE, max_results - start)
+        response = await _request({
+            "search_query": query, "start": start, "max_results": size,
+            "sortBy": sort_by, "sortOrder": "descending",
+        })
+        total, papers = parse_atom(response.content)
+        store.upsert(papers)
+        ids.extend(paper["id"] for paper in papers)
+        if len(papers) < size:
+            break
+        start += size
+    store.set_query(key, ids, total or 0)
+    papers = store.get_many(ids)
+    return [papers[paper_id] for paper_id in dict.fromkeys(ids) if paper_id in papers]
+
+
+async def afetch_arxiv_by_ids(ids: Sequence[str], store: Optional[ArxivStore] = None) -> Dict[str, Dict[str, Any]]:
+    """按 arXiv id 批量获取元数据：本地已有的直接返回，其余每 100 个合并成一个 id_list 请求。"""
+    store = store or get_arxiv_store()
+    ids = list(dict.fromkeys(re.sub(r"v\d+$", "", paper_id.strip()) for paper_id in ids if paper_id))
+    found = store.get_many(ids)
+    missing = [paper_id for paper_id in ids if paper_id not in found]
+    for start in range(0, len(missing), ID_BATCH_SIZE):
+        batch = missing[start:start + ID_BATCH_SIZE]
+        response = await _request({"id_list": ",".join(batch), "max_results": len(batch)})
+        _, papers = parse_atom(response.content)
+        store.upsert(papers)
+        found.update((paper["id"], paper) for paper in papers)
+    return {paper_id: found[paper_id] for paper_id in ids if paper_id in found}
+
+
+# ---------- 本地索引 ----------
+_LATIN_TOKEN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it its of on or that the their this to was were which with we our these using based".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """英文小写分词并去停用词；连续汉字切成重叠的二元组（单字保留为一元）。"""
+    text = text.lower()
+    tokens = [token for token in _LATIN_TOKEN.findall(text) if token not in STOPWORDS]
+    for run in _CJK_RUN.findall(text):
+        tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    return tokens
+
+
+class Bm25Index:
+    """倒排表存为 CSR 数组（词 -> 文档 id / 词频），一次查询只访问查询词的倒排列表。"""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        freqs: List[int] = []
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc] = sum(counts.values())
+            for term, count in counts.items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                freqs.append(count)
+        self.vocabulary = vocabulary
+        order = np.argsort(np.asarray(term_ids, dtype=np.int64), kind="stable")
+        self.postings = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.freqs = np.asarray(freqs, dtype=np.float32)[order]
+        self.indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(np.asarray(term_ids, dtype=np.int64), minlength=len(vocabulary)), out=self.indptr[1:])
+        df = np.diff(self.indptr).astype(np.float32)
+        n = max(len(documents), 1)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        self.lengths = lengths
+        # 预先算好每篇文档的长度归一化项
+        self._norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if len(lengths) else 1.0, 1e-6))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, count in Counter(tokenize(query)).items():
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs, tf = self.postings[start:end], self.freqs[start:end]
+            scores[docs] += count * self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search(self, query: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > 0]
+        return top, scores[top]
+
+
+class ArxivLocalIndex:
+    """缓存论文（标题 + 摘要）上的本地检索：BM25，可选 embedding 余弦检索。"""
+
+    def __init__(self, papers: Sequence[Dict[str, Any]]):
+        self.papers = list(papers)
+        self.bm25 = Bm25Index([f"{paper['title']} {paper['abstract']}" for paper in self.papers])
+        self.vectors: Optional[DisciplineIndex] = None
+        self._embed: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None
+
+    @classmethod
+    def from_store(cls, store: Optional[ArxivStore] = None) -> "ArxivLocalIndex":
+        return cls((store or get_arxiv_store()).all())
+
+    async def abuild_embeddings(self, embed: Callable[[List[str]], Awaitable[List[List[float]]]]):
+        """
+        用 embed（如 EmbeddingMemory.aget_embeddings，自带批量与向量缓存）为全部摘要建立向量索引。
+        """
+        texts = [f"{paper['title']}\n{paper['abstract']}" for paper in self.papers]
+        embeddings = await embed(texts) if texts else []
+        self.vectors = DisciplineIndex([paper["id"] for paper in self.papers], embeddings)
+        self._embed = embed
+
+    def _results(self, indices, scores) -> List[Dict[str, Any]]:
+        return [{**self.papers[i], "score": float(score)} for i, score in zip(indices.tolist(), scores.tolist())]
+
+    def search(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
+        return self._results(*self.bm25.search(query, k))
+
+    async def asearch(self, query: str, k: int = 10, mode: str = "bm25") -> List[Dict[str, Any]]:
+        """mode: "bm25" 或 "embedding"（需要先调用 abuild_embeddings）。"""
+        if mode == "bm25" or self.vectors is None or len(self.papers) == 0:
+            return self.search(query, k)
+        query_embedding = (await self._embed([query]))[0]
+        indices, scores = self.vectors.search(query_embedding, k)
+        return self._results(indices[0], scores[0])
+
+
+_local_indexes: "weakref.WeakKeyDictionary[ArxivStore, Tuple[int, ArxivLocalIndex]]" = weakref.WeakKeyDictionary()
+_local_indexes_lock = threading.Lock()
+# 正在后台重建的索引，同一个 store 同时只有一次重建
+_local_index_tasks: "weakref.WeakKeyDictionary[ArxivStore, asyncio.Future]" = weakref.WeakKeyDictionary()
+
+
+def _build_local_index(store: ArxivStore) -> Tuple[int, ArxivLocalIndex]:
+    # 先取 generation 再读库：读库期间写入的论文会让下一次查询再重建一次，而不会被漏掉
+    generation = store.generation
+    return generation, ArxivLocalIndex.from_store(store)
+
+
+def _cache_local_index(store: ArxivStore, generation: int, index: ArxivLocalIndex):
+    with _local_indexes_lock:
+        cached = _local_indexes.get(store)
+        if cached is None or cached[0] < generation:
+            _local_indexes[store] = (generation, index)
+
+
+def get_arxiv_local_index(store: Optional[ArxivStore] = None) -> ArxivLocalIndex:
+    """进程内缓存的本地 BM25 索引，只有 store 新增或修改了论文（generation 变化）时才重新读取并建索引。"""
+    store = store or get_arxiv_store()
+    with _local_indexes_lock:
+        cached = _local_indexes.get(store)
+        if cached is not None and cached[0] == store.generation:
+            return cached[1]
+    generation, index = _build_local_index(store)
+    _cache_local_index(store, generation, index)
+    return index
+
+
+def _on_local_index_built(store: ArxivStore, task: asyncio.Future):
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.warning(f"rebuilding the local arXiv index failed: {task.exception()}")
+        return
+    _cache_local_index(store, *task.result())
+
+
+async def aget_arxiv_local_index(store: Optional[ArxivStore] = None, min_generation: Optional[int] = None) -> ArxivLocalIndex:
+    """
+    get_arxiv_local_index 的异步版本：重建放在线程中进行，同一个 store 同时只有一次重建，不阻塞事件循环。
+    已有的索引过期时先在后台重建，重建完成前继续返回旧索引；
+    给定 min_generation 时等待至少包含该 generation 写入的论文的索引（例如刚检索入库、需要立即查到的论文）。
+    """
+    store = store or get_arxiv_store()
+    while True:
+        with _local_indexes_lock:
+            cached = _local_indexes.get(store)
+        if cached is not None and cached[0] == store.generation:
+            return cached[1]
+        task = _local_index_tasks.get(store)
+        if task is None or task.done():
+            task = asyncio.ensure_future(asyncio.to_thread(_build_local_index, store))
+            task.add_done_callback(partial(_on_local_index_built, store))
+            _local_index_tasks[store] = task
+        if cached is not None and (min_generation is None or cached[0] >= min_generation):
+            return cached[1]
+        generation, index = await asyncio.shield(task)
+        if min_generation is None or generation >= min_generation:
+            return index
+
+
+async def anovelty_search(query: str, k: int = 10, api_query: Optional[str] = None, max_results: int = 200) -> List[Dict[str, Any]]:
+    """
+    查新：先用 api_query（默认同 query）检索 arXiv 补充本地缓存（命中缓存时不访问接口），
+    再在本地全部缓存论文上做 BM25 检索。本次检索写入了新论文时等待包含它们的索引，否则直接使用现有索引。
+    """
+    store = get_arxiv_store()
+    before = store.generation
+    try:
+        await asearch_arxiv(api_query or query, max_results=max_results, store=store)
+    except Exception as e:
+        logger.warning(f"arXiv search for '{api_query or query}' failed, using local cache only: {e}")
+    after = store.generation
+    index = await aget_arxiv_local_index(store, after if after != before else None)
+    return index.search(query, k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search cached arXiv abstracts locally")
+    parser.add_argument("query")
+    parser.add_argument("--fixture", help="saved Atom response or jsonl dump to load instead of calling the API")
+    parser.add_argument("--db", default=None)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fixture:
+        store = ArxivStore(args.db or os.path.join(TONGYI_CONFIG.get("cache_dir", "./cache"), "arxiv_fixture.sqlite"))
+        loaded = store.load_dump(args.fixture) if args.fixture.endswith(".jsonl") else store.load_atom(args.fixture)
+        print(f"loaded {loaded} papers from {args.fixture}")
+        index = get_arxiv_local_index(store)
+    else:
+        index = None
+    start = time.perf_counter()
+    results = index.search(args.query, args.k) if index else asyncio.run(anovelty_search(args.query, args.k))
+    print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f}ms")
+    for paper in results:
+        print(f"{paper['score']:.2f}  {paper['id']}  {paper['title']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+申请人及团队的引文图与学术影响力指标。
+
+论文用连续的整数 id 表示，引用关系（施引 -> 被引）和论文-作者关系都存成 CSR 数组；
+PageRank、领域归一化被引、合作重叠度都在整张图上向量化计算，
+学术分析师拿到的是一次性算好的 CitationMetrics，而不是每份申请书几十次零散的工具调用。
+"""
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from proposalAgent.utils.logger import get_logger
+
+logger = get_logger("citation_graph")
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def paper_key(title: Optional[str] = None, doi: Optional[str] = None) -> str:
+    """论文去重键：有 DOI 用 DOI，否则用去掉标点、空白后的小写标题。"""
+    if doi:
+        return "doi:" + doi.strip().lower()
+    return "title:" + _NON_WORD.sub("", (title or "").lower())
+
+
+def _normalize_author(name: str) -> str:
+    return " ".join(name.lower().replace(".", " ").split())
+
+
+def _to_csr(rows: np.ndarray, cols: np.ndarray, n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(rows, cols) 边表 -> 去重后的 CSR (indptr, indices)。"""
+    if len(rows):
+        pairs = np.unique(np.stack([rows, cols], axis=1), axis=0)
+        rows, cols = pairs[:, 0], pairs[:, 1]
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32)
+
+
+class CitationGraph:
+    """不可变的引文图，由 CitationGraphBuilder.build() 生成。"""
+
+    def __init__(
+        self,
+        keys: List[str],
+        titles: List[str],
+        years: np.ndarray,
+        fields: np.ndarray,
+        field_names: List[str],
+        citations: np.ndarray,
+        author_names: List[str],
+        authorship: Tuple[np.ndarray, np.ndarray],
+        edges: Tuple[np.ndarray, np.ndarray],
+    ):
+        self.keys = keys
+        self.titles = titles
+        self.years = years
+        self.fields = fields
+        self.field_names = field_names
+        self.author_names = author_names
+        n = len(keys)
+        # 引用关系：indptr / indices 为 施引 -> 被引
+        self.indptr, self.indices = _to_csr(edges[0], edges[1], n)
+        self.out_degree = np.diff(self.indptr)
+        self.in_degree = np.bincount(self.indices, minlength=n)
+        # 论文 -> 作者
+        self.author_indptr, self.author_indices = _to_csr(authorship[0], authorship[1], n)
+        # 外部被引次数未知（-1）时用图内入度代替
+        self.citations = np.where(citations >= 0, citations, self.in_degree).astype(np.float64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def pagerank(self, damping: float = 0.85, tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+        """幂迭代 PageRank，每轮一次 bincount 完成整图的稀疏矩阵乘；没有出边的论文把权重均分给全图。"""
+        n = len(self)
+        if n == 0:
+            return np.zeros(0)
+        sources = np.repeat(np.arange(n), self.out_degree)
+        inv_out = np.zeros(n)
+        np.divide(1.0, self.out_degree, out=inv_out, where=self.out_degree > 0)
+        dangling = self.out_degree == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            spread = np.bincount(self.indices, weights=(rank * inv_out)[sources], minlength=n)
+            new_rank = (1 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+            if np.abs(new_rank - rank).sum() < tol:
+                return new_rank
+            rank = new_rank
+        return rank
+
+    def field_normalized_citations(self) -> np.ndarray:
+        """被引次数 / 同领域同年份论文的平均被引次数（年份未知的论文单独成组）。"""
+        if len(self) == 0:
+            return np.zeros(0)
+        groups = np.unique(np.stack([self.fields, self.years], axis=1), axis=0, return_inverse=True)[1].ravel()
+        totals = np.bincount(groups, weights=self.citations)
+        counts = np.bincount(groups)
+        baseline = totals[groups] / counts[groups]
+        return np.divide(self.citations, baseline, out=np.zeros(len(self)), where=baseline > 0)
+
+    def author_paper_matrix(self, author_ids: Sequence[int]) -> np.ndarray:
+        """(len(author_ids), 论文数) 的 0/1 矩阵。"""
+        matrix = np.zeros((len(author_ids), len(self)), dtype=np.int32)
+        papers = np.repeat(np.arange(len(self)), np.diff(self.author_indptr))
+        for row, author in enumerate(author_ids):
+            matrix[row, papers[self.author_indices == author]] = 1
+        return matrix
+
+    def coauthorship(self, author_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (两两合著论文数, 合作者集合的 Jaccard 重叠度)，均为 (t, t)。
+        """
+        papers = self.author_paper_matrix(author_ids)
+        shared = papers @ papers.T
+        # 每个成员的合作者集合（论文 -> 作者 的 0/1 矩阵相乘），去掉团队成员本身
+        incidence = np.zeros((len(self), len(self.author_names)), dtype=np.int32)
+        incidence[np.repeat(np.arange(len(self)), np.diff(self.author_indptr)), self.author_indices] = 1
+        coauthors = (papers @ incidence > 0).astype(np.int32)
+        coauthors[:, list(author_ids)] = 0
+        intersection = coauthors @ coauthors.T
+        sizes = coauthors.sum(axis=1)
+        union = sizes[:, None] + sizes[None, :] - intersection
+        overlap = np.divide(intersection, union, out=np.zeros(union.shape), where=union > 0)
+        return shared, overlap
+
+    def metrics(self, team: Sequence[str], damping: float = 0.85) -> "CitationMetrics":
+        author_index = {name: i for i, name in enumerate(self.author_names)}
+        team_ids = [author_index.get(_normalize_author(member), -1) for member in team]
+        known = [i for i in team_ids if i >= 0]
+        pagerank = self.pagerank(damping)
+        fnci = self.field_normalized_citations()
+        shared = np.zeros((len(team), len(team)), dtype=np.int32)
+        overlap = np.zeros((len(team), len(team)))
+        if known:
+            positions = [k for k, i in enumerate(team_ids) if i >= 0]
+            known_shared, known_overlap = self.coauthorship(known)
+            shared[np.ix_(positions, positions)] = known_shared
+            overlap[np.ix_(positions, positions)] = known_overlap
+        papers = self.author_paper_matrix([max(i, 0) for i in team_ids])
+        papers[[k for k, i in enumerate(team_ids) if i < 0]] = 0
+        return CitationMetrics(
+            graph=self,
+            team=list(team),
+            pagerank=pagerank,
+            field_normalized_citations=fnci,
+            team_papers=papers.astype(bool),
+            shared_papers=shared,
+            coauthor_overlap=overlap,
+        )
+
+
+@dataclass
+class CitationMetrics:
+    """一次性算好的团队学术影响力指标，to_dict() 给出可以直接放进 prompt 的摘要。"""
+
+    graph: CitationGraph
+    team: List[str]
+    pagerank: np.ndarray
+    field_normalized_citations: np.ndarray
+    team_papers: np.ndarray
+    shared_papers: np.ndarray
+    coauthor_overlap: np.ndarray
+
+    def author_summary(self, top_k: int = 5) -> Dict[str, Dict[str, Any]]:
+        # PageRank 乘以论文数，使不同规模的图之间可比（均匀分布时每篇为 1）
+        influence = self.pagerank * len(self.graph)
+        summary = {}
+        for row, member in enumerate(self.team):
+            mask = self.team_papers[row]
+            ids = np.flatnonzero(mask)
+            top = ids[np.argsort(-influence[ids])[:top_k]]
+            summary[member] = {
+                "papers": int(mask.sum()),
+                "citations": int(self.graph.citations[mask].sum()),
+                "influence": float(influence[mask].sum()),
+                "mean_field_normalized_citations": float(self.field_normalized_citations[mask].mean()) if mask.any() else 0.0,
+                "top_papers": [
+                    {
+                        "title": self.graph.titles[i],
+                        "year": int(self.graph.years[i]) or None,
+                        "citations": int(self.graph.citations[i]),
+                        "influence": round(float(influence[i]), 3),
+                        "field_normalized_citations": round(float(self.field_normalized_citations[i]), 3),
+                    }
+                    for i in top
+                ],
+            }
+        return summary
+
+    def to_dict(self, top_k: int = 5) -> Dict[str, Any]:
+        pairs = [
+            {
+                "members": [self.team[i], self.team[j]],
+                "shared_papers": int(self.shared_papers[i, j]),
+                "coauthor_overlap": round(float(self.coauthor_overlap[i, j]), 3),
+            }
+            for i in range(len(self.team))
+            for j in range(i + 1, len(self.team))
+            if self.shared_papers[i, j] or self.coauthor_overlap[i, j]
+        ]
+        return {
+            "papers": len(self.graph),
+            "citation_edges": self.graph.num_edges,
+            "authors": self.author_summary(top_k),
+            "collaboration": sorted(pairs, key=lambda pair: (-pair["shared_papers"], -pair["coauthor_overlap"])),
+        }
+
+
+class CitationGraphBuilder:
+    """逐条加入论文、作者和引用关系，build() 时一次性转换成 CSR 数组。"""
+
+    def __init__(self):
+        self._paper_ids: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.titles: List[str] = []
+        self.years: List[int] = []
+        self.fields: List[int] = []
+        self.citations: List[int] = []
+        self._field_ids: Dict[str, int] = {}
+        self._author_ids: Dict[str, int] = {}
+        self._authorship: List[Tuple[int, int]] = []
+        self._edges: List[Tuple[int, int]] = []
+
+    def author_id(self, name: str) -> int:
+        name = _normalize_author(name)
+        if name not in self._author_ids:
+            self._author_ids[name] = len(self._author_ids)
+        return self._author_ids[name]
+
+    def add_paper(
+        self,
+        title: str,
+        year=None,
+        authors: Iterable[str] = (),
+        citations: Optional[int] = None,
+        field: Optional[str] = None,
+        doi: Optional[str] = None,
+    ) -> int:
+        """加入一篇论文并返回其 id；同一篇论文重复加入时合并作者并补全缺失的属性。"""
+        key = paper_key(title, doi)
+        paper = self._paper_ids.get(key)
+        if paper is None:
+            paper = self._paper_ids[key] = len(self.keys)
+            self.keys.append(key)
+            self.titles.append(title or "")
+            self.years.append(0)
+            self.fields.append(self._field_ids.setdefault(field or "", len(self._field_ids)))
+            self.citations.append(-1)
+        try:
+            if year and not self.years[paper]:
+                self.years[paper] = int(year)
+        except (TypeError, ValueError):
+            pass
+        if citations is not None:
+            self.citations[paper] = max(self.citations[paper], int(citations))
+        if field and self.fields[paper] == self._field_ids.get(""):
+            self.fields[paper] = self._field_ids.setdefault(field, len(self._field_ids))
+        for author in authors:
+            if author and author.strip():
+                self._authorship.append((paper, self.author_id(author)))
+        return paper
+
+    def add_authorship(self, paper: int, author: str):
+        self._authorship.append((paper, self.author_id(author)))
+
+    def add_citation(self, citing: int, cited: int):
+        if citing != cited:
+            self._edges.append((citing, cited))
+
+    def build(self) -> CitationGraph:
+        authorship = np.asarray(self._authorship, dtype=np.int64).reshape(-1, 2)
+        edges = np.asarray(self._edges, dtype=np.int64).reshape(-1, 2)
+        return CitationGraph(
+            keys=list(self.keys),
+            titles=list(self.titles),
+            years=np.asarray(self.years, dtype=np.int32),
+            fields=np.asarray(self.fields, dtype=np.int32),
+            field_names=sorted(self._field_ids, key=self._field_ids.get),
+            citations=np.asarray(self.citations, dtype=np.int64),
+            author_names=sorted(self._author_ids, key=self._author_ids.get),
+            authorship=(authorship[:, 0], authorship[:, 1]),
+            edges=(edges[:, 0], edges[:, 1]),
+        )
+
+
+def _split_authors(authors) -> List[str]:
+    if isinstance(authors, str):
+        return [name.strip() for name in authors.split(",") if name.strip() and name.strip() != "..."]
+    return [name for name in authors or [] if name]
+
+
+async def abuild_team_citation_metrics(
+    team: Sequence[str],
+    max_papers: int = 20,
+    max_cited_by: int = 20,
+    field: Optional[str] = None,
+    publications: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+) -> CitationMetrics:
+    """
+    为整个项目团队构建引文图并计算指标。
+
+    Args:
+        team (Sequence[str]): 申请人与团队成员姓名（或 "id:<作者 id>" / Google Scholar 主页链接形式的作者 id）。
+        max_papers (int): 每位成员纳入的高被引论文数。
+        max_cited_by (int): 每篇论文拉取的施引文献数。
+        field (str, optional): 团队论文所属领域（如申请书的一级学科），用于领域归一化。
+        publications (Dict[str, List[dict]], optional): 额外的论文记录 {成员: [{title, year, doi, authors}]}，
+            带 DOI 的记录通过 WoS 批量查询被引次数。
+    """
+    # 检索客户端在用到时才导入：图结构与指标计算只依赖 numpy，不需要 serpapi / WoS 的依赖和密钥
+    from proposalAgent.tools.academic_analysis.google_scholar import acited_by, afetch_author_profiles
+    from proposalAgent.tools.academic_analysis.wos_util import acitation_counts
+
+    builder = CitationGraphBuilder()
+    profiles = await afetch_author_profiles(team, max_articles=max_papers, top_papers=max_papers)
+    cited_jobs: List[Tuple[int, str]] = []
+    for member in team:
+        profile = profiles.get(member.strip()) or {}
+        if "error" in profile:
+            logger.warning(f"no scholar profile for {member}: {profile['error']}")
+        for paper in profile.get("top_papers") or []:
+            paper_id = builder.add_paper(paper["title"], paper.get("year"), _split_authors(paper.get("authors")), paper.get("cited_by"), field)
+            builder.add_authorship(paper_id, member)
+            if paper.get("cites_id"):
+                cited_jobs.append((paper_id, paper["cites_id"]))
+
+    extra = [(member, record) for member, records in (publications or {}).items() for record in records]
+    dois = [record["doi"] for _, record in extra if record.get("doi")]
+    wos_counts, citing_lists = await asyncio.gather(
+        acitation_counts(dois) if dois else asyncio.sleep(0, result={}),
+        asyncio.gather(*[acited_by(cites_id, max_cited_by) for _, cites_id in cited_jobs], return_exceptions=True),
+    )
+    for member, record in extra:
+        paper_id = builder.add_paper(
+            record.get("title"), record.get("year"), _split_authors(record.get("authors")),
+            wos_counts.get(record.get("doi")), field, record.get("doi"),
+        )
+        builder.add_authorship(paper_id, member)
+    for (paper_id, _), citing in zip(cited_jobs, citing_lists):
+        if isinstance(citing, Exception):
+            logger.warning(f"cited-by lookup failed for '{builder.titles[paper_id]}': {citing}")
+            continue
+        for record in citing:
+            citing_id = builder.add_paper(record["title"], record.get("year"), record.get("authors") or [], record.get("cited_by"))
+            builder.add_citation(citing_id, paper_id)
+    return builder.build().metrics(team)
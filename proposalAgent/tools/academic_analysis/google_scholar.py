@@ -1,7 +1,11 @@
+import asyncio
 import json
+import os
+import re
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
 import time
 import random
 from tenacity import (
@@ -14,6 +18,33 @@ from tenacity import (
 import httpx
 from serpapi import GoogleSearch
 
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.utils.cache import get_response_cache, make_key
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import TokenBucket
+
+logger = get_logger("google_scholar")
+
+SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY", "6d2adf2afad17ed350e212b43f22cb6f0a5927ccf5e576004411ad2de0ca9c3a")
+# SerpAPI 按月限额，学者信息变化很慢，默认缓存 30 天
+SERPAPI_CACHE_TTL = TONGYI_CONFIG.get("serpapi_cache_ttl", 30 * 24 * 3600)
+# 所有 SerpAPI 请求共用一个令牌桶，缓存命中不消耗令牌
+_serpapi_bucket = TokenBucket(
+    rate=TONGYI_CONFIG.get("serpapi_requests_per_second", 5),
+    capacity=TONGYI_CONFIG.get("serpapi_burst", 10),
+)
+# 显式给出的 Google Scholar 作者 id："id:LSsXyncAAAAJ"，或学者主页链接 ".../citations?user=LSsXyncAAAAJ&hl=en"。
+# 不带前缀的 12 位字符串不当作 id，否则 "ZhangWeiming" 这类不含空格的姓名会被误判
+AUTHOR_ID_PATTERN = re.compile(r"(?:id:\s*|\S*[?&]user=)([A-Za-z0-9_-]{12})(?:[&#]\S*)?", re.IGNORECASE)
+AUTHOR_ARTICLES_PAGE_SIZE = 100
+
+
+class SerpApiError(RuntimeError):
+    """SerpAPI 返回了 error 字段（配额用尽、参数错误等），此类结果不会被缓存。"""
+
+
+def _get_cache():
+    return get_response_cache(TONGYI_CONFIG.get("response_cache_path"))
 
 
 @retry(
@@ -21,6 +52,24 @@ from serpapi import GoogleSearch
     wait=wait_exponential(multiplier=1, min=4, max=60),
     stop=stop_after_attempt(5),
 )
+def _serpapi_request(params: dict) -> dict:
+    _serpapi_bucket.acquire_sync()
+    search = GoogleSearch({**params, "api_key": SERPAPI_API_KEY})
+    results = search.get_dict()
+    if "error" in results:
+        raise SerpApiError(results["error"])
+    return results
+
+
+def serpapi_search(params: dict) -> dict:
+    """带缓存的 SerpAPI 请求，以 engine + 查询参数为键（不含 api_key），并发的相同请求只会真正调用一次。"""
+    return _get_cache().get_or_fetch(make_key("serpapi", params), lambda: _serpapi_request(params), SERPAPI_CACHE_TTL)
+
+
+async def aserpapi_search(params: dict) -> dict:
+    """serpapi_search 的异步版本，SerpAPI 的阻塞请求在线程池中执行。"""
+    return await _get_cache().aget_or_fetch(make_key("serpapi", params), lambda: _serpapi_request(params), SERPAPI_CACHE_TTL)
+
 
 def search_google_sholar(query:str):
     """ search google scholar by query, query can be an article, an author
@@ -28,30 +77,174 @@ def search_google_sholar(query:str):
     Args:
         query (str): an article, an author
     """
-    params = {
-    "engine": "google_scholar",
-    "q": query,
-    "api_key": "6d2adf2afad17ed350e212b43f22cb6f0a5927ccf5e576004411ad2de0ca9c3a"
-    }
-    search = GoogleSearch(params)
-    results = search.get_dict()
+    results = serpapi_search({"engine": "google_scholar", "q": query})
     organic_results = results["organic_results"]
     return organic_results
-    
+
+
+async def asearch_google_sholar(query:str):
+    """Async version of search_google_sholar"""
+    results = await aserpapi_search({"engine": "google_scholar", "q": query})
+    return results["organic_results"]
+
+
 def get_author_detail(author_id:str):
     """Get author detail from google scholar"""
-    params = {
-    "engine": "google_scholar",
-    "q": author_id,
-    "api_key": "6d2adf2afad17ed350e212b43f22cb6f0a5927ccf5e576004411ad2de0ca9c3a"
-    }
-
-    search = GoogleSearch(params)
-    results = search.get_dict()
+    results = serpapi_search({"engine": "google_scholar", "q": author_id})
     author_results = results["author_results"]
     return author_results
 
 
+async def aget_author_detail(author_id:str):
+    """Async version of get_author_detail"""
+    results = await aserpapi_search({"engine": "google_scholar", "q": author_id})
+    return results["author_results"]
+
+
+
+# ---------- 批量作者画像 ----------
+def _cited_by_stats(cited_by: dict) -> Dict[str, Any]:
+    """把 google_scholar_author 的 cited_by.table 展平成 citations / h_index / i10_index（全部 + 近五年）。"""
+    stats = {}
+    for row in (cited_by or {}).get("table", []):
+        for metric, values in row.items():
+            for period, value in values.items():
+                stats[metric if period == "all" else f"{metric}_recent"] = value
+    return stats
+
+
+def parse_author_id(name_or_id: str) -> Optional[str]:
+    """从 "id:..." 或学者主页链接中取出作者 id，其余输入（姓名）返回 None。"""
+    match = AUTHOR_ID_PATTERN.fullmatch(name_or_id.strip())
+    return match.group(1) if match else None
+
+
+async def _aresolve_author_id(name_or_id: str) -> Optional[Dict[str, Any]]:
+    """显式给出的作者 id 直接使用；姓名通过 google_scholar_profiles 取最匹配的一个学者主页。"""
+    author_id = parse_author_id(name_or_id)
+    if author_id is not None:
+        return {"author_id": author_id}
+    results = await aserpapi_search({"engine": "google_scholar_profiles", "mauthors": name_or_id})
+    profiles = results.get("profiles") or []
+    return profiles[0] if profiles else None
+
+
+async def _afetch_author_articles(author_id: str, max_articles: int):
+    """按被引排序分页拉取作者论文，返回 (第一页的完整结果, 论文列表)。"""
+    first = None
+    articles: List[dict] = []
+    start = 0
+    while len(articles) < max_articles:
+        num = min(AUTHOR_ARTICLES_PAGE_SIZE, max_articles - len(articles))
+        page = await aserpapi_search({"engine": "google_scholar_author", "author_id": author_id, "start": start, "num": num})
+        first = first or page
+        page_articles = page.get("articles") or []
+        articles.extend(page_articles)
+        if len(page_articles) < num or "next" not in (page.get("serpapi_pagination") or {}):
+            break
+        start += num
+    return first, articles[:max_articles]
+
+
+async def afetch_author_profile(name_or_id: str, max_articles: int = 20, top_papers: int = 5) -> Dict[str, Any]:
+    """
+    获取单个作者的精简画像。
+
+    Args:
+        name_or_id (str): 作者姓名，或 "id:作者id" / 学者主页链接。
+        max_articles (int): 最多拉取的论文数（超过 100 篇时分页）。
+        top_papers (int): 记录中保留的高被引论文数。
+
+    Returns:
+        Dict[str, Any]: query / author_id / name / affiliations / interests / citations / h_index / i10_index /
+        articles_fetched / top_papers；查不到或请求失败时只包含 query 和 error。
+    """
+    try:
+        profile = await _aresolve_author_id(name_or_id)
+        if profile is None:
+            return {"query": name_or_id, "error": "author not found"}
+        author_id = profile["author_id"]
+        detail, articles = await _afetch_author_articles(author_id, max_articles)
+    except Exception as e:
+        logger.warning(f"fetch author profile of {name_or_id} failed: {e}")
+        return {"query": name_or_id, "error": str(e)}
+
+    author = detail.get("author") or {}
+    articles = sorted(articles, key=lambda article: (article.get("cited_by") or {}).get("value") or 0, reverse=True)
+    return {
+        "query": name_or_id,
+        "author_id": author_id,
+        "name": author.get("name") or profile.get("name"),
+        "affiliations": author.get("affiliations") or profile.get("affiliations"),
+        "interests": [interest.get("title") for interest in author.get("interests") or [] if interest.get("title")]
+        or [interest.get("title") for interest in profile.get("interests") or [] if interest.get("title")],
+        **_cited_by_stats(detail.get("cited_by")),
+        "articles_fetched": len(articles),
+        "top_papers": [
+            {
+                "title": article.get("title"),
+                "year": article.get("year"),
+                "publication": article.get("publication"),
+                "authors": article.get("authors"),
+                "cited_by": (article.get("cited_by") or {}).get("value") or 0,
+                "cites_id": (article.get("cited_by") or {}).get("cites_id"),
+            }
+            for article in articles[:top_papers]
+        ],
+    }
+
+
+async def afetch_author_profiles(authors: Sequence[str], max_articles: int = 20, top_papers: int = 5) -> Dict[str, Dict[str, Any]]:
+    """
+    批量获取整个项目团队的作者画像：去重后所有作者并发请求（受 SerpAPI 令牌桶限速），
+    命中缓存的作者不消耗配额，解析到同一个作者 id 的不同写法只会请求一次。
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 去重后的输入（去掉首尾空白）-> afetch_author_profile 的记录。
+    """
+    unique = list(dict.fromkeys(author.strip() for author in authors if author and author.strip()))
+    records = await asyncio.gather(*[afetch_author_profile(author, max_articles, top_papers) for author in unique])
+    return dict(zip(unique, records))
+
+
+def fetch_author_profiles(authors: Sequence[str], max_articles: int = 20, top_papers: int = 5) -> Dict[str, Dict[str, Any]]:
+    """afetch_author_profiles 的同步入口，不能在正在运行的事件循环中调用。"""
+    return asyncio.run(afetch_author_profiles(authors, max_articles, top_papers))
+
+
+_YEAR_PATTERN = re.compile(r"\b(?:19|20)\d{2}\b")
+
+
+async def acited_by(cites_id: str, max_results: int = 20) -> List[Dict[str, Any]]:
+    """
+    通过 google_scholar 的 cites 参数获取引用某篇论文的文献（每页 20 条，按需翻页）。
+
+    Returns:
+        List[Dict[str, Any]]: title / year / authors / cited_by / cites_id。
+    """
+    records: List[Dict[str, Any]] = []
+    start = 0
+    while len(records) < max_results:
+        num = min(20, max_results - len(records))
+        results = await aserpapi_search({"engine": "google_scholar", "cites": cites_id, "start": start, "num": num})
+        page = results.get("organic_results") or []
+        for item in page:
+            info = item.get("publication_info") or {}
+            cited_by = (item.get("inline_links") or {}).get("cited_by") or {}
+            year = _YEAR_PATTERN.findall(info.get("summary") or "")
+            records.append({
+                "title": item.get("title"),
+                "year": year[-1] if year else None,
+                "authors": [author.get("name") for author in info.get("authors") or []]
+                or (info.get("summary") or "").split(" - ")[0].split(", "),
+                "cited_by": cited_by.get("total") or 0,
+                "cites_id": cited_by.get("cites_id"),
+            })
+        if len(page) < num or "next" not in (results.get("serpapi_pagination") or {}):
+            break
+        start += num
+    return records[:max_results]
+
     
 
 if __name__ == "__main__":
@@ -1,77 +1,213 @@
-# # StarterAPI接口：
-# import requests
-
-# heads = {
-#     "accept": "application/json",
-#     "X-ApiKey": "20f4de6b439cbffdb64c046d0252e2333172255b"
-# }
-
-# url = "https://wos-api.clarivate.com/api/wos/?databaseId=WOS&usrQuery=ts%3D%28duyi%29&count=10&firstRecord=1&sortField=LD%2BD&optionView=FR"
-# response = requests.get(url, headers=heads)
-# print(response.text)
-
+"""
+Web of Science Starter API 的异步检索工具。
+
+- 直接调用 Starter REST 接口（clarivate.wos_starter.client 只有同步实现），所有请求复用同一个 httpx 连接池并共用令牌桶限速；
+- 每页固定取接口上限 50 条，拿到第一页的 total 后并发预取后续页，总结果数受 max_results 限制；
+- 每一页的响应按 (查询, 库, 排序, 页) 持久化缓存，并发的相同请求只调用一次接口；
+- acitation_counts 把整份参考文献列表（DOI / WOS UT）拼成 OR 查询，每 50 条一个请求、全部并发，一轮完成被引次数查询。
+
+ExpandedAPI（https://api.clarivate.com/api/wos/）需要另外的授权，这里只使用 Starter API。
+"""
+import asyncio
+import math
+import os
+import weakref
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from tenacity import (
+    retry,
+    stop_after_attempt,
+    wait_exponential,
+    retry_if_exception_type,
+    retry_if_result,
+)
 
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.utils.cache import get_response_cache, make_key
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import TokenBucket
 
-# # ExpandedAPI接口：
-# import requests
-# import json
-# import io
-# import sys
+logger = get_logger("wos_util")
 
-# sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="gb18030")
-# heads = {
-#     "accept": "application/json",
-#     "X-ApiKey": "20f4de6b439cbffdb64c046d0252e2333172255b"
-# }
+WOS_STARTER_URL = "https://api.clarivate.com/apis/wos-starter/v1/documents"
+MAX_PAGE_SIZE = 50
+WOS_CACHE_TTL = TONGYI_CONFIG.get("wos_cache_ttl", 7 * 24 * 3600)
 
-# url_new = "https://api.clarivate.com/api/wos/?databaseId=WOS&usrQuery=(UT=(WOS:001321517500001 ))&count=1&firstRecord=1"
-# response = requests.get(url_new, headers=heads)
-# text = response.text
-# js = json.loads(text)
-# print(text)
+_wos_bucket = TokenBucket(
+    rate=TONGYI_CONFIG.get("wos_requests_per_second", 5),
+    capacity=TONGYI_CONFIG.get("wos_requests_per_second", 5),
+)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
 
 
-import os
-import time
-import clarivate.wos_starter.client
-from clarivate.wos_starter.client.rest import ApiException
-from pprint import pprint
-
-# Defining the host is optional and defaults to http://api.clarivate.com/apis/wos-starter/v1
-# See configuration.py for a list of all supported configuration parameters.
-configuration = clarivate.wos_starter.client.Configuration(
-    host = "https://api.clarivate.com/apis/wos-starter/v1"
-)
+def wos_api_key() -> str:
+    """API key 只从环境变量 WOS_API_KEY 读取，未设置时直接报错。"""
+    api_key = os.getenv("WOS_API_KEY")
+    if not api_key:
+        raise RuntimeError("WOS_API_KEY is not set; export your Web of Science Starter API key to query WoS")
+    return api_key
 
-# The client must configure the authentication and authorization parameters
-# in accordance with the API server security policy.
-# Examples for each auth method are provided below, use the example that
-# satisfies your auth use case.
 
-# Configure API key authorization: ClarivateApiKeyAuth
-configuration.api_key['ClarivateApiKeyAuth'] = "3349abbc61f8332387af654285930d6ac2d875ca"
+def get_wos_client() -> httpx.AsyncClient:
+    """当前事件循环共享的 WoS 连接池。"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers={"accept": "application/json", "X-ApiKey": wos_api_key()},
+            timeout=30,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+        _clients[loop] = client
+    return client
 
-# Uncomment below to setup prefix (e.g. Bearer) for API key, if needed
-# configuration.api_key_prefix['ClarivateApiKeyAuth'] = 'Bearer'
 
+def _is_rate_limited(response: httpx.Response) -> bool:
+    return response.status_code == 429
 
-# Enter a context with an instance of the API client
-with clarivate.wos_starter.client.ApiClient(configuration) as api_client:
-    # Create an instance of the API class
-    api_instance = clarivate.wos_starter.client.DocumentsApi(api_client)
-    q = 'PY=2020' # str | Web of Science advanced [advanced search query builder](https://webofscience.help.clarivate.com/en-us/Content/advanced-search.html). The supported field tags are listed in description.
-    db = 'WOS' # str | Web of Science Database abbreviation * WOS - Web of Science Core collection * BIOABS - Biological Abstracts * BCI - BIOSIS Citation Index * BIOSIS - BIOSIS Previews * CCC - Current Contents Connect * DIIDW - Derwent Innovations Index * DRCI - Data Citation Index * MEDLINE - MEDLINE The U.S. National Library of Medicine® (NLM®) premier life sciences database. * ZOOREC - Zoological Records * PPRN - Preprint Citation Index * WOK - All databases  (optional) (default to 'WOS')
-    limit = 10 # int | set the limit of records on the page (1-50) (optional) (default to 10)
-    page = 1 # int | set the result page (optional) (default to 1)
-    sort_field = 'LD+D' # str | Order by field(s). Field name and order by clause separated by '+', use A for ASC and D for DESC, ex: PY+D. Multiple values are separated by comma. Supported fields:  * **LD** - Load Date * **PY** - Publication Year * **RS** - Relevance * **TC** - Times Cited  (optional)
-    modified_time_span = None # str | Defines a date range in which the results were most recently modified. Beginning and end dates must be specified in the yyyy-mm-dd format separated by '+' or ' ', e.g. 2023-01-01+2023-12-31. This parameter is not compatible with the all databases search, i.e. db=WOK is not compatible with this parameter. (optional)
-    tc_modified_time_span = None # str | Defines a date range in which times cited counts were modified. Beginning and end dates must be specified in the yyyy-mm-dd format separated by '+' or ' ', e.g. 2023-01-01+2023-12-31. This parameter is not compatible with the all databases search, i.e. db=WOK is not compatible with this parameter. (optional)
-    detail = None # str | it will returns the full data by default, if detail=short it returns the limited data (optional)
 
+@retry(
+    retry=(retry_if_result(_is_rate_limited) | retry_if_exception_type(httpx.TransportError)),
+    wait=wait_exponential(multiplier=1, min=2, max=60),
+    stop=stop_after_attempt(5),
+)
+async def _request(params: Dict[str, Any]) -> httpx.Response:
+    await _wos_bucket.acquire()
+    response = await get_wos_client().get(WOS_STARTER_URL, params=params)
+    if not _is_rate_limited(response):
+        response.raise_for_status()
+    return response
+
+
+async def _fetch_page(params: Dict[str, Any]) -> Dict[str, Any]:
+    return (await _request(params)).json()
+
+
+async def aget_page(q: str, db: str = "WOS", sort_field: Optional[str] = None, page: int = 1, limit: int = MAX_PAGE_SIZE) -> Dict[str, Any]:
+    """带缓存的单页查询，返回接口原始的 {"metadata": ..., "hits": [...]}。"""
+    params = {"q": q, "db": db, "limit": limit, "page": page}
+    if sort_field:
+        params["sortField"] = sort_field
+    cache = get_response_cache(TONGYI_CONFIG.get("response_cache_path"))
+    return await cache.aget_or_fetch(make_key("wos_starter", params), partial(_fetch_page, params), WOS_CACHE_TTL)
+
+
+def compact_hit(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """把 Starter API 的一条记录压缩成分析师需要的字段。"""
+    source = hit.get("source") or {}
+    identifiers = hit.get("identifiers") or {}
+    citations = {item.get("db"): item.get("count") for item in hit.get("citations") or []}
+    return {
+        "uid": hit.get("uid"),
+        "title": hit.get("title"),
+        "year": source.get("publishYear"),
+        "source": source.get("sourceTitle"),
+        "doi": identifiers.get("doi"),
+        "authors": [author.get("displayName") for author in (hit.get("names") or {}).get("authors") or []],
+        "keywords": (hit.get("keywords") or {}).get("authorKeywords") or [],
+        "times_cited": citations.get("WOS", next(iter(citations.values()), None)),
+    }
+
+
+async def asearch_wos(
+    q: str,
+    db: str = "WOS",
+    sort_field: Optional[str] = None,
+    max_results: Optional[int] = None,
+    prefetch: int = 4,
+) -> Dict[str, Any]:
+    """
+    检索 Web of Science。
+
+    Args:
+        q (str): WoS 高级检索式，如 'TS=(graph neural network) AND PY=2020-2024'。
+        db (str): 库名，默认 WOS 核心合集。
+        sort_field (str, optional): 排序，如 'TC+D'（被引降序）、'PY+D'、'LD+D'。
+        max_results (int, optional): 最多返回的记录数，默认取配置 wos_max_results。
+        prefetch (int): 后续页的并发请求数。
+
+    Returns:
+        Dict[str, Any]: {"total": 命中总数, "records": [compact_hit(...)]}。
+    """
+    max_results = max_results or TONGYI_CONFIG.get("wos_max_results", 200)
+    limit = min(MAX_PAGE_SIZE, max_results)
+    first = await aget_page(q, db, sort_field, 1, limit)
+    total = (first.get("metadata") or {}).get("total") or 0
+    hits = list(first.get("hits") or [])
+    pages = math.ceil(min(total, max_results) / limit)
+    if pages > 1:
+        semaphore = asyncio.Semaphore(prefetch)
+
+        async def fetch(page):
+            async with semaphore:
+                return await aget_page(q, db, sort_field, page, limit)
+
+        for result in await asyncio.gather(*[fetch(page) for page in range(2, pages + 1)]):
+            hits.extend(result.get("hits") or [])
+    return {"total": total, "records": [compact_hit(hit) for hit in hits[:max_results]]}
+
+
+async def _search_and_close(*args) -> Dict[str, Any]:
     try:
-        # Query Web of Science documents 
-        api_response = api_instance.documents_get(q, db=db, limit=limit, page=page, sort_field=sort_field, modified_time_span=modified_time_span, tc_modified_time_span=tc_modified_time_span, detail=detail)
-        print("The response of DocumentsApi->documents_get:\n")
-        pprint(api_response)
-    except ApiException as e:
-        print("Exception when calling DocumentsApi->documents_get: %s\n" % e)
+        return await asearch_wos(*args)
+    finally:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def search_wos(q: str, db: str = "WOS", sort_field: Optional[str] = None, max_results: Optional[int] = None) -> Dict[str, Any]:
+    """asearch_wos 的同步入口，不能在正在运行的事件循环中调用。"""
+    return asyncio.run(_search_and_close(q, db, sort_field, max_results))
+
+
+def _reference_field(reference: str) -> str:
+    return "UT" if reference.upper().startswith("WOS:") else "DO"
+
+
+def _quote(reference: str) -> str:
+    # DOI 中可能含有括号等检索式保留字符
+    return '"' + reference.replace('"', "") + '"'
+
+
+async def acitation_counts(references: Sequence[str], db: str = "WOS") -> Dict[str, Optional[int]]:
+    """
+    批量查询参考文献的被引次数。
+
+    Args:
+        references (Sequence[str]): DOI 或 WOS UT（如 'WOS:000123456700001'）列表。
+
+    Returns:
+        Dict[str, Optional[int]]: 参考文献 -> 被引次数，WoS 中查不到的为 None。
+    """
+    unique = list(dict.fromkeys(ref.strip() for ref in references if ref and ref.strip()))
+    groups: Dict[str, List[str]] = {}
+    for ref in unique:
+        groups.setdefault(_reference_field(ref), []).append(ref)
+    queries = [
+        (field, f"{field}=({' OR '.join(map(_quote, chunk))})")
+        for field, refs in groups.items()
+        for chunk in (refs[i:i + MAX_PAGE_SIZE] for i in range(0, len(refs), MAX_PAGE_SIZE))
+    ]
+    if queries:
+        # 缺少 key 时每一页都会失败，提前报错，而不是逐页记录警告后返回全部为 None 的结果
+        wos_api_key()
+    pages = await asyncio.gather(*[aget_page(q, db) for _, q in queries], return_exceptions=True)
+
+    found: Dict[str, Optional[int]] = {}
+    for (field, q), page in zip(queries, pages):
+        if isinstance(page, Exception):
+            logger.warning(f"citation count query failed ({q[:80]}...): {page}")
+            continue
+        for hit in page.get("hits") or []:
+            record = compact_hit(hit)
+            key = (record["uid"] if field == "UT" else record["doi"] or "").lower()
+            if key:
+                found[key] = record["times_cited"]
+    return {ref: found.get(ref.lower()) for ref in unique}
+
+
+if __name__ == "__main__":
+    print(search_wos("TS=(proposal review) AND PY=2020", sort_field="TC+D", max_results=60))
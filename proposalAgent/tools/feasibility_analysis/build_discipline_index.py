@@ -0,0 +1,232 @@
+"""
+学科向量索引的增量构建命令。
+
+- 每个 embedding 请求批量发送多个二级学科名称（DashScope 单次上限 10 条）；
+- 每批结果立即追加写入以文本哈希为键的 checkpoint（jsonl），中途崩溃或限流后重跑会从断点继续；
+- 重建时已存在于 checkpoint 的学科不再请求接口，只对 Chroma / Milvus 写入新增的条目、删除已移除的条目；
+  NumPy 索引直接由 checkpoint 重新导出，不需要任何接口调用。
+
+用法：python -m proposalAgent.tools.feasibility_analysis.build_discipline_index --disciplines ./disciplines.json --backends chroma milvus numpy
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from openai import AsyncOpenAI
+
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+from proposalAgent.tools.feasibility_analysis.discipline_tree import DisciplineTree
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import estimate_tokens, get_governor
+
+logger = get_logger("build_discipline_index")
+
+EMBEDDING_MODEL = "text-embedding-v4"
+EMBEDDING_DIM = 1024
+COLLECTION_NAME = "discipline_embeddings"
+
+_client = None
+
+
+def _get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.getenv("DASHSCOPE_API_KEY"),
+            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+        )
+    return _client
+
+
+def text_key(text: str, model: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM) -> str:
+    """checkpoint / 向量库中的条目 id：模型、维度或文本任一变化都会得到新的键。"""
+    return hashlib.sha256(f"{model}\x00{dim}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+
+async def embed_batch(texts: Sequence[str], model: str = EMBEDDING_MODEL, dim: int = EMBEDDING_DIM) -> List[List[float]]:
+    # 限流与 429 / 5xx 退避重试由进程级的 governor 负责，与图运行中的 embedding 调用共用预算
+    completion = await get_governor("tongyi", model).acall(
+        _get_client().embeddings.create,
+        model=model,
+        input=list(texts),
+        dimensions=dim,
+        encoding_format="float",
+        estimated_tokens=sum(map(estimate_tokens, texts)),
+    )
+    return [item.embedding for item in sorted(completion.data, key=lambda item: item.index)]
+
+
+def load_checkpoint(path: str) -> Dict[str, List[float]]:
+    embeddings: Dict[str, List[float]] = {}
+    if not os.path.exists(path):
+        return embeddings
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 崩溃时最后一行可能只写了一半，丢弃即可
+                continue
+            embeddings[record["key"]] = record["embedding"]
+    return embeddings
+
+
+async def embed_missing(
+    texts: Iterable[str],
+    checkpoint_path: str,
+    batch_size: int = 10,
+    concurrency: int = 5,
+) -> Dict[str, List[float]]:
+    """只为 checkpoint 中没有的文本请求 embedding，每完成一批就追加写入 checkpoint。"""
+    embeddings = load_checkpoint(checkpoint_path)
+    missing = list(dict.fromkeys(text for text in texts if text_key(text) not in embeddings))
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    logger.info(f"{len(embeddings)} embeddings in checkpoint, {len(missing)} texts to embed in {len(batches)} batches")
+    if not batches:
+        return embeddings
+
+    os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+
+        async def run_batch(batch):
+            async with semaphore:
+                vectors = await embed_batch(batch)
+            async with write_lock:
+                for text, vector in zip(batch, vectors):
+                    key = text_key(text)
+                    embeddings[key] = vector
+                    checkpoint.write(json.dumps({"key": key, "text": text, "embedding": vector}, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+
+        await asyncio.gather(*[run_batch(batch) for batch in batches])
+    return embeddings
+
+
+# ---------- 各后端的增量写入 ----------
+def sync_chroma(texts: Sequence[str], embeddings: Dict[str, List[float]], path: Optional[str] = None):
+    """
+    按 text_key 增量同步 Chroma 集合。
+
+    旧版构建脚本以 id_{i} 作为条目 id。对这样的已有库第一次运行时，所有旧 id 都不在 text_key 中，
+    会被整体删除并按 text_key 重新写入（向量取自 embed_missing 的 checkpoint，而不是旧集合）；
+    这是一次性的迁移，之后的运行只会增删变化的条目。
+    """
+    import chromadb
+
+    path = path or TONGYI_CONFIG.get("discipline_chroma_path", "./discipline_cm_db")
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection(
+        name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+    )
+    wanted = {text_key(text): text for text in texts}
+    existing = set(collection.get(include=[])["ids"])
+    stale = sorted(existing - set(wanted))
+    added = [key for key in wanted if key not in existing]
+    legacy = sum(key.startswith("id_") for key in stale)
+    if legacy:
+        logger.info(f"chroma: migrating {legacy} rows with legacy id_{{i}} ids to text_key ids")
+    if stale:
+        collection.delete(ids=stale)
+    if added:
+        collection.upsert(
+            ids=added,
+            embeddings=[embeddings[key] for key in added],
+            documents=[wanted[key] for key in added],
+        )
+    logger.info(f"chroma: +{len(added)} -{len(stale)}, {collection.count()} total")
+
+
+def _milvus_schema_current(client) -> bool:
+    """旧版集合没有 text_key 字段，或向量维度与当前模型不一致时需要重建。"""
+    fields = {field["name"]: field for field in client.describe_collection(COLLECTION_NAME).get("fields", [])}
+    dim = (fields.get("embedding", {}).get("params") or {}).get("dim")
+    return "text_key" in fields and int(dim or 0) == EMBEDDING_DIM
+
+
+def sync_milvus(texts: Sequence[str], embeddings: Dict[str, List[float]], uri: str = "./discipline.db"):
+    from pymilvus import CollectionSchema, DataType, FieldSchema, MilvusClient
+
+    client = MilvusClient(uri)
+    if client.has_collection(COLLECTION_NAME) and not _milvus_schema_current(client):
+        logger.info(f"milvus: {COLLECTION_NAME} was built with an older schema or embedding dimension, rebuilding")
+        client.drop_collection(COLLECTION_NAME)
+    if not client.has_collection(COLLECTION_NAME):
+        fields = [
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            FieldSchema(name="discipline_name", dtype=DataType.VARCHAR, max_length=50),
+            # 与 Chroma 的 id 相同，包含模型和维度，换模型后旧行会被替换
+            FieldSchema(name="text_key", dtype=DataType.VARCHAR, max_length=32),
+            FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=EMBEDDING_DIM),
+        ]
+        index = client.prepare_index_params()
+        index.add_index(field_name="embedding", index_type="FLAT", metric_type="COSINE", params={})
+        client.create_collection(
+            COLLECTION_NAME,
+            dimension=EMBEDDING_DIM,
+            schema=CollectionSchema(fields=fields, description="discipline embeddings"),
+            index_params=index,
+        )
+    wanted = {text_key(text): text for text in texts}
+    existing = {
+        row["text_key"]
+        for row in client.query(COLLECTION_NAME, filter="id >= 0", output_fields=["text_key"], limit=16384)
+    }
+    stale = sorted(existing - set(wanted))
+    added = [key for key in wanted if key not in existing]
+    if stale:
+        client.delete(COLLECTION_NAME, filter=f"text_key in {json.dumps(stale)}")
+    if added:
+        client.insert(
+            COLLECTION_NAME,
+            [{"discipline_name": wanted[key], "text_key": key, "embedding": embeddings[key]} for key in added],
+        )
+    client.flush(collection_name=COLLECTION_NAME)
+    logger.info(f"milvus: +{len(added)} -{len(stale)}")
+
+
+def sync_numpy(texts: Sequence[str], embeddings: Dict[str, List[float]], directory: Optional[str] = None):
+    # id 与 Chroma / Milvus 中的记录相同（text_key），两种后端的查询结果可以互相对照
+    directory = directory or TONGYI_CONFIG.get("discipline_index_dir", "./discipline_index")
+    index = DisciplineIndex(list(texts), [embeddings[text_key(text)] for text in texts], ids=[text_key(text) for text in texts])
+    index.save(directory)
+    logger.info(f"numpy: {len(index)} disciplines written to {directory}")
+
+
+BACKENDS = {"chroma": sync_chroma, "milvus": sync_milvus, "numpy": sync_numpy}
+
+
+async def build_index(
+    disciplines_path: str,
+    backends: Sequence[str] = ("chroma", "milvus", "numpy"),
+    checkpoint_path: Optional[str] = None,
+    batch_size: int = 10,
+    concurrency: int = 5,
+):
+    # checkpoint 默认与 NumPy 索引放在同一目录
+    checkpoint_path = checkpoint_path or os.path.join(
+        TONGYI_CONFIG.get("discipline_index_dir", "./discipline_index"), "embeddings.ckpt.jsonl"
+    )
+    texts = DisciplineTree.load(disciplines_path).second_level_names
+    embeddings = await embed_missing(texts, checkpoint_path, batch_size=batch_size, concurrency=concurrency)
+    for backend in backends:
+        BACKENDS[backend](texts, embeddings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally build the discipline embedding index")
+    parser.add_argument("--disciplines", default=TONGYI_CONFIG.get("disciplines_path", "./disciplines.json"))
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(build_index(args.disciplines, args.backends, args.checkpoint, args.batch_size, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
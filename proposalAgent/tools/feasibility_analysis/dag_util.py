@@ -5,6 +5,8 @@ import json
 from typing import List
 import asyncio
 
+from proposalAgent.utils.rate_limiter import get_governor
+
 client = AsyncOpenAI(
     api_key=os.getenv("DASHSCOPE_API_KEY"),  # 如果您没有配置环境变量，请在此处用您的API Key进行替换
     base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"  # 百炼服务的base_url
@@ -12,7 +14,8 @@ client = AsyncOpenAI(
 
 
 async def get_emb(s:str) -> List[float]:
-    completion = await client.embeddings.create(
+    completion = await get_governor("tongyi", "text-embedding-v4").acall(
+    client.embeddings.create,
     model="text-embedding-v4",
     input=s,
     dimensions=1024, # 指定向量维度（仅 text-embedding-v3及 text-embedding-v4支持该参数）
@@ -41,50 +44,12 @@ async def get_emb(s:str) -> List[float]:
 
 
 import json
+from proposalAgent.tools.feasibility_analysis.build_discipline_index import build_index
 
 async def main():
     json_file_path = "/Users/peelsannaw/Desktop/disciplines.json"
-
-    with open(json_file_path, "r", encoding='utf-8') as f:
-        data = json.load(f)
-
-    seconds = []
-
-    for first_level_dict in data:
-        for second_level_list in first_level_dict.values():
-            for second_level_dict in second_level_list:
-                for second_level_key in second_level_dict.keys():
-                    seconds.append(second_level_key)
-
-    # Setup ChromaDB client
-    db_client = chromadb.PersistentClient(path="./discipline_cm_db")
-    
-    collection_name = "discipline_embeddings"
-    # Get or create the collection
-    collection = db_client.get_or_create_collection(
-        name=collection_name,
-        metadata={"hnsw:space": "cosine"} # Using cosine distance
-    )
-
-    semaphore = asyncio.Semaphore(5)
-    
-    async def get_emb_with_semaphore(discipline: str) -> List[float]:
-        async with semaphore:
-            return await get_emb(discipline)
-    
-    tasks = [get_emb_with_semaphore(discipline) for discipline in seconds]
-    embeddings = await asyncio.gather(*tasks)
-    
-    ids = [f"id_{i}" for i in range(len(seconds))]
-
-    collection.add(
-        embeddings=list(embeddings),
-        documents=seconds,
-        ids=ids
-    )
-    
-    print(f"Collection '{collection_name}' created and data added.")
-    print(f"Number of items in collection: {collection.count()}")
+    # 批量请求 + checkpoint 的增量构建，只写入新增 / 删除的学科
+    await build_index(json_file_path, backends=["chroma"])
 
 
 if __name__ == "__main__":
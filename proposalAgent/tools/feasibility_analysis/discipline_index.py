@@ -0,0 +1,156 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from proposalAgent.model_config import TONGYI_CONFIG
+
+INDEX_MATRIX_FILE = "discipline_embeddings.npy"
+INDEX_NAMES_FILE = "discipline_names.json"
+# 与 Chroma / Milvus 一致的记录 id（build_discipline_index 写入的 text_key）和 metadata；旧索引目录没有这个文件
+INDEX_RECORDS_FILE = "discipline_records.json"
+
+
+class DisciplineIndex:
+    """
+    学科 embedding 的进程内精确检索索引。
+    二级学科只有几百个，所有 1024 维向量归一化后放进一个连续的 float32 矩阵（磁盘上为可内存映射的 .npy），
+    一批查询只需一次矩阵乘法 + argpartition 就能得到精确的余弦 top-k，不再需要 HNSW / Milvus 索引。
+    ids / metadatas 与向量库中的记录对应，未给出时 id 为名称本身、metadata 为 None。
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        embeddings,
+        normalized: bool = False,
+        ids: Optional[Sequence[str]] = None,
+        metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(names):
+            raise ValueError(f"embeddings shape {matrix.shape} does not match {len(names)} names")
+        if ids is not None and len(ids) != len(names) or metadatas is not None and len(metadatas) != len(names):
+            raise ValueError(f"ids / metadatas do not match {len(names)} names")
+        if not normalized:
+            matrix = _normalize(matrix)
+        self.names = list(names)
+        self.ids = list(ids) if ids is not None else list(self.names)
+        self.metadatas = list(metadatas) if metadatas is not None else [None] * len(self.names)
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.names)
+
+    # ---------- 持久化 ----------
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, INDEX_MATRIX_FILE), np.ascontiguousarray(self.matrix))
+        with open(os.path.join(directory, INDEX_NAMES_FILE), "w", encoding="utf-8") as f:
+            json.dump(self.names, f, ensure_ascii=False)
+        with open(os.path.join(directory, INDEX_RECORDS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "metadatas": self.metadatas}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "DisciplineIndex":
+        """从 save() 写出的目录加载，默认以只读内存映射方式打开矩阵。"""
+        with open(os.path.join(directory, INDEX_NAMES_FILE), "r", encoding="utf-8") as f:
+            names = json.load(f)
+        records = {}
+        if os.path.exists(os.path.join(directory, INDEX_RECORDS_FILE)):
+            with open(os.path.join(directory, INDEX_RECORDS_FILE), "r", encoding="utf-8") as f:
+                records = json.load(f)
+        matrix = np.load(os.path.join(directory, INDEX_MATRIX_FILE), mmap_mode="r" if mmap else None)
+        return cls(names, matrix, normalized=True, ids=records.get("ids"), metadatas=records.get("metadatas"))
+
+    @classmethod
+    def from_chroma(cls, path: str = "./discipline_cm_db", collection_name: str = "discipline_embeddings") -> "DisciplineIndex":
+        """从 dag_util.py 构建的 Chroma 集合导出。"""
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+        records = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls(records["documents"], records["embeddings"], ids=records["ids"], metadatas=records["metadatas"])
+
+    @classmethod
+    def from_milvus(cls, uri: str = "./discipline.db", collection_name: str = "discipline_embeddings") -> "DisciplineIndex":
+        """从 milvus.py 构建的 Milvus Lite 集合导出。"""
+        from pymilvus import MilvusClient
+
+        client = MilvusClient(uri)
+        rows = client.query(
+            collection_name,
+            filter="id >= 0",
+            output_fields=["discipline_name", "embedding"],
+            limit=16384,
+        )
+        return cls([row["discipline_name"] for row in rows], [row["embedding"] for row in rows])
+
+    # ---------- 检索 ----------
+    def search(self, query_embeddings, k: int = 5, chunk_size: int = 4096) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量精确余弦 top-k。
+
+        Args:
+            query_embeddings: (q, d) 或 (d,) 的查询向量，无需预先归一化。
+            k (int): 每个查询返回的结果数，超过索引大小时自动截断。
+            chunk_size (int): 每次矩阵乘法处理的查询数，用于限制 (q, n) 相似度矩阵的内存。
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (q, k) 的行号矩阵和对应的余弦相似度，按相似度降序。
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = _normalize(queries)
+        k = min(k, len(self))
+        indices = np.empty((queries.shape[0], k), dtype=np.int64)
+        scores = np.empty((queries.shape[0], k), dtype=np.float32)
+        for start in range(0, queries.shape[0], chunk_size):
+            sims = queries[start:start + chunk_size] @ self.matrix.T
+            if k < sims.shape[1]:
+                top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(sims.shape[1]), sims.shape).copy()
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            indices[start:start + chunk_size] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + chunk_size] = np.take_along_axis(top_sims, order, axis=1)
+        return indices, scores
+
+    def query(self, query_embeddings, n_results: int = 5, **_) -> Dict[str, List[List]]:
+        """
+        与 chromadb Collection.query 相同的返回结构（ids / documents / metadatas / distances），
+        可以直接替换跨学科分析里对 Chroma 集合的查询；ids 与 Chroma 集合中的 id 一致。
+        """
+        indices, scores = self.search(query_embeddings, n_results)
+        rows = indices.tolist()
+        return {
+            "ids": [[self.ids[i] for i in row] for row in rows],
+            "documents": [[self.names[i] for i in row] for row in rows],
+            "metadatas": [[self.metadatas[i] for i in row] for row in rows],
+            "distances": (1.0 - scores).tolist(),
+        }
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=None)
+def get_discipline_index(directory: Optional[str] = None, chroma_path: Optional[str] = None) -> DisciplineIndex:
+    """
+    进程内共享的学科索引。优先加载 directory（默认配置项 discipline_index_dir）下的 .npy 索引；
+    不存在时从 chroma_path（默认配置项 discipline_chroma_path）的 Chroma 集合导出一次并写入 directory，
+    之后的进程直接内存映射加载。
+    """
+    directory = directory or TONGYI_CONFIG.get("discipline_index_dir", "./discipline_index")
+    chroma_path = chroma_path or TONGYI_CONFIG.get("discipline_chroma_path", "./discipline_cm_db")
+    if os.path.exists(os.path.join(directory, INDEX_MATRIX_FILE)):
+        return DisciplineIndex.load(directory)
+    index = DisciplineIndex.from_chroma(chroma_path)
+    index.save(directory)
+    return DisciplineIndex.load(directory)
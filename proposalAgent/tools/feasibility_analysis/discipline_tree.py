@@ -0,0 +1,218 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+
+ROOT_NAME = "<root>"
+
+
+class DisciplineTree:
+    """
+    数组存储的学科树：根 -> 一级学科 -> 二级学科 (-> 三级学科)。
+    预先计算欧拉序 + 稀疏表，任意两点的 LCA / 树上距离都是 O(1)，
+    一组匹配学科的直径（两两距离最大值）用两次扫描 O(k) 求出，且都支持 NumPy 向量化批量查询。
+    """
+
+    def __init__(self, names: Sequence[str], parents: Sequence[int]):
+        self.names = list(names)
+        self.parent = np.asarray(parents, dtype=np.int32)
+        n = len(self.names)
+        children: List[List[int]] = [[] for _ in range(n)]
+        for node in range(1, n):
+            children[self.parent[node]].append(node)
+
+        # 迭代 DFS 生成欧拉序，避免深树递归
+        depth = np.zeros(n, dtype=np.int32)
+        first = np.zeros(n, dtype=np.int32)
+        euler: List[int] = []
+        stack = [(0, 0)]
+        while stack:
+            node, child_pos = stack.pop()
+            if child_pos == 0:
+                first[node] = len(euler)
+            euler.append(node)
+            if child_pos < len(children[node]):
+                stack.append((node, child_pos + 1))
+                child = children[node][child_pos]
+                depth[child] = depth[node] + 1
+                stack.append((child, 0))
+        self.depth = depth
+        self.first = first
+        self.euler = np.asarray(euler, dtype=np.int32)
+
+        # sparse[k][i] = euler[i : i + 2^k] 中深度最小的节点
+        m = len(self.euler)
+        self._log2 = np.zeros(m + 1, dtype=np.int32)
+        self._log2[2:] = np.floor(np.log2(np.arange(2, m + 1))).astype(np.int32)
+        sparse = [self.euler]
+        k = 1
+        while (1 << k) <= m:
+            prev = sparse[-1]
+            half = 1 << (k - 1)
+            left, right = prev[: m - (1 << k) + 1], prev[half: half + m - (1 << k) + 1]
+            sparse.append(np.where(self.depth[left] <= self.depth[right], left, right))
+            k += 1
+        self._sparse = sparse
+
+        self.level_nodes: Dict[int, np.ndarray] = {
+            level: np.flatnonzero(self.depth == level) for level in range(1, int(self.depth.max()) + 1)
+        }
+        self._name_to_node: Dict[str, int] = {}
+        for node, name in enumerate(self.names):
+            self._name_to_node.setdefault(name, node)
+
+    # ---------- 构建 ----------
+    @classmethod
+    def from_json(cls, data: Any) -> "DisciplineTree":
+        """
+        从 disciplines.json 的结构构建：[{一级学科: [{二级学科: 子学科...}, ...]}, ...]。
+        子学科可以是嵌套的 dict / list，也可以是字符串列表或空值。
+        """
+        names = [ROOT_NAME]
+        parents = [-1]
+
+        def add(value, parent):
+            if isinstance(value, dict):
+                for name, sub in value.items():
+                    names.append(name)
+                    parents.append(parent)
+                    add(sub, len(names) - 1)
+            elif isinstance(value, list):
+                for item in value:
+                    add(item, parent)
+            elif isinstance(value, str) and value:
+                names.append(value)
+                parents.append(parent)
+
+        add(data, 0)
+        return cls(names, parents)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "DisciplineTree":
+        """读取学科树 json，默认路径为配置项 disciplines_path。"""
+        path = path or TONGYI_CONFIG.get("disciplines_path", "./disciplines.json")
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_json(json.load(f))
+
+    @property
+    def second_level_names(self) -> List[str]:
+        """二级学科名称，顺序与 dag_util.py / milvus.py 构建向量库时的遍历顺序一致。"""
+        return [self.names[node] for node in self.level_nodes.get(2, [])]
+
+    def node_of(self, name: str) -> int:
+        return self._name_to_node[name]
+
+    def ancestor_at(self, nodes, level: int) -> np.ndarray:
+        """返回每个节点在 level 层的祖先（如 level=1 得到所属一级学科）。"""
+        nodes = np.array(nodes, dtype=np.int32)
+        for _ in range(int(self.depth.max())):
+            deeper = self.depth[nodes] > level
+            if not deeper.any():
+                break
+            nodes[deeper] = self.parent[nodes[deeper]]
+        return nodes
+
+    # ---------- LCA 与距离 ----------
+    def lca(self, u, v) -> np.ndarray:
+        """O(1) LCA，u / v 可以是标量或相同形状的数组。"""
+        fu, fv = self.first[np.asarray(u)], self.first[np.asarray(v)]
+        left, right = np.minimum(fu, fv), np.maximum(fu, fv)
+        k = self._log2[right - left + 1]
+        a = np.empty(np.shape(left), dtype=np.int32)
+        b = np.empty(np.shape(left), dtype=np.int32)
+        # 不同查询的 k 不同，按 k 分组取稀疏表
+        for level in np.unique(k):
+            mask = k == level
+            table = self._sparse[level]
+            a[mask] = table[left[mask]]
+            b[mask] = table[right[mask] - (1 << level) + 1]
+        return np.where(self.depth[a] <= self.depth[b], a, b)
+
+    def distance(self, u, v) -> np.ndarray:
+        u, v = np.asarray(u), np.asarray(v)
+        return self.depth[u] + self.depth[v] - 2 * self.depth[self.lca(u, v)]
+
+    def pairwise_distances(self, nodes) -> np.ndarray:
+        nodes = np.asarray(nodes, dtype=np.int32)
+        u, v = np.meshgrid(nodes, nodes, indexing="ij")
+        return self.distance(u, v)
+
+    def diameter(self, nodes) -> int:
+        """树度量下点集直径的两次扫描：从任一点找最远点 b，再从 b 找最远点，O(k)。"""
+        nodes = np.asarray(nodes, dtype=np.int32)
+        if len(nodes) < 2:
+            return 0
+        b = nodes[np.argmax(self.distance(np.full_like(nodes, nodes[0]), nodes))]
+        return int(self.distance(np.full_like(nodes, b), nodes).max())
+
+
+class InterdisciplinarityScorer:
+    """
+    交叉性评分：查询词 embedding -> DisciplineIndex 匹配二级学科 -> 学科树上的距离。
+    最终分数 = alpha * 归一化直径 + (1 - alpha) * 以相似度加权的平均两两距离，
+    一个申请书的全部查询词一次矩阵乘法完成匹配，距离计算全部向量化。
+    """
+
+    def __init__(self, tree: DisciplineTree, index: DisciplineIndex, alpha: float = 0.5):
+        self.tree = tree
+        self.index = index
+        self.alpha = alpha
+        names = tree.second_level_names
+        if names == index.names:
+            self.index_to_node = tree.level_nodes[2].astype(np.int32)
+        else:
+            self.index_to_node = np.asarray([tree.node_of(name) for name in index.names], dtype=np.int32)
+        # 归一化用的最大可能距离：两个最深的匹配节点经由根相连
+        self.max_distance = max(2 * int(tree.depth[self.index_to_node].max()), 1)
+
+    def score(self, query_embeddings, k: int = 3, min_similarity: float = 0.3, terms: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Args:
+            query_embeddings: (q, d) 申请书中所有查询词（学科关键词）的向量。
+            k (int): 每个查询词保留的候选二级学科数。
+            min_similarity (float): 低于该余弦相似度的候选丢弃。
+            terms (Sequence[str], optional): 查询词文本，仅用于结果展示。
+
+        Returns:
+            Dict[str, Any]: score / diameter / weighted_distance / 匹配明细 / 涉及的一级学科。
+        """
+        indices, sims = self.index.search(query_embeddings, k)
+        keep = sims >= min_similarity
+        nodes = self.index_to_node[indices[keep]]
+        weights = sims[keep]
+        term_ids = np.nonzero(keep)[0]
+        if len(nodes) == 0:
+            return {"score": 0.0, "diameter": 0, "weighted_distance": 0.0, "matches": [], "first_level_disciplines": []}
+
+        # 同一学科被多个查询词命中时取最高相似度作为权重
+        unique_nodes, inverse = np.unique(nodes, return_inverse=True)
+        node_weights = np.zeros(len(unique_nodes), dtype=np.float32)
+        np.maximum.at(node_weights, inverse, weights)
+
+        distances = self.tree.pairwise_distances(unique_nodes).astype(np.float32)
+        pair_weights = np.outer(node_weights, node_weights)
+        np.fill_diagonal(pair_weights, 0.0)
+        weighted_distance = float((pair_weights * distances).sum() / pair_weights.sum()) if pair_weights.sum() > 0 else 0.0
+        diameter = self.tree.diameter(unique_nodes)
+        score = self.alpha * diameter / self.max_distance + (1 - self.alpha) * weighted_distance / self.max_distance
+
+        first_levels = self.tree.ancestor_at(nodes, 1)
+        matches = [
+            {
+                "term": terms[t] if terms is not None else int(t),
+                "discipline": self.tree.names[node],
+                "first_level": self.tree.names[first],
+                "similarity": float(sim),
+            }
+            for t, node, first, sim in zip(term_ids.tolist(), nodes.tolist(), first_levels.tolist(), weights.tolist())
+        ]
+        return {
+            "score": float(score),
+            "diameter": diameter,
+            "weighted_distance": weighted_distance,
+            "matches": matches,
+            "first_level_disciplines": sorted({m["first_level"] for m in matches}),
+        }
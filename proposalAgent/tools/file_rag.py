@@ -0,0 +1,278 @@
+"""
+申请书内的检索增强（RAG）：下游智能体按问题取回相关片段，而不是在每次 LLM 调用里携带完整的 research_structure。
+
+- 有 pypdf 时按 PDF 页面抽取文本；否则退回到 research_structure，按其中的 [P10] 页码标记划分页面；
+- 每页按段落 / 句子切成带页码的片段（相邻片段有少量重叠），所有片段一次性批量向量化（复用 embedding 缓存）；
+- 向量放在本次运行内存中的 NumPy 索引（DisciplineIndex）里，按 PDF 内容哈希复用，同一份申请书只建一次；
+- create_proposal_search_tool 把索引包装成 LangChain 工具，返回 top-k 片段并标注页码，如 "[P3] ..."。
+"""
+import asyncio
+import hashlib
+import pathlib
+import re
+from dataclasses import dataclass
+from typing import Annotated, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import InjectedState
+
+from proposalAgent.agents.utils.memory import Embedder
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+from proposalAgent.tools.structure_util import SECTION_SEPARATOR, file_sha256
+from proposalAgent.utils.logger import get_logger
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # 没有 pypdf 时只能基于 research_structure 建索引
+    PdfReader = None
+
+logger = get_logger("file_rag")
+
+# research_structure 中的页码标记：[P10]、[P10-P12]、[p 3]
+PAGE_TAG = re.compile(r"\[\s*[Pp]\s*(\d+)(?:\s*[-–~]\s*[Pp]?\s*\d+)?\s*\]")
+_SENTENCE_END = re.compile(r"(?<=[。！？；.!?;])\s*")
+
+
+@dataclass
+class Chunk:
+    text: str
+    page: Optional[int]
+    chunk_id: int
+
+
+def read_pdf_pages(filepath) -> List[Tuple[int, str]]:
+    """按页抽取 PDF 文本，返回 [(页码, 文本)]，页码从 1 开始，空白页跳过。"""
+    if PdfReader is None:
+        raise ImportError("reading PDF pages requires `pip install pypdf`")
+    pages = []
+    for number, page in enumerate(PdfReader(str(filepath)).pages, start=1):
+        text = page.extract_text() or ""
+        if text.strip():
+            pages.append((number, text))
+    return pages
+
+
+def pages_from_structure(research_structure: str) -> List[Tuple[Optional[int], str]]:
+    """
+    按 research_structure 中的 [Pn] 标记切分文本。抽取提示词要求把页码标在所引用内容之后，
+    因此上一个标记之后、[Pn] 之前的内容归入第 n 页；每个部分（============= 分隔）最后一个标记之后的内容
+    沿用该标记的页码，没有任何标记的部分页码为 None。
+    """
+    pages: List[Tuple[Optional[int], str]] = []
+    for section in research_structure.split(SECTION_SEPARATOR):
+        page: Optional[int] = None
+        position = 0
+        for match in PAGE_TAG.finditer(section):
+            text = section[position:match.start()]
+            if text.strip():
+                pages.append((int(match.group(1)), text))
+            page = int(match.group(1))
+            position = match.end()
+        tail = section[position:]
+        if tail.strip():
+            pages.append((page, tail))
+    return pages
+
+
+def _split_units(text: str, chunk_size: int) -> List[str]:
+    """段落优先，过长的段落再按句子切分，单句仍超长时按字符硬切。"""
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_size:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            for start in range(0, len(sentence), chunk_size):
+                if sentence[start:start + chunk_size].strip():
+                    units.append(sentence[start:start + chunk_size])
+    return units
+
+
+def chunk_pages(pages: Sequence[Tuple[Optional[int], str]], chunk_size: int = 800, overlap: int = 100) -> List[Chunk]:
+    """
+    把每页文本切成不超过 chunk_size 个字符的片段，片段不跨页；
+    新片段以上一个片段末尾的 overlap 个字符开头，避免答案恰好落在切分处。
+    """
+    chunks: List[Chunk] = []
+    for page, text in pages:
+        current = ""
+        for unit in _split_units(text, chunk_size):
+            if current and len(current) + len(unit) + 1 > chunk_size:
+                chunks.append(Chunk(current, page, len(chunks)))
+                current = current[-overlap:] if overlap else ""
+            current = f"{current} {unit}" if current else unit
+        if current.strip():
+            chunks.append(Chunk(current, page, len(chunks)))
+    return chunks
+
+
+def format_chunks(results: Sequence[Tuple[Chunk, float]]) -> str:
+    """按检索顺序拼接片段，每段前标注页码，页码未知的标注 [P?]。"""
+    return "\n\n".join(f"[P{chunk.page if chunk.page is not None else '?'}] {chunk.text}" for chunk, _ in results)
+
+
+class ProposalIndex:
+    """单份申请书的片段向量索引。"""
+
+    def __init__(self, chunks: List[Chunk], embeddings, embedder: Embedder):
+        self.chunks = chunks
+        self.embedder = embedder
+        self.index = DisciplineIndex([str(chunk.chunk_id) for chunk in chunks], embeddings)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @classmethod
+    async def abuild(cls, chunks: List[Chunk], embedder: Embedder) -> "ProposalIndex":
+        embeddings = await embedder.aget_embeddings([chunk.text for chunk in chunks])
+        return cls(chunks, embeddings, embedder)
+
+    def _results(self, indices, scores) -> List[Tuple[Chunk, float]]:
+        return [(self.chunks[i], float(score)) for i, score in zip(indices[0].tolist(), scores[0].tolist())]
+
+    def search(self, question: str, k: int = 4) -> List[Tuple[Chunk, float]]:
+        if not self.chunks:
+            return []
+        return self._results(*self.index.search(self.embedder.get_embedding(question), k))
+
+    async def asearch(self, question: str, k: int = 4) -> List[Tuple[Chunk, float]]:
+        if not self.chunks:
+            return []
+        query_embedding = (await self.embedder.aget_embeddings([question]))[0]
+        return self._results(*self.index.search(query_embedding, k))
+
+
+# 本次运行内已建好的索引，键为 PDF 内容哈希（无 PDF 时为 research_structure 的哈希）
+_indexes: Dict[str, ProposalIndex] = {}
+_index_tasks: Dict[str, asyncio.Task] = {}
+# (路径, 大小, 修改时间) -> PDF 内容哈希，工具每次被调用都要定位索引，不必每次重新读取整份 PDF
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+
+
+def _structure_key(research_structure: str) -> str:
+    return "structure:" + hashlib.sha256(research_structure.encode("utf-8")).hexdigest()
+
+
+def _file_stat_key(filepath) -> Tuple[str, int, int]:
+    path = pathlib.Path(filepath)
+    stat = path.stat()
+    return str(path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+async def _afile_key(filepath) -> str:
+    stat_key = _file_stat_key(filepath)
+    if stat_key not in _file_hashes:
+        # 整份 PDF 的哈希放到线程池计算，不阻塞事件循环
+        _file_hashes[stat_key] = await asyncio.to_thread(file_sha256, pathlib.Path(filepath))
+    return _file_hashes[stat_key]
+
+
+async def aget_proposal_index(
+    filepath: Optional[str] = None,
+    research_structure: Optional[str] = None,
+    config: Optional[dict] = None,
+) -> ProposalIndex:
+    """
+    获取（必要时构建）申请书的片段索引。优先读取 PDF 原文，没有 pypdf 或没有提供文件时使用 research_structure。
+    同一份申请书的并发调用共享同一次构建；构建期间被 release_proposal_index 释放的索引不会再被缓存。
+    """
+    config = config or TONGYI_CONFIG
+    use_pdf = filepath is not None and PdfReader is not None
+    if use_pdf:
+        key = await _afile_key(filepath)
+    elif research_structure:
+        key = _structure_key(research_structure)
+    else:
+        raise ValueError("either a readable PDF (requires pypdf) or research_structure is required")
+    if key in _indexes:
+        return _indexes[key]
+
+    task = _index_tasks.get(key)
+    if task is None:
+        async def build() -> ProposalIndex:
+            pages = await asyncio.to_thread(read_pdf_pages, filepath) if use_pdf else pages_from_structure(research_structure)
+            chunks = chunk_pages(pages, config.get("rag_chunk_size", 800), config.get("rag_chunk_overlap", 100))
+            logger.info(f"indexing {len(chunks)} proposal chunks from {len(pages)} pages")
+            return await ProposalIndex.abuild(chunks, Embedder(config))
+
+        def store(done: asyncio.Task):
+            # 只有仍登记在 _index_tasks 中（即没有被释放）的构建结果才放进缓存
+            if _index_tasks.get(key) is not done:
+                return
+            del _index_tasks[key]
+            if not done.cancelled() and done.exception() is None:
+                _indexes[key] = done.result()
+
+        task = asyncio.ensure_future(build())
+        _index_tasks[key] = task
+        task.add_done_callback(store)
+    return await task
+
+
+def release_proposal_index(filepath: Optional[str] = None, research_structure: Optional[str] = None):
+    """
+    一份申请书处理完后释放它的索引；正在进行的构建完成后也不会再缓存。
+    只查 aget_proposal_index 记录的文件哈希，从未为该文件建过索引时直接返回，不会重新读取 PDF。
+    """
+    keys = []
+    if filepath is not None and PdfReader is not None:
+        try:
+            stat_key = _file_stat_key(filepath)
+        except OSError:
+            # 文件已被删除：找不到它的哈希，索引只能随进程退出释放
+            stat_key = None
+        key = _file_hashes.pop(stat_key, None) if stat_key is not None else None
+        if key is not None:
+            keys.append(key)
+    if research_structure:
+        keys.append(_structure_key(research_structure))
+    for key in keys:
+        _indexes.pop(key, None)
+        _index_tasks.pop(key, None)
+
+
+def create_proposal_search_tool(index: ProposalIndex, k: Optional[int] = None) -> StructuredTool:
+    """把申请书索引包装成工具，供分析师 / 辩论智能体 bind_tools 使用。"""
+    k = k or TONGYI_CONFIG.get("rag_top_k", 4)
+
+    def search_proposal(question: str) -> str:
+        return format_chunks(index.search(question, k))
+
+    async def asearch_proposal(question: str) -> str:
+        return format_chunks(await index.asearch(question, k))
+
+    return StructuredTool.from_function(
+        func=search_proposal,
+        coroutine=asearch_proposal,
+        name="search_proposal",
+        description=(
+            "在当前申请书中检索与问题最相关的原文片段，每个片段前标注页码（如 [P3]）。"
+            "需要引用申请书内容（研究目标、方案、团队、预算等）时调用，输入为一个具体的问题。"
+        ),
+    )
+
+
+def create_state_proposal_search_tool(config: Optional[dict] = None) -> StructuredTool:
+    """
+    可以在编译图时绑定的 search_proposal：ToolNode 执行时注入当前图状态，按其中的 filepath / research_structure
+    找到（首次调用时构建）本份申请书的索引。编译好的图被所有申请书共用，工具本身不持有任何一份申请书的索引。
+    """
+    config = config or TONGYI_CONFIG
+    k = config.get("rag_top_k", 4)
+
+    async def asearch_proposal(question: str, state: Annotated[dict, InjectedState]) -> str:
+        index = await aget_proposal_index(state.get("filepath") or None, state.get("research_structure") or None, config)
+        return format_chunks(await index.asearch(question, k))
+
+    return StructuredTool.from_function(
+        coroutine=asearch_proposal,
+        name="search_proposal",
+        description=(
+            "在当前申请书中检索与问题最相关的原文片段，每个片段前标注页码（如 [P3]）。"
+            "需要引用申请书内容（研究目标、方案、团队、预算等）时调用，输入为一个具体的问题。"
+        ),
+    )
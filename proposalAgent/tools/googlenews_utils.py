@@ -1,9 +1,10 @@
+import asyncio
 import json
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-import time
-import random
+import weakref
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+import httpx
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -12,6 +13,46 @@ from tenacity import (
     retry_if_result,
 )
 
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools.news_cache import get_news_cache
+from proposalAgent.tools.news_parser import NearDuplicateFilter, parse_news_page
+from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import TokenBucket
+
+logger = get_logger("googlenews")
+
+GOOGLE_SEARCH_URL = "https://www.google.com/search"
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/101.0.4951.54 Safari/537.36"
+    )
+}
+RESULTS_PER_PAGE = 10
+
+# 替代每次请求前 2~6 秒的随机休眠：所有查询、所有日期分片共用一个令牌桶
+_news_bucket = TokenBucket(
+    rate=TONGYI_CONFIG.get("news_requests_per_second", 1),
+    capacity=TONGYI_CONFIG.get("news_burst", 4),
+)
+# httpx.AsyncClient 的连接池绑定创建它的事件循环，因此按事件循环分别创建并复用
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+        _clients[loop] = client
+    return client
+
 
 def is_rate_limited(response):
     """Check if the response indicates rate limiting (status code 429)"""
@@ -19,97 +60,208 @@ def is_rate_limited(response):
 
 
 @retry(
-    retry=(retry_if_result(is_rate_limited)),
+    retry=(retry_if_result(is_rate_limited) | retry_if_exception_type(httpx.TransportError)),
     wait=wait_exponential(multiplier=1, min=4, max=60),
     stop=stop_after_attempt(5),
 )
-def make_request(url, headers):
-    """Make a request with retry logic for rate limiting"""
-    # Random delay before each request to avoid detection
-    time.sleep(random.uniform(2, 6))
-    response = requests.get(url, headers=headers)
+async def make_request(params: dict) -> httpx.Response:
+    """Make a rate-limited request with retry logic for rate limiting"""
+    await _news_bucket.acquire()
+    response = await get_async_client().get(GOOGLE_SEARCH_URL, params=params)
+    if not is_rate_limited(response):
+        # 其他错误页不能当作"没有结果"，否则会中断翻页且被缓存为已覆盖
+        response.raise_for_status()
     return response
 
 
-def getNewsData(query, start_date, end_date):
+def _parse_date(value) -> datetime:
+    """Accept yyyy-mm-dd, mm/dd/yyyy or datetime."""
+    if isinstance(value, datetime):
+        return value
+    if "-" in value:
+        return datetime.strptime(value, "%Y-%m-%d")
+    return datetime.strptime(value, "%m/%d/%Y")
+
+
+def split_date_range(start_date, end_date, slices: int) -> List[Tuple[datetime, datetime]]:
+    """把 [start_date, end_date] 按天切成最多 slices 个互不重叠的窗口（两端都包含）。"""
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    days = (end - start).days + 1
+    slices = max(1, min(slices, days))
+    step, extra = divmod(days, slices)
+    windows = []
+    cursor = start
+    for i in range(slices):
+        length = step + (1 if i < extra else 0)
+        windows.append((cursor, cursor + timedelta(days=length - 1)))
+        cursor += timedelta(days=length)
+    return windows
+
+
+async def _crawl_window(query: str, start: datetime, end: datetime, queue: asyncio.Queue, max_pages: Optional[int], strict: bool = False):
+    """顺序翻页抓取一个日期窗口（下一页是否存在只能从当前页得知），每解析完一页就放入队列。"""
+    tbs = f"cdr:1,cd_min:{start.strftime('%m/%d/%Y')},cd_max:{end.strftime('%m/%d/%Y')}"
+    page = 0
+    try:
+        while max_pages is None or page < max_pages:
+            response = await make_request({"q": query, "tbs": tbs, "tbm": "nws", "start": page * RESULTS_PER_PAGE})
+            items, has_next = parse_news_page(response.content)
+            if items:
+                await queue.put(items)
+            if not has_next:
+                break
+            page += 1
+    except Exception as e:
+        logger.warning(f"news crawl for '{query}' {start:%Y-%m-%d}..{end:%Y-%m-%d} stopped at page {page}: {e}")
+        if strict:
+            raise
+
+
+async def iter_news(
+    query: str,
+    start_date,
+    end_date,
+    slices: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    dedup: bool = True,
+    strict: bool = False,
+) -> AsyncIterator[dict]:
     """
-    Scrape Google News search results for a given query and date range.
-    query: str - search query
-    start_date: str - start date in the format yyyy-mm-dd or mm/dd/yyyy
-    end_date: str - end date in the format yyyy-mm-dd or mm/dd/yyyy
+    异步生成器：把查询区间切成多个日期窗口并发抓取，每解析完一页就逐条产出新闻，调用方可以边抓边消费。
+
+    Args:
+        query (str): 搜索词。
+        start_date / end_date: yyyy-mm-dd、mm/dd/yyyy 或 datetime。
+        slices (int, optional): 日期窗口数，默认取配置 news_date_slices。
+        max_pages (int, optional): 每个窗口最多抓取的页数，None 表示直到没有下一页。
+        dedup (bool): 是否在该查询的所有页之间过滤重复 / 近重复的稿件。
+        strict (bool): 为 True 时，任一窗口抓取失败会在产出其余结果后抛出异常（用于判断结果是否完整）。
     """
-    if "-" in start_date:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d")
-        start_date = start_date.strftime("%m/%d/%Y")
-    if "-" in end_date:
-        end_date = datetime.strptime(end_date, "%Y-%m-%d")
-        end_date = end_date.strftime("%m/%d/%Y")
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/101.0.4951.54 Safari/537.36"
-        )
-    }
+    slices = slices or TONGYI_CONFIG.get("news_date_slices", 4)
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks = [
+        asyncio.create_task(_crawl_window(query, start, end, queue, max_pages, strict))
+        for start, end in split_date_range(start_date, end_date, slices)
+    ]
+    pending = set(tasks)
+    seen = NearDuplicateFilter() if dedup else None
+    try:
+        while pending or not queue.empty():
+            if not queue.empty():
+                for item in queue.get_nowait():
+                    if seen is None or seen.add(item):
+                        yield item
+                continue
+            getter = asyncio.ensure_future(queue.get())
+            await asyncio.wait([getter, *pending], return_when=asyncio.FIRST_COMPLETED)
+            pending = {task for task in pending if not task.done()}
+            if not getter.done():
+                getter.cancel()
+                continue
+            for item in getter.result():
+                if seen is None or seen.add(item):
+                    yield item
+        for task in tasks:
+            if task.exception() is not None:
+                raise task.exception()
+    finally:
+        # 调用方提前停止消费时取消仍在抓取的窗口
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-    news_results = []
-    page = 0
-    while True:
-        offset = page * 10
-        url = (
-            f"https://www.google.com/search?q={query}"
-            f"&tbs=cdr:1,cd_min:{start_date},cd_max:{end_date}"
-            f"&tbm=nws&start={offset}"
-        )
 
+async def _fetch_and_cache(cache, query: str, start: datetime, end: datetime, slices: Optional[int], max_pages: Optional[int]) -> List[dict]:
+    """
+    按日期窗口并发抓取一个缺失的日期段，每个完整抓取的窗口立即按天写入缓存。
+    失败的窗口不写入缓存（这些天仍是缺失状态，下次重新抓取），它已经抓到的新闻作为返回值交给调用方，
+    本次查询的结果因此不少于不使用缓存时的结果。
+    """
+    async def fetch_window(window_start: datetime, window_end: datetime) -> List[dict]:
+        queue: asyncio.Queue = asyncio.Queue()
         try:
-            response = make_request(url, headers)
-            soup = BeautifulSoup(response.content, "html.parser")
-            results_on_page = soup.select("div.SoaBEf")
-
-            if not results_on_page:
-                break  # No more results found
-
-            for el in results_on_page:
-                try:
-                    link = el.find("a")["href"]
-                    title = el.select_one("div.MBeuO").get_text()
-                    snippet = el.select_one(".GI74Re").get_text()
-                    date = el.select_one(".LfVVr").get_text()
-                    source = el.select_one(".NUnG9d span").get_text()
-                    news_results.append(
-                        {
-                            "link": link,
-                            "title": title,
-                            "snippet": snippet,
-                            "date": date,
-                            "source": source,
-                        }
-                    )
-                except Exception as e:
-                    print(f"Error processing result: {e}")
-                    # If one of the fields is not found, skip this result
-                    continue
-
-            # Update the progress bar with the current count of results scraped
-
-            # Check for the "Next" link (pagination)
-            next_link = soup.find("a", id="pnnext")
-            if not next_link:
-                break
+            await _crawl_window(query, window_start, window_end, queue, max_pages, strict=True)
+            failed = False
+        except Exception:
+            failed = True
+        items = []
+        while not queue.empty():
+            items.extend(queue.get_nowait())
+        if failed:
+            return items
+        cache.store(query, window_start, window_end, items)
+        return []
+
+    windows = split_date_range(start, end, slices or TONGYI_CONFIG.get("news_date_slices", 4))
+    uncached = await asyncio.gather(*[fetch_window(a, b) for a, b in windows])
+    return [item for items in uncached for item in items]
+
+
+async def agetNewsData(
+    query,
+    start_date,
+    end_date,
+    slices: Optional[int] = None,
+    max_pages: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[dict]:
+    """
+    Async version of getNewsData.
+    使用缓存时只抓取 (查询, 天) 缓存中尚未覆盖的日期段（多段并发），再从缓存读出整个区间，
+    连同抓取失败的窗口中已经拿到的新闻一起去重。限制了 max_pages 的查询结果不完整，不读写缓存。
+    """
+    cache_path = TONGYI_CONFIG.get("news_cache_path")
+    if not use_cache or not cache_path or max_pages is not None:
+        return [item async for item in iter_news(query, start_date, end_date, slices, max_pages)]
+
+    cache = get_news_cache(cache_path)
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    missing = cache.missing_ranges(query, start, end)
+    uncached: List[dict] = []
+    if missing:
+        total_days = (end - start).days + 1
+        missing_days = sum((b - a).days + 1 for a, b in missing)
+        logger.info(f"news cache for '{query}': fetching {missing_days}/{total_days} days in {len(missing)} ranges")
+        windows = slices or TONGYI_CONFIG.get("news_date_slices", 4)
+        results = await asyncio.gather(*[
+            # 日期窗口按各段天数分配，段数多时每段至少一个窗口
+            _fetch_and_cache(
+                cache, query, datetime.combine(a, datetime.min.time()), datetime.combine(b, datetime.min.time()),
+                max(1, round(windows * ((b - a).days + 1) / missing_days)), max_pages,
+            )
+            for a, b in missing
+        ], return_exceptions=True)
+        for (a, b), result in zip(missing, results):
+            if isinstance(result, Exception):
+                logger.warning(f"news for '{query}' {a}..{b} not cached: {result}")
+            elif result:
+                logger.warning(f"news for '{query}' {a}..{b} partially fetched, {len(result)} items returned without caching")
+                uncached.extend(result)
+    return NearDuplicateFilter().filter(cache.load(query, start, end) + uncached)
 
-            page += 1
 
-        except Exception as e:
-            print(f"Failed after multiple retries: {e}")
-            break
+async def _get_news_and_close(query, start_date, end_date) -> List[dict]:
+    try:
+        return await agetNewsData(query, start_date, end_date)
+    finally:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
-    return news_results
+
+def getNewsData(query, start_date, end_date):
+    """
+    Scrape Google News search results for a given query and date range.
+    query: str - search query
+    start_date: str - start date in the format yyyy-mm-dd or mm/dd/yyyy
+    end_date: str - end date in the format yyyy-mm-dd or mm/dd/yyyy
+    Must not be called from a running event loop; use agetNewsData / iter_news there.
+    """
+    return asyncio.run(_get_news_and_close(query, start_date, end_date))
 
 if __name__ == "__main__":
     query = "duckduckgo"
     start_date = "2023-01-01"
     end_date = "2023-11-05"
     news_results = getNewsData(query, start_date, end_date)
-    print(news_results)
\ No newline at end of file
+    print(news_results)
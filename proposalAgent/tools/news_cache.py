@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if "-" in value:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return datetime.strptime(value, "%m/%d/%Y").date()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class NewsCache:
+    """
+    按 (查询, 天) 分桶的新闻缓存（SQLite）。
+    - news_days 记录每个查询已经完整抓取过的日期（覆盖范围），news_items 按发布日期存放新闻；
+    - 任意查询区间 = 已覆盖日期直接读库 + 未覆盖的连续日期段（missing_ranges）才需要实际抓取；
+    - 今天及以后的日期结果还会变化，只存数据、不记为已覆盖，下次查询会重新抓取。
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS news_days (
+                query TEXT NOT NULL, day TEXT NOT NULL, fetched_at REAL NOT NULL, final INTEGER NOT NULL,
+                PRIMARY KEY (query, day)
+            );
+            CREATE TABLE IF NOT EXISTS news_items (
+                query TEXT NOT NULL, day TEXT NOT NULL, link TEXT NOT NULL, item TEXT NOT NULL,
+                PRIMARY KEY (query, day, link)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def missing_ranges(self, query: str, start_date, end_date) -> List[Tuple[date, date]]:
+        """返回 [start_date, end_date] 内尚未被完整覆盖的连续日期段。"""
+        start, end = _as_date(start_date), _as_date(end_date)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day FROM news_days WHERE query = ? AND day BETWEEN ? AND ? AND final = 1",
+                (normalize_query(query), start.isoformat(), end.isoformat()),
+            ).fetchall()
+        covered = {row[0] for row in rows}
+        ranges: List[Tuple[date, date]] = []
+        day = start
+        while day <= end:
+            if day.isoformat() not in covered:
+                if ranges and ranges[-1][1] == day - timedelta(days=1):
+                    ranges[-1] = (ranges[-1][0], day)
+                else:
+                    ranges.append((day, day))
+            day += timedelta(days=1)
+        return ranges
+
+    def store(self, query: str, start_date, end_date, items: Iterable[dict], today: Optional[date] = None):
+        """
+        写入一次对 [start_date, end_date] 的完整抓取结果，替换该区间内原有的数据。
+        新闻按 published 归入对应日期；发布日期未知或落在区间外的归入区间第一天。
+        """
+        start, end = _as_date(start_date), _as_date(end_date)
+        today = today or date.today()
+        query = normalize_query(query)
+        records = []
+        for item in items:
+            try:
+                day = _as_date(item.get("published") or "")
+            except ValueError:
+                day = start
+            if not start <= day <= end:
+                day = start
+            records.append((query, day.isoformat(), item.get("link") or "", json.dumps(item, ensure_ascii=False)))
+        days = []
+        day = start
+        fetched_at = datetime.now().timestamp()
+        while day <= end:
+            days.append((query, day.isoformat(), fetched_at, int(day < today)))
+            day += timedelta(days=1)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM news_items WHERE query = ? AND day BETWEEN ? AND ?",
+                (query, start.isoformat(), end.isoformat()),
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO news_items (query, day, link, item) VALUES (?, ?, ?, ?)", records)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO news_days (query, day, fetched_at, final) VALUES (?, ?, ?, ?)", days
+            )
+            self._conn.commit()
+
+    def load(self, query: str, start_date, end_date) -> List[dict]:
+        """按日期升序读取区间内缓存的全部新闻。"""
+        start, end = _as_date(start_date), _as_date(end_date)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item FROM news_items WHERE query = ? AND day BETWEEN ? AND ? ORDER BY day, rowid",
+                (normalize_query(query), start.isoformat(), end.isoformat()),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def get_news_cache(db_path: str) -> NewsCache:
+    return NewsCache(db_path)
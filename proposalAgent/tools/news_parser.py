@@ -0,0 +1,228 @@
+"""
+Google News 搜索结果的解析与去重。
+
+- 优先用 lxml + 预编译的 CSS 选择器解析（C 实现，比 BeautifulSoup 的 html.parser 快一个数量级）；
+  lxml / cssselect 未安装时退回 BeautifulSoup。每个字段有一组候选选择器，Google 改版导致主选择器失效时依次尝试；
+- 每条结果规范化为 NewsItem：折叠空白、还原 /url?q= 跳转链接并去掉 utm 参数、补充域名和 ISO 日期；
+- NearDuplicateFilter 对同一查询的所有页做链接去重 + MinHash/LSH 近重复过滤（转载、多来源同稿）。
+"""
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple, TypedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # 退回 BeautifulSoup
+    lxml_html = None
+
+RESULT_SELECTOR = "div.SoaBEf"
+NEXT_PAGE_SELECTOR = "a#pnnext"
+# 字段 -> 候选选择器，按顺序尝试
+FIELD_SELECTORS = {
+    "title": ["div.MBeuO", "div[role=heading]"],
+    "snippet": [".GI74Re", ".Y3v8qd"],
+    "date": [".LfVVr", ".OSrXXb span"],
+    "source": [".NUnG9d span", ".MgUUmf span"],
+}
+TRACKING_PARAMS = ("utm_", "gclid", "fbclid", "ved", "usg")
+
+
+class NewsItem(TypedDict):
+    link: str
+    title: str
+    snippet: str
+    date: str
+    source: str
+    domain: str
+    published: Optional[str]
+
+
+# ---------- 规范化 ----------
+_WHITESPACE = re.compile(r"\s+")
+_RELATIVE_DATE = re.compile(r"(\d+)\s*(minute|min|hour|day|week|month|year|分钟|小时|天|周|个月|月|年)s?\s*(?:ago|前)")
+_RELATIVE_UNITS = {
+    "minute": timedelta(minutes=1), "min": timedelta(minutes=1), "分钟": timedelta(minutes=1),
+    "hour": timedelta(hours=1), "小时": timedelta(hours=1),
+    "day": timedelta(days=1), "天": timedelta(days=1),
+    "week": timedelta(weeks=1), "周": timedelta(weeks=1),
+    "month": timedelta(days=30), "个月": timedelta(days=30), "月": timedelta(days=30),
+    "year": timedelta(days=365), "年": timedelta(days=365),
+}
+_ABSOLUTE_DATE_FORMATS = ("%b %d, %Y", "%d %b %Y", "%B %d, %Y", "%d %B %Y", "%Y年%m月%d日", "%Y-%m-%d", "%m/%d/%Y")
+
+
+def clean_text(text: Optional[str]) -> str:
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def canonical_link(link: str) -> str:
+    """还原 Google 的 /url?q= 跳转，去掉跟踪参数和锚点，域名小写。"""
+    parts = urlsplit(link)
+    if parts.path == "/url":
+        target = dict(parse_qsl(parts.query)).get("q") or dict(parse_qsl(parts.query)).get("url")
+        if target:
+            parts = urlsplit(target)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.startswith(TRACKING_PARAMS)]
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def parse_news_date(text: str, now: Optional[datetime] = None) -> Optional[str]:
+    """把 "3 days ago" / "2 小时前" / "Jan 5, 2023" 等转换为 yyyy-mm-dd，无法识别时返回 None。"""
+    text = clean_text(text)
+    match = _RELATIVE_DATE.search(text)
+    if match:
+        return ((now or datetime.now()) - int(match.group(1)) * _RELATIVE_UNITS[match.group(2)]).strftime("%Y-%m-%d")
+    for fmt in _ABSOLUTE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_item(link: str, title: str, snippet: str, date: str, source: str, now: Optional[datetime] = None) -> NewsItem:
+    link = canonical_link(link)
+    return {
+        "link": link,
+        "title": clean_text(title),
+        "snippet": clean_text(snippet),
+        "date": clean_text(date),
+        "source": clean_text(source),
+        "domain": urlsplit(link).netloc.removeprefix("www."),
+        "published": parse_news_date(date, now),
+    }
+
+
+# ---------- 解析 ----------
+if lxml_html is not None:
+    _compiled_result = CSSSelector(RESULT_SELECTOR)
+    _compiled_next = CSSSelector(NEXT_PAGE_SELECTOR)
+    _compiled_fields = {field: [CSSSelector(selector) for selector in selectors] for field, selectors in FIELD_SELECTORS.items()}
+
+
+def _lxml_field(el, field: str) -> Optional[str]:
+    for selector in _compiled_fields[field]:
+        found = selector(el)
+        if found:
+            return found[0].text_content()
+    return None
+
+
+def parse_news_page_lxml(html, now: Optional[datetime] = None) -> Tuple[List[NewsItem], bool]:
+    try:
+        doc = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return [], False
+    items = []
+    for el in _compiled_result(doc):
+        anchors = el.xpath(".//a[@href]")
+        fields = {field: _lxml_field(el, field) for field in FIELD_SELECTORS}
+        # 缺少链接或标题的结果跳过，其余字段缺失时置空
+        if not anchors or fields["title"] is None:
+            continue
+        items.append(normalize_item(anchors[0].get("href"), now=now, **{k: v or "" for k, v in fields.items()}))
+    return items, bool(items) and bool(_compiled_next(doc))
+
+
+def _bs4_field(el, field: str) -> Optional[str]:
+    for selector in FIELD_SELECTORS[field]:
+        found = el.select_one(selector)
+        if found is not None:
+            return found.get_text()
+    return None
+
+
+def parse_news_page_bs4(html, now: Optional[datetime] = None) -> Tuple[List[NewsItem], bool]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    items = []
+    for el in soup.select(RESULT_SELECTOR):
+        anchor = el.find("a", href=True)
+        fields = {field: _bs4_field(el, field) for field in FIELD_SELECTORS}
+        if anchor is None or fields["title"] is None:
+            continue
+        items.append(normalize_item(anchor["href"], now=now, **{k: v or "" for k, v in fields.items()}))
+    return items, bool(items) and soup.select_one(NEXT_PAGE_SELECTOR) is not None
+
+
+def parse_news_page(html, now: Optional[datetime] = None) -> Tuple[List[NewsItem], bool]:
+    """解析一页 Google News 搜索结果，返回 (规范化的新闻列表, 是否还有下一页)。"""
+    if lxml_html is not None:
+        return parse_news_page_lxml(html, now)
+    return parse_news_page_bs4(html, now)
+
+
+# ---------- 近重复过滤 ----------
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+class NearDuplicateFilter:
+    """
+    流式近重复过滤：规范化链接完全相同直接判重；否则对 标题 + 摘要 的字符 shingle 计算 MinHash 签名，
+    LSH 分桶找候选，估计的 Jaccard 相似度不低于 threshold 即视为同一篇稿件。
+    规范化后的文本短于 shingle_size 时不计算签名，只按链接判重。
+    字符 shingle 同时适用于中英文，不需要分词。
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._links = set()
+        self._signatures: List[np.ndarray] = []
+        self._buckets = [dict() for _ in range(bands)]
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _NON_WORD.sub(" ", text.lower()).strip()
+
+    def signature(self, text: str) -> np.ndarray:
+        text = self.normalize(text)
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        hashes %= _MERSENNE_PRIME
+        # (a * x + b) mod p，a、x < 2^31，乘积不会溢出 uint64
+        return ((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME).min(axis=0)
+
+    def add(self, item: NewsItem) -> bool:
+        """新稿件返回 True 并记录；与已见过的稿件重复时返回 False。"""
+        link = item.get("link")
+        if link and link in self._links:
+            return False
+        text = self.normalize(f"{item.get('title', '')} {item.get('snippet', '')}")
+        if len(text) < self.shingle_size:
+            # 标题和摘要几乎为空时所有稿件的签名都相同，只能按链接判重
+            if link:
+                self._links.add(link)
+            return True
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {index for band, key in enumerate(keys) for index in self._buckets[band].get(key, ())}
+        for index in candidates:
+            if np.mean(self._signatures[index] == signature) >= self.threshold:
+                return False
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(index)
+        if link:
+            self._links.add(link)
+        return True
+
+    def filter(self, items: Sequence[NewsItem]) -> List[NewsItem]:
+        return [item for item in items if self.add(item)]
@@ -1,11 +1,17 @@
 from google import genai
 from google.genai import types
+import hashlib
+import io
+import os
 import pathlib
+import re
 import time
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, fields
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from numpy._core.defchararray import str_len
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import time
 import json
 from tenacity import (
@@ -18,8 +24,14 @@ import asyncio
 import sys
 sys.path.append("/Users/peelsannaw/Desktop/codes/maas/mas4proposal")
 from proposalAgent.utils.logger import get_logger
+from proposalAgent.utils.rate_limiter import get_governor
 import aiohttp
 
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # 仅分块抽取模式需要
+    PdfReader = PdfWriter = None
+
 @dataclass
 class ProposalOutput:
     proposal_basic_info:str
@@ -30,28 +42,11 @@ class ProposalOutput:
 
 logger = get_logger("structure_util")
 
-client = genai.Client()
-# @retry(
-#     stop=stop_after_attempt(3),
-#     wait=wait_exponential(multiplier=1, min=4, max=10),
-#     retry=retry_if_exception_type((requests.exceptions.RequestException, aiohttp.ServerDisconnectedError,ConnectionError)),
-# )
-async def get_genai_output(prompt: str,filepath:pathlib.Path):
-    client = genai.Client()
-    asyncClient = client.aio
-    response = await asyncClient.models.generate_content(
-        model="gemini-2.5-flash-lite",
-        contents=[
-        types.Part.from_bytes(
-            data=filepath.read_bytes(),
-            mime_type='application/pdf',
-        ),
-        prompt],
-    )
-    return response.text
-
-async def get_pdf_output(filepath:pathlib.Path):
-    prompt = """
+STRUCTURE_MODEL = "gemini-2.5-flash-lite"
+# 修改 STRUCTURE_PROMPT 时同步修改版本号，旧的抽取缓存会自动失效
+STRUCTURE_PROMPT_VERSION = "v1"
+SECTION_SEPARATOR = "============="
+STRUCTURE_PROMPT = """
     ### 角色描述
     你是一个专业的抽取和总结pdf机器人
     ### 任务描述
@@ -64,15 +59,370 @@ async def get_pdf_output(filepath:pathlib.Path):
     需要给出对应的出现的[页面],比如[P10]
     输出这四个部分内容同时使用: =============进行分割
     """
-    
-    
-    time_start = time.time()
 
-    res = await get_genai_output(prompt,filepath)
+# 小于该大小的 PDF 直接随请求内联发送，更大的通过 Files API 上传一次后复用文件句柄（Gemini 内联请求上限 20MB）
+INLINE_PDF_LIMIT = 8 * 1024 * 1024
+# Files API 上传的文件 48 小时后过期，提前一段时间重新上传
+FILE_EXPIRY_MARGIN = timedelta(minutes=30)
+
+_uploaded_files: Dict[str, types.File] = {}
+_upload_tasks: Dict[str, asyncio.Task] = {}
+
+
+@lru_cache(maxsize=None)
+def get_genai_client() -> genai.Client:
+    """进程内共享、按需创建的 Gemini 客户端；异步调用统一走 get_genai_client().aio，复用同一个连接池。"""
+    return genai.Client()
+
+
+def _file_is_fresh(file: types.File) -> bool:
+    expiration = getattr(file, "expiration_time", None)
+    return expiration is None or expiration - FILE_EXPIRY_MARGIN > datetime.now(timezone.utc)
+
+
+async def _upload_pdf(filepath: pathlib.Path) -> types.File:
+    files = get_genai_client().aio.files
+    file = await files.upload(
+        file=str(filepath),
+        config=types.UploadFileConfig(mime_type="application/pdf", display_name=filepath.name),
+    )
+    while getattr(file.state, "name", file.state) == "PROCESSING":
+        await asyncio.sleep(1)
+        file = await files.get(name=file.name)
+    logger.info(f"uploaded {filepath.name} to Files API as {file.name}")
+    return file
+
+
+async def get_pdf_part(filepath: pathlib.Path, pdf_hash: Optional[str] = None, inline_limit: int = INLINE_PDF_LIMIT) -> types.Part:
+    """
+    返回可直接放进 contents 的 PDF Part。
+    小文件内联发送；大文件按内容哈希只上传一次，结构抽取节点和之后任何需要 PDF 的节点都复用同一个文件句柄，
+    并发请求同一文件时共享同一次上传。
+    """
+    filepath = pathlib.Path(filepath)
+    if filepath.stat().st_size <= inline_limit:
+        return types.Part.from_bytes(data=filepath.read_bytes(), mime_type="application/pdf")
+
+    pdf_hash = pdf_hash or await asyncio.to_thread(file_sha256, filepath)
+    file = _uploaded_files.get(pdf_hash)
+    if file is None or not _file_is_fresh(file):
+        task = _upload_tasks.get(pdf_hash)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(_upload_pdf(filepath))
+            _upload_tasks[pdf_hash] = task
+        try:
+            file = await task
+        finally:
+            if _upload_tasks.get(pdf_hash) is task and task.done():
+                del _upload_tasks[pdf_hash]
+        _uploaded_files[pdf_hash] = file
+    return types.Part.from_uri(file_uri=file.uri, mime_type=file.mime_type or "application/pdf")
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage is not None else None
+
+
+async def _generate_content(**kwargs):
+    """所有 Gemini 结构抽取请求都经过进程级的限流与 429 / 5xx 退避重试。"""
+    return await get_governor("google", kwargs["model"]).acall(
+        get_genai_client().aio.models.generate_content, usage=_usage_tokens, **kwargs
+    )
+
+
+async def get_genai_output(prompt: str,filepath:pathlib.Path, pdf_hash: Optional[str] = None):
+    response = await _generate_content(
+        model=STRUCTURE_MODEL,
+        contents=[await get_pdf_part(filepath, pdf_hash), prompt],
+    )
+    return response.text
+
+
+def parse_proposal_output(text: str) -> Optional[ProposalOutput]:
+    """
+    将模型输出解析为 ProposalOutput：优先按 json 解析，否则按 ============= 分割的各部分解析。
+    提示词要求四个部分（申请人 / 团队 / 申请信息 / 正文），此时 proposal_basic_info 为空；
+    若模型多给了一段基本信息（五个部分），则按字段顺序一一对应。无法解析时返回 None。
+    """
     try:
-        print(f"res:{res}")
-        proposal_output = ProposalOutput(**json.loads(res))
-    except:
+        return ProposalOutput(**json.loads(text))
+    except (TypeError, ValueError):
+        pass
+    sections = [section.strip() for section in re.split(r"={5,}", text or "") if section.strip()]
+    field_names = [f.name for f in fields(ProposalOutput)]
+    if len(sections) == len(field_names):
+        return ProposalOutput(*sections)
+    if len(sections) == len(field_names) - 1:
+        return ProposalOutput("", *sections)
+    return None
+
+
+def file_sha256(filepath: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StructureCache:
+    """
+    PDF 结构化抽取结果的内容寻址缓存。
+    键为 PDF 内容的 sha256 + 提示词版本 + 模型名，值为 research_structure 原文和解析后的 ProposalOutput，
+    同一份申请书在人工反馈循环或重复提交时不会再次上传和调用 LLM。
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.join(cache_dir, "structure")
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, pdf_hash: str, model: str, prompt_version: str) -> str:
+        return os.path.join(self.cache_dir, f"{pdf_hash}.{model}.{prompt_version}.json")
+
+    def get(self, pdf_hash: str, model: str = STRUCTURE_MODEL, prompt_version: str = STRUCTURE_PROMPT_VERSION) -> Optional[Dict[str, Any]]:
+        path = self._path(pdf_hash, model, prompt_version)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"broken structure cache entry {path}: {e}")
+            return None
+
+    def set(self, pdf_hash: str, research_structure: str, proposal_output: Optional[ProposalOutput],
+            model: str = STRUCTURE_MODEL, prompt_version: str = STRUCTURE_PROMPT_VERSION):
+        path = self._path(pdf_hash, model, prompt_version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "research_structure": research_structure,
+                "proposal_output": asdict(proposal_output) if proposal_output is not None else None,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+CHUNK_PROMPT = STRUCTURE_PROMPT + """
+    ### 注意
+    你看到的只是原文第{start}页到第{end}页的片段, 第一页对应原文[P{start}], 页码标注必须使用原文页码。
+    片段中没有出现的部分输出"无", 但仍然保留四个部分和分割符。
+    """
+
+
+def split_pdf_pages(filepath: pathlib.Path, pages_per_chunk: int) -> List[Tuple[int, int, bytes]]:
+    """在本地把 PDF 切成若干页码区间，返回 [(起始页, 结束页, 片段 PDF 字节)]，页码从 1 开始。"""
+    if PdfReader is None:
+        raise ImportError("chunked structure extraction requires `pip install pypdf`")
+    reader = PdfReader(str(filepath))
+    chunks = []
+    for start in range(0, len(reader.pages), pages_per_chunk):
+        end = min(start + pages_per_chunk, len(reader.pages))
+        writer = PdfWriter()
+        for page in reader.pages[start:end]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append((start + 1, end, buffer.getvalue()))
+    return chunks
+
+
+def _count_pages(filepath: pathlib.Path) -> int:
+    return len(PdfReader(str(filepath)).pages)
+
+
+def render_proposal_output(proposal_output: ProposalOutput) -> str:
+    """把 ProposalOutput 还原成与单次抽取相同的 ============= 分割文本，作为 research_structure。"""
+    sections = [getattr(proposal_output, f.name) for f in fields(ProposalOutput)]
+    if not sections[0]:
+        sections = sections[1:]
+    sections = [section or "无" for section in sections]
+    return f"\n{SECTION_SEPARATOR}\n".join(sections)
+
+
+def merge_proposal_outputs(parts: List[ProposalOutput]) -> ProposalOutput:
+    """按页码顺序逐字段拼接各片段的抽取结果，丢弃"无"之类的空段落，页码标注原样保留。"""
+    merged = {}
+    for f in fields(ProposalOutput):
+        texts = [getattr(part, f.name).strip() for part in parts]
+        merged[f.name] = "\n".join(text for text in texts if text and text not in ("无", "无。"))
+    return ProposalOutput(**merged)
+
+
+async def extract_structure_chunked(filepath: pathlib.Path, pages_per_chunk: int = 15, max_concurrency: int = 6) -> ProposalOutput:
+    """
+    分块抽取长申请书：本地切分页码区间，各区间在信号量限制下并发抽取，再合并为一个 ProposalOutput。
+    总耗时取决于最慢的一个片段，而不是整篇文档。
+    """
+    # 切分要解析并重写整份 PDF，放到线程中执行，不阻塞同一事件循环上的其他申请书
+    chunks = await asyncio.to_thread(split_pdf_pages, filepath, pages_per_chunk)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def extract_chunk(start: int, end: int, data: bytes) -> ProposalOutput:
+        async with semaphore:
+            response = await _generate_content(
+                model=STRUCTURE_MODEL,
+                contents=[
+                    types.Part.from_bytes(data=data, mime_type="application/pdf"),
+                    CHUNK_PROMPT.format(start=start, end=end),
+                ],
+            )
+        part = parse_proposal_output(response.text)
+        if part is None:
+            logger.error(f"cannot split chunk P{start}-P{end} output into sections, keep it as report body")
+            part = ProposalOutput("", "", "", "", response.text or "")
+        return part
+
+    parts = await asyncio.gather(*[extract_chunk(start, end, data) for start, end, data in chunks])
+    return merge_proposal_outputs(list(parts))
+
+
+async def extract_structure(
+    filepath: pathlib.Path,
+    cache_dir: Optional[str] = None,
+    mode: str = "single",
+    pages_per_chunk: int = 15,
+    max_concurrency: int = 6,
+) -> Tuple[str, Optional[ProposalOutput]]:
+    """
+    抽取申请书结构，返回 (research_structure 原文, 解析后的 ProposalOutput 或 None)。
+    给定 cache_dir 时先按 PDF 内容哈希查缓存，命中则完全跳过上传和 LLM 调用。
+    mode="chunked" 时按页分块并发抽取（页数不超过一个分块时仍走单次调用）。
+    """
+    filepath = pathlib.Path(filepath)
+    if mode == "chunked" and PdfReader is None:
+        logger.error("pypdf is not installed, falling back to single-call structure extraction")
+    use_chunks = mode == "chunked" and PdfReader is not None
+    # 缓存版本只取决于模式和分块大小，不取决于页数：先查缓存，未命中时才解析 PDF 数页数。
+    # 分块模式下页数不超过一个分块的申请书实际走单次调用，结果同样记在分块模式的版本下
+    prompt_version = f"{STRUCTURE_PROMPT_VERSION}-chunked{pages_per_chunk}" if use_chunks else STRUCTURE_PROMPT_VERSION
+    cache = StructureCache(cache_dir) if cache_dir else None
+    # 哈希与数页数都要读取整份 PDF，放到线程中执行，长申请书不会卡住批量运行中的其他申请书
+    pdf_hash = await asyncio.to_thread(file_sha256, filepath) if cache else None
+    if cache:
+        cached = cache.get(pdf_hash, prompt_version=prompt_version)
+        if cached is not None:
+            logger.info(f"structure cache hit for {filepath.name} ({pdf_hash[:12]})")
+            proposal_output = cached["proposal_output"]
+            return cached["research_structure"], ProposalOutput(**proposal_output) if proposal_output else None
+
+    chunked = use_chunks and await asyncio.to_thread(_count_pages, filepath) > pages_per_chunk
+    if chunked:
+        proposal_output = await extract_structure_chunked(filepath, pages_per_chunk, max_concurrency)
+        res = render_proposal_output(proposal_output)
+    else:
+        res = await get_genai_output(STRUCTURE_PROMPT, filepath, pdf_hash)
+        proposal_output = parse_proposal_output(res)
+    if cache:
+        cache.set(pdf_hash, res, proposal_output, prompt_version=prompt_version)
+    return res, proposal_output
+
+
+# 流式模式把报告正文放在第一部分，正文一到就可以开始规划，其余部分在后台继续生成
+STREAM_FIELD_ORDER = ["report_body_summary", "applicant_info", "project_team_info", "project_apply_info"]
+STREAM_PROMPT = """
+    ### 角色描述
+    你是一个专业的抽取和总结pdf机器人
+    ### 任务描述
+    将这篇国家自然基金项目申请书中的重要数据进行抽取, 严格按以下顺序输出四个部分：
+    1. 报告正文,对于报告正文部分可以做总结,但是要保留完整意思。项目正文部分往往包括：1、项目的立项依据(项目背景和意义)；2、项目的主要内容以及目标或拟解决的关键问题；3、拟采取的方案的可行性分析；4、本项目的特色与创新之处；5、年度计划及预期结果；6、工作基础及保障措施(工作条件、个人相关方面的研究基础和保障措施)。
+    2. 申请人的个人履历,相关经历和论文背景
+    3. 项目团队成员及其个人履历,相关经历和论文背景
+    4. 项目申请信息(表格数据等内容)
+    需要给出对应的出现的[页面],比如[P10]
+    四个部分之间单独一行使用: =============进行分割
+    """
+
+
+class StructureStreamParser:
+    """
+    增量解析流式输出：每收到一段文本就检查是否出现了完整的分割行，
+    分割行之前的内容即为一个已完成的部分，按 field_order 依次对应到 ProposalOutput 字段。
+    分割行必须以换行结束才算完整，避免分割符被切在两个分片之间时提前截断。
+    """
+
+    _SEPARATOR = re.compile(r"(?:^|\n)[ \t]*={5,}[ \t]*\n")
+
+    def __init__(self, field_order: List[str] = STREAM_FIELD_ORDER):
+        self.field_order = field_order
+        self._buffer = ""
+        self._index = 0
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """喂入新的文本分片，返回本次新完成的 [(字段名, 内容)]。"""
+        self._buffer += text or ""
+        completed = []
+        while self._index < len(self.field_order) - 1:
+            match = self._SEPARATOR.search(self._buffer)
+            if match is None:
+                break
+            section = self._buffer[:match.start()].strip()
+            self._buffer = self._buffer[match.end():]
+            if section:
+                completed.append((self.field_order[self._index], section))
+                self._index += 1
+        return completed
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """流结束时把剩余文本归入当前字段。"""
+        section = self._buffer.strip()
+        self._buffer = ""
+        if self._index >= len(self.field_order) or not section:
+            return []
+        self._index += 1
+        return [(self.field_order[self._index - 1], section)]
+
+
+async def stream_extract_structure(
+    filepath: pathlib.Path,
+    cache_dir: Optional[str] = None,
+    on_section: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[str, ProposalOutput]:
+    """
+    流式抽取申请书结构：消费 Gemini 的流式分片，每完成一个部分就调用 on_section(字段名, 内容)，
+    最后返回与其他模式相同格式的 (research_structure, ProposalOutput)。缓存命中时直接按顺序回放各部分。
+    """
+    filepath = pathlib.Path(filepath)
+    on_section = on_section or (lambda field, text: None)
+    prompt_version = f"{STRUCTURE_PROMPT_VERSION}-stream"
+    cache = StructureCache(cache_dir) if cache_dir else None
+    pdf_hash = await asyncio.to_thread(file_sha256, filepath) if cache else None
+    if cache:
+        cached = cache.get(pdf_hash, prompt_version=prompt_version)
+        if cached is not None and cached["proposal_output"]:
+            proposal_output = ProposalOutput(**cached["proposal_output"])
+            for field in STREAM_FIELD_ORDER:
+                on_section(field, getattr(proposal_output, field))
+            return cached["research_structure"], proposal_output
+
+    parser = StructureStreamParser()
+    sections = {f.name: "" for f in fields(ProposalOutput)}
+    # 限流与重试只覆盖建立流式请求，流开始后的分片读取不占并发名额
+    stream = await get_governor("google", STRUCTURE_MODEL).acall(
+        get_genai_client().aio.models.generate_content_stream,
+        model=STRUCTURE_MODEL,
+        contents=[await get_pdf_part(filepath, pdf_hash), STREAM_PROMPT],
+    )
+    async for chunk in stream:
+        for field, text in parser.feed(chunk.text):
+            sections[field] = text
+            on_section(field, text)
+    for field, text in parser.finish():
+        sections[field] = text
+        on_section(field, text)
+
+    proposal_output = ProposalOutput(**sections)
+    res = render_proposal_output(proposal_output)
+    if cache:
+        cache.set(pdf_hash, res, proposal_output, prompt_version=prompt_version)
+    return res, proposal_output
+
+
+async def get_pdf_output(filepath:pathlib.Path, cache_dir: Optional[str] = None):
+    time_start = time.time()
+
+    res, proposal_output = await extract_structure(filepath, cache_dir)
+    if proposal_output is None:
         logger.error(f"get genai output error: {res},return origin output")
         return res
     time_end = time.time()
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+_MISSING = object()
+
+
+def make_key(namespace: str, params: Dict[str, Any]) -> str:
+    """请求参数的规范化哈希：键顺序无关，namespace 区分不同的外部接口。"""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{namespace}\x00{payload}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    外部接口响应的持久化 TTL 缓存（SQLite，值为 JSON），并对进行中的请求做合并：
+    同一个键在第一次请求返回之前，其他线程 / 协程的相同请求直接等待它的结果，不再重复调用接口。
+    异常不会被缓存，等待者会收到同一个异常。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, default_ttl: Optional[float] = None):
+        self.db_path = db_path
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._memory: Dict[str, tuple] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            self._conn.commit()
+
+    # ---------- 读写 ----------
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                record = self._memory.get(key)
+            else:
+                record = self._conn.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if record is None:
+                return default
+            value, expires_at = record
+            if expires_at is not None and expires_at <= now:
+                self._delete(key)
+                return default
+        return json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        record = (json.dumps(value, ensure_ascii=False, default=str), expires_at)
+        with self._lock:
+            if self._conn is None:
+                self._memory[key] = record
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, *record),
+                )
+                self._conn.commit()
+
+    def _delete(self, key: str):
+        if self._conn is None:
+            self._memory.pop(key, None)
+        else:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """删除所有已过期的条目，返回删除数量。"""
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                expired = [key for key, (_, expires_at) in self._memory.items() if expires_at is not None and expires_at <= now]
+                for key in expired:
+                    del self._memory[key]
+                return len(expired)
+            cursor = self._conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    # ---------- 请求合并 ----------
+    def _claim(self, key: str):
+        """返回 (future, 是否由当前调用方负责请求)。"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _fetch_and_store(self, key: str, fetch: Callable[[], Any], ttl: Optional[float], future: Future) -> Any:
+        try:
+            # 拿到请求权之前可能刚有另一个请求写入了缓存
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = fetch()
+                self.set(key, value, ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _afetch_and_store(self, key: str, fetch: Callable[[], Awaitable[Any]], ttl: Optional[float], future: Future) -> Any:
+        try:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = await fetch()
+                self.set(key, value, ttl)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """命中缓存直接返回；否则调用 fetch()（同一个键同时只会有一个 fetch 在执行）并写入缓存。"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        return self._fetch_and_store(key, fetch, ttl, future)
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        get_or_fetch 的异步版本：fetch 为协程函数时直接在当前事件循环中等待，
+        为普通函数时在线程池中执行，不阻塞图运行所在的事件循环。
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        future, owner = self._claim(key)
+        # 等待方和发起方被取消（辩论超时、新闻迭代提前结束等）时都只取消自己：
+        # 共享的请求照常完成，合并到同一个键上的其他调用不会收到 CancelledError
+        if not owner:
+            return await asyncio.shield(asyncio.wrap_future(future))
+        if asyncio.iscoroutinefunction(fetch):
+            task = asyncio.ensure_future(self._afetch_and_store(key, fetch, ttl, future))
+            # 发起方已被取消时没有人再 await 这个任务，异常已经交给了 future，这里只是标记为已取回
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            return await asyncio.shield(task)
+        return await asyncio.shield(asyncio.ensure_future(asyncio.to_thread(self._fetch_and_store, key, fetch, ttl, future)))
+
+
+@lru_cache(maxsize=None)
+def get_response_cache(db_path: Optional[str] = None, default_ttl: Optional[float] = None) -> ResponseCache:
+    """进程内共享的 ResponseCache，同一个 db_path 只打开一次，保证请求合并在所有调用方之间生效。"""
+    return ResponseCache(db_path, default_ttl)
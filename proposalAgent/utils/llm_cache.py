@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from proposalAgent.utils.logger import get_logger
+
+logger = get_logger("llm_cache")
+
+# 序列化后的消息里与内容无关、每次调用都会变化的字段，不参与缓存键
+_VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if key not in _VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    规范化 LangChain 传入的 prompt：聊天模型的 prompt 是序列化后的消息列表（JSON），
+    去掉消息 id 等易变字段、合并空白后按键排序重新序列化；普通字符串只合并空白。
+    """
+    try:
+        return json.dumps(_normalize(json.loads(prompt)), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        return " ".join(prompt.split())
+
+
+def prompt_text(prompt: str) -> str:
+    """取出 prompt 中所有消息的文本内容，用于语义缓存的向量化。"""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    parts = []
+    for message in messages if isinstance(messages, list) else [messages]:
+        content = message.get("kwargs", {}).get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return "\n".join(parts) if parts else prompt
+
+
+# 未命中后等待 update 的最长时间（秒），超过即视为调用已失败；等待中的条目最多保留 PENDING_LIMIT 个
+PENDING_TTL = 3600.0
+PENDING_LIMIT = 1024
+
+
+class LLMResponseCache(BaseCache):
+    """
+    LLM 响应缓存，作为 cache= 传给 ChatOpenAI / ChatTongyi / ChatGoogleGenerativeAI。
+    - 精确缓存：键为 sha256(llm_string + 规范化后的消息)，llm_string 由 LangChain 生成，
+      已包含提供方、模型、temperature 和 bind_tools 绑定的工具，结果持久化在 SQLite；
+    - 语义缓存（可选，传入 embed 时启用）：精确未命中时，在同一个 llm_string 下查找
+      消息文本余弦相似度不低于 threshold 的已缓存回答；
+    - stats() 返回精确 / 语义命中数、未命中数，以及命中所节省的原始调用耗时。
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        embed: Optional[Callable[[str], Sequence[float]]] = None,
+        threshold: float = 0.97,
+    ):
+        self.db_path = db_path
+        self.embed = embed
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._memory: Dict[str, Tuple[str, str, float, Optional[bytes]]] = {}
+        # llm_string -> (缓存键列表, 归一化后的向量矩阵)
+        self._semantic: Dict[str, Tuple[List[str], Optional[np.ndarray]]] = {}
+        # 未命中的键 -> (开始时间, prompt 的单位向量)，update 时据此记录这次调用的耗时，并复用向量而不再请求 embedding；
+        # 调用失败时 LangChain 不会调用 update，这些条目由 _expire_pending 按 PENDING_TTL / PENDING_LIMIT 清理
+        self._pending: Dict[str, Tuple[float, Optional[np.ndarray]]] = {}
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "latency_saved": 0.0}
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY, llm_string TEXT NOT NULL, value TEXT NOT NULL,
+                    latency REAL NOT NULL, embedding BLOB, created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    # ---------- 存储 ----------
+    def _read(self, key: str) -> Optional[Tuple[str, float]]:
+        if self._conn is None:
+            record = self._memory.get(key)
+            return (record[1], record[2]) if record else None
+        return self._conn.execute("SELECT value, latency FROM llm_responses WHERE key = ?", (key,)).fetchone()
+
+    def _write(self, key: str, llm_string: str, value: str, latency: float, embedding: Optional[bytes]):
+        if self._conn is None:
+            self._memory[key] = (llm_string, value, latency, embedding)
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_responses (key, llm_string, value, latency, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, llm_string, value, latency, embedding, time.time()),
+        )
+        self._conn.commit()
+
+    def _semantic_index(self, llm_string: str) -> Tuple[List[str], Optional[np.ndarray]]:
+        if llm_string not in self._semantic:
+            if self._conn is None:
+                rows = [(key, record[3]) for key, record in self._memory.items() if record[0] == llm_string and record[3]]
+            else:
+                rows = self._conn.execute(
+                    "SELECT key, embedding FROM llm_responses WHERE llm_string = ? AND embedding IS NOT NULL", (llm_string,)
+                ).fetchall()
+            vectors = np.array([array("f", blob) for _, blob in rows], dtype=np.float32) if rows else None
+            self._semantic[llm_string] = ([key for key, _ in rows], vectors)
+        return self._semantic[llm_string]
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        """
+        prompt 的单位向量。embedding 接口失败（限流、超时、超过输入长度上限等）时记录日志并返回 None，
+        缓存退化为只做精确匹配，不影响它所服务的模型调用。
+        """
+        try:
+            return self._unit(self.embed(prompt_text(prompt)))
+        except Exception as e:
+            logger.warning(f"embedding for the semantic LLM cache failed, falling back to exact matching: {e}")
+            return None
+
+    @staticmethod
+    def _encode(return_val: RETURN_VAL_TYPE) -> str:
+        return json.dumps(
+            [
+                {
+                    "text": generation.text,
+                    "message": message_to_dict(generation.message) if isinstance(generation, ChatGeneration) else None,
+                    "generation_info": generation.generation_info,
+                }
+                for generation in return_val
+            ],
+            ensure_ascii=False,
+            default=str,
+        )
+
+    @staticmethod
+    def _decode(value: str) -> Optional[RETURN_VAL_TYPE]:
+        try:
+            generations = []
+            for item in json.loads(value):
+                if item["message"] is not None:
+                    message = messages_from_dict([item["message"]])[0]
+                    generations.append(ChatGeneration(message=message, generation_info=item["generation_info"]))
+                else:
+                    generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+            return generations
+        except Exception as e:
+            logger.warning(f"failed to decode cached LLM response, ignoring it: {e}")
+            return None
+
+    # ---------- BaseCache ----------
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        with self._lock:
+            record = self._read(key)
+        kind = "exact_hits"
+        embedding = None
+        if record is None and self.embed is not None:
+            # 向量化可能要请求 embedding 接口，不在锁内进行
+            embedding = self._embed(prompt)
+            if embedding is not None:
+                record = self._semantic_lookup(embedding, llm_string)
+                kind = "semantic_hits"
+        result = self._decode(record[0]) if record is not None else None
+        with self._lock:
+            if result is None:
+                self._stats["misses"] += 1
+                now = time.perf_counter()
+                self._expire_pending(now)
+                self._pending[key] = (now, embedding)
+                return None
+            self._stats[kind] += 1
+            self._stats["latency_saved"] += record[1]
+        return result
+
+    def _semantic_lookup(self, embedding: np.ndarray, llm_string: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            keys, vectors = self._semantic_index(llm_string)
+            if not keys:
+                return None
+            similarities = vectors @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return self._read(keys[best])
+
+    def _expire_pending(self, now: float):
+        """清理失败调用留下的条目：先删过期的，仍超过 PENDING_LIMIT 时按插入顺序删最早的。调用方持有 self._lock。"""
+        if len(self._pending) < PENDING_LIMIT:
+            return
+        for key in [key for key, (started, _) in self._pending.items() if now - started > PENDING_TTL]:
+            del self._pending[key]
+        while len(self._pending) >= PENDING_LIMIT:
+            del self._pending[next(iter(self._pending))]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = self._encode(return_val)
+        with self._lock:
+            started, embedding = self._pending.pop(key, (None, None))
+        if embedding is None and self.embed is not None:
+            # 没有经过 lookup（或已过期）的写入才需要重新向量化
+            embedding = self._embed(prompt)
+        with self._lock:
+            latency = time.perf_counter() - started if started is not None else 0.0
+            self._write(key, llm_string, value, latency, embedding.tobytes() if embedding is not None else None)
+            if embedding is not None and llm_string in self._semantic:
+                keys, vectors = self._semantic[llm_string]
+                if key not in keys:
+                    vectors = embedding[None, :] if vectors is None else np.vstack([vectors, embedding[None, :]])
+                    self._semantic[llm_string] = (keys + [key], vectors)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._semantic.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_responses")
+                self._conn.commit()
+
+    # ---------- 统计 ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["exact_hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "latency_saved": 0.0}
+
+
+_shared_caches: Dict[Tuple[Optional[str], bool], LLMResponseCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def get_llm_cache(config: dict) -> Optional[LLMResponseCache]:
+    """
+    按配置返回进程内共享的 LLM 响应缓存，llm_cache_path 为 None 时只缓存在内存中，
+    llm_cache_enabled 为 False 时返回 None（即不缓存）。
+    """
+    if not config.get("llm_cache_enabled", True):
+        return None
+    db_path = config.get("llm_cache_path")
+    semantic = bool(config.get("llm_semantic_cache", False))
+    with _shared_caches_lock:
+        if (db_path, semantic) not in _shared_caches:
+            embed = None
+            if semantic:
+                from proposalAgent.agents.utils.memory import Embedder
+
+                embed = Embedder(config).get_embedding
+            _shared_caches[(db_path, semantic)] = LLMResponseCache(
+                db_path, embed=embed, threshold=config.get("llm_semantic_threshold", 0.97)
+            )
+        return _shared_caches[(db_path, semantic)]
@@ -0,0 +1,430 @@
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.outputs import LLMResult
+from langchain_core.rate_limiters import BaseRateLimiter
+from pydantic import PrivateAttr
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt
+
+from proposalAgent.utils.logger import get_logger
+
+logger = get_logger("rate_limiter")
+
+
+class TokenBucket:
+    """
+    令牌桶限流器：以 rate 个/秒的速度补充令牌，最多积累 capacity 个（允许的突发量）。
+    采用预约方式——取令牌时先扣减（余额可以为负），再按欠款休眠，因此等待者按到达顺序放行；
+    内部只用线程锁，不绑定事件循环，同一个实例可以同时给多个事件循环和工作线程使用。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """扣减令牌并返回需要等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, tokens: float = 1.0):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: float = 1.0):
+        """阻塞版本，供线程池中执行的同步请求使用。"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """余额足够时扣减并返回 True，否则不扣减直接返回 False。"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def adjust(self, tokens: float):
+        """按实际用量修正之前的预约：tokens 为正时追加扣减，为负时退还（不超过 capacity）。"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens - tokens)
+
+
+# ---------- LLM / embedding 调用的进程级限流 ----------
+_RETRYABLE_ERRORS = {
+    "RateLimitError", "APIConnectionError", "APITimeoutError", "InternalServerError",
+    "ResourceExhausted", "ServiceUnavailable", "TooManyRequests", "ServerError",
+    "TransportError", "ConnectError", "ReadTimeout", "RemoteProtocolError",
+}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for candidate in (getattr(exc, "status_code", None), getattr(exc, "code", None),
+                      getattr(getattr(exc, "response", None), "status_code", None)):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429、5xx 与连接类错误可以重试；其余错误（参数错误、鉴权失败等）直接抛出。"""
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in _RETRYABLE_ERRORS
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数（中文约一字一 token，英文约四个字符一 token），只用于 TPM 预约。"""
+    return max(1, len(text) // 2)
+
+
+class ProviderGovernor:
+    """
+    单个 (提供方, 模型) 的调用治理器，进程内所有调用方共用一个实例（见 get_governor）：
+    - RPM / TPM 两个令牌桶，按预计 token 数预约、调用结束后按实际用量修正；
+      两个桶都是预约式的，超出预算的调用按到达顺序排队放行；
+    - max_concurrency 限制同时在途的请求数；
+    - 429 / 5xx / 连接错误按带随机抖动的指数退避重试（full jitter，避免并发调用同时重试）；
+    - stats() 报告当前与最大排队深度、排队等待时间、重试和限流次数、累计 token。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float,
+        tpm: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        burst_seconds: float = 5.0,
+        default_tokens: int = 2000,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.default_tokens = default_tokens
+        self._requests = TokenBucket(rpm / 60, capacity=rpm / 60 * burst_seconds)
+        self._tokens = TokenBucket(tpm / 60, capacity=tpm / 60 * burst_seconds) if tpm else None
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "queue_depth": 0, "max_queue_depth": 0, "wait_time": 0.0, "max_wait": 0.0,
+            "retries": 0, "rate_limited": 0, "errors": 0, "tokens": 0,
+        }
+
+    # ---------- 统计 ----------
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+
+    def _record_wait(self, waited: float):
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["queue_depth"] -= 1
+            self._stats["wait_time"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+
+    def record_usage(self, tokens: int, estimated: Optional[int] = None):
+        """记录一次调用的实际 token 用量，并用它修正预约时的估计值。"""
+        self._count(tokens=tokens)
+        if self._tokens is not None:
+            self._tokens.adjust(tokens - (self.default_tokens if estimated is None else estimated))
+
+    def record_error(self, exc: BaseException):
+        self._count(errors=1, rate_limited=int(_status_code(exc) == 429 or type(exc).__name__ in ("RateLimitError", "ResourceExhausted")))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_wait"] = stats["wait_time"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+    # ---------- 预约 ----------
+    def _reserve(self, tokens: Optional[int]) -> float:
+        wait = self._requests._reserve(1)
+        if self._tokens is not None:
+            wait = max(wait, self._tokens._reserve(self.default_tokens if tokens is None else tokens))
+        return wait
+
+    async def aacquire(self, tokens: Optional[int] = None):
+        """只做 RPM / TPM 预约（不占并发名额），供无法包住整个调用的场景使用。"""
+        self._count(queue_depth=1)
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record_wait(wait)
+
+    def acquire_sync(self, tokens: Optional[int] = None):
+        self._count(queue_depth=1)
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        self._record_wait(wait)
+
+    def try_acquire(self) -> bool:
+        return self._requests.try_acquire(1)
+
+    def _get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if not self.max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    @asynccontextmanager
+    async def aslot(self, tokens: Optional[int] = None):
+        """占用一个并发名额并完成 RPM / TPM 预约，退出时释放名额。"""
+        semaphore = self._get_semaphore()
+        self._count(queue_depth=1)
+        started = time.perf_counter()
+        acquired = admitted = False
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+                acquired = True
+            wait = self._reserve(tokens)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._record_wait(time.perf_counter() - started)
+            admitted = True
+            yield
+        finally:
+            if not admitted:
+                # 排队期间被取消
+                self._count(queue_depth=-1)
+            if acquired:
+                semaphore.release()
+
+    @contextmanager
+    def slot(self, tokens: Optional[int] = None):
+        """aslot 的同步版本，并发名额在线程之间共享。"""
+        self._count(queue_depth=1)
+        started = time.perf_counter()
+        acquired = admitted = False
+        try:
+            if self._thread_semaphore is not None:
+                self._thread_semaphore.acquire()
+                acquired = True
+            wait = self._reserve(tokens)
+            if wait > 0:
+                time.sleep(wait)
+            self._record_wait(time.perf_counter() - started)
+            admitted = True
+            yield
+        finally:
+            if not admitted:
+                self._count(queue_depth=-1)
+            if acquired:
+                self._thread_semaphore.release()
+
+    # ---------- 带重试的调用 ----------
+    def _backoff(self, retry_state) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** retry_state.attempt_number))
+
+    def _before_sleep(self, retry_state):
+        exc = retry_state.outcome.exception()
+        self._count(retries=1)
+        self.record_error(exc)
+        logger.warning(f"{self.name}: retry {retry_state.attempt_number}/{self.max_retries - 1} after {type(exc).__name__}: {exc}")
+
+    def _retrying_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            retry=retry_if_exception(is_retryable),
+            wait=self._backoff,
+            stop=stop_after_attempt(self.max_retries),
+            before_sleep=self._before_sleep,
+            reraise=True,
+        )
+
+    async def acall(
+        self,
+        fn: Callable[..., Awaitable[Any]],
+        *args,
+        estimated_tokens: Optional[int] = None,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        在限流与重试下执行 await fn(*args, **kwargs)。
+        usage(result) 返回实际 token 数时用于修正 TPM 预约。
+        """
+        async for attempt in AsyncRetrying(**self._retrying_kwargs()):
+            with attempt:
+                async with self.aslot(estimated_tokens):
+                    result = await fn(*args, **kwargs)
+        self._record_result_usage(result, usage, estimated_tokens)
+        return result
+
+    def call(self, fn: Callable[..., Any], *args, estimated_tokens: Optional[int] = None,
+             usage: Optional[Callable[[Any], Optional[int]]] = None, **kwargs) -> Any:
+        """acall 的同步版本。"""
+        for attempt in Retrying(**self._retrying_kwargs()):
+            with attempt:
+                with self.slot(estimated_tokens):
+                    result = fn(*args, **kwargs)
+        self._record_result_usage(result, usage, estimated_tokens)
+        return result
+
+    def _record_result_usage(self, result, usage, estimated_tokens):
+        tokens = usage(result) if usage is not None else None
+        if tokens is not None:
+            self.record_usage(tokens, estimated_tokens)
+
+    # ---------- LangChain 适配 ----------
+    def langchain_rate_limiter(self) -> "GovernorRateLimiter":
+        return GovernorRateLimiter(self)
+
+    def token_callback(self) -> "GovernorTokenCallback":
+        return GovernorTokenCallback(self)
+
+
+class GovernorRateLimiter(BaseRateLimiter):
+    """
+    作为 rate_limiter= 传给 LangChain 模型。BaseRateLimiter 只在请求开始前调用，
+    没有结束回调，因此这里只做 RPM / TPM 预约，不占并发名额，也不重试；
+    聊天模型应使用 create_governed_chat_model，整个调用都在治理器的并发名额和重试策略之下。
+    """
+
+    def __init__(self, governor: ProviderGovernor):
+        self.governor = governor
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.governor.try_acquire()
+        self.governor.acquire_sync()
+        return True
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        if not blocking:
+            return self.governor.try_acquire()
+        await self.governor.aacquire()
+        return True
+
+
+class GovernorTokenCallback(BaseCallbackHandler):
+    """把 LangChain 调用的实际 token 用量与错误回报给治理器。"""
+
+    def __init__(self, governor: ProviderGovernor):
+        self.governor = governor
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        tokens = usage.get("total_tokens")
+        if tokens is None:
+            tokens = sum(
+                (getattr(generation, "message", None) and (generation.message.usage_metadata or {}).get("total_tokens")) or 0
+                for generations in response.generations
+                for generation in generations
+            )
+        if tokens:
+            self.governor.record_usage(int(tokens))
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.governor.record_error(error)
+
+
+_governed_classes: Dict[type, type] = {}
+_governed_classes_lock = threading.Lock()
+
+
+def _governed_class(cls: type) -> type:
+    """
+    cls 的子类：_generate / _agenerate 通过治理器的 call / acall 执行（并发名额、RPM / TPM 预约、full jitter 重试），
+    流式调用只占并发名额、不重试（已经输出的片段无法撤回）。
+    缓存查找在 _agenerate 之前完成，命中缓存的调用不占用限额；bind_tools / with_structured_output 绑定的仍是同一个实例。
+    """
+    with _governed_classes_lock:
+        if cls in _governed_classes:
+            return _governed_classes[cls]
+
+        class GovernedChatModel(cls):
+            _governor: Optional[ProviderGovernor] = PrivateAttr(default=None)
+
+            def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+                return self._governor.call(super()._generate, messages, stop, run_manager, **kwargs)
+
+            async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+                return await self._governor.acall(super()._agenerate, messages, stop, run_manager, **kwargs)
+
+            def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+                with self._governor.slot():
+                    yield from super()._stream(messages, stop, run_manager, **kwargs)
+
+            async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+                async with self._governor.aslot():
+                    async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                        yield chunk
+
+        GovernedChatModel.__name__ = GovernedChatModel.__qualname__ = f"Governed{cls.__name__}"
+        _governed_classes[cls] = GovernedChatModel
+        return GovernedChatModel
+
+
+def create_governed_chat_model(cls: type, governor: ProviderGovernor, **kwargs) -> BaseChatModel:
+    """
+    构造聊天模型 cls(**kwargs)，其每次请求都经过 governor。重试由治理器负责，
+    因此模型客户端自身的 max_retries 设为 0（调用方显式传入时以调用方为准），避免两层重试叠加。
+    实际 token 用量仍通过 callbacks=[governor.token_callback()] 回填。
+    """
+    if "max_retries" in getattr(cls, "model_fields", {}):
+        kwargs.setdefault("max_retries", 0)
+    model = _governed_class(cls)(**kwargs)
+    model._governor = governor
+    return model
+
+
+_governors: Dict[str, ProviderGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(provider: str, model: str, config: Optional[dict] = None) -> ProviderGovernor:
+    """
+    返回 (提供方, 模型) 对应的进程级治理器。限额取自配置 rate_limits，
+    依次查找 "提供方:模型"、"提供方"、"default" 三个键。
+    """
+    provider = provider.lower()
+    name = f"{provider}:{model}"
+    with _governors_lock:
+        if name not in _governors:
+            if config is None:
+                from proposalAgent.model_config import TONGYI_CONFIG as config
+            limits = config.get("rate_limits") or {}
+            settings = limits.get(name) or limits.get(provider) or limits.get("default") or {"rpm": 60}
+            _governors[name] = ProviderGovernor(name, **settings)
+        return _governors[name]
+
+
+def governor_stats() -> Dict[str, Dict[str, Any]]:
+    """所有治理器的统计，键为 "提供方:模型"。"""
+    with _governors_lock:
+        governors = list(_governors.values())
+    return {governor.name: governor.stats() for governor in governors}
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from proposalAgent.agents.utils.agent_states import REPORT_RESET, merge_report
+
+
+def test_merge_report_keeps_existing_value_on_empty_write():
+    assert merge_report("旧报告", None) == "旧报告"
+    assert merge_report("旧报告", "") == "旧报告"
+    assert merge_report(["a"], []) == ["a"]
+    assert merge_report("旧报告", "新报告") == "新报告"
+
+
+def test_merge_report_reset_clears_field():
+    assert merge_report("旧报告", REPORT_RESET) == ""
+    assert merge_report(["a"], REPORT_RESET) == []
+    # 清空后的空值写入保持清空
+    assert merge_report(merge_report("旧报告", REPORT_RESET), None) == ""
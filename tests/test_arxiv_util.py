@@ -0,0 +1,81 @@
+import pathlib
+
+import pytest
+
+from proposalAgent.tools.academic_analysis.arxiv_util import (
+    ArxivStore,
+    Bm25Index,
+    get_arxiv_local_index,
+    parse_atom,
+    tokenize,
+)
+
+FIXTURE = pathlib.Path(__file__).resolve().parents[1] / "benchmarks" / "fixtures" / "arxiv_query.atom.xml"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArxivStore(str(tmp_path / "arxiv.sqlite"))
+    store.load_atom(str(FIXTURE))
+    return store
+
+
+def test_parse_atom_fixture():
+    total, papers = parse_atom(FIXTURE.read_bytes())
+    assert total == 8
+    assert len(papers) == 8
+    first = papers[0]
+    assert first["id"] == "2401.90001"
+    assert first["title"] == "Graph Neural Networks for Automated Research Proposal Review"
+    assert first["abstract"]
+
+
+def test_tokenize_mixes_words_and_cjk_bigrams():
+    tokens = tokenize("BM25 baseline 科研项目")
+    assert "bm25" in tokens and "baseline" in tokens
+    assert "科研" in tokens and "研项" in tokens
+
+
+def test_bm25_ranks_matching_document_first():
+    index = Bm25Index(["graph neural network review", "protein diffusion model", "graph pagerank citation"])
+    indices, scores = index.search("graph review", 3)
+    # 没有命中任何词的文档不返回
+    assert list(indices) == [0, 2]
+    assert scores[0] > scores[1] > 0
+
+
+def test_local_search_on_fixture(store):
+    results = get_arxiv_local_index(store).search("proposal review graph neural network", 3)
+    assert results[0]["id"] == "2401.90001"
+    chinese = get_arxiv_local_index(store).search("申请书评审", 1)
+    assert chinese[0]["title"] == "基于大语言模型的科研项目申请书评审"
+
+
+def test_local_index_rebuilt_only_when_store_changes(store):
+    index = get_arxiv_local_index(store)
+    # 内容未变化的重复写入不使索引失效
+    store.load_atom(str(FIXTURE))
+    assert get_arxiv_local_index(store) is index
+
+    store.upsert([{"id": "2401.99999", "title": "Quantum annealing schedules", "abstract": "annealing", "authors": []}])
+    rebuilt = get_arxiv_local_index(store)
+    assert rebuilt is not index
+    assert rebuilt.search("quantum annealing", 1)[0]["id"] == "2401.99999"
+
+
+def test_async_index_serves_stale_index_while_rebuilding(store):
+    import asyncio
+
+    from proposalAgent.tools.academic_analysis.arxiv_util import aget_arxiv_local_index
+
+    async def run():
+        index = await aget_arxiv_local_index(store)
+        store.upsert([{"id": "2401.99999", "title": "Quantum annealing schedules", "abstract": "annealing", "authors": []}])
+        # 不要求新论文时先返回旧索引，重建在后台线程中进行
+        assert await aget_arxiv_local_index(store) is index
+        rebuilt = await aget_arxiv_local_index(store, min_generation=store.generation)
+        assert rebuilt is not index
+        assert rebuilt.search("quantum annealing", 1)[0]["id"] == "2401.99999"
+        assert await aget_arxiv_local_index(store) is rebuilt
+
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+from proposalAgent.utils.cache import ResponseCache, make_key
+
+
+def test_make_key_ignores_param_order():
+    assert make_key("serpapi", {"q": "gnn", "num": 10}) == make_key("serpapi", {"num": 10, "q": "gnn"})
+    assert make_key("serpapi", {"q": "gnn"}) != make_key("openalex", {"q": "gnn"})
+
+
+def test_response_cache_persists_and_expires(tmp_path):
+    db_path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(db_path)
+    cache.set("forever", {"papers": [1, 2]})
+    cache.set("expired", "stale", ttl=-1)
+    assert ResponseCache(db_path).get("forever") == {"papers": [1, 2]}
+    assert cache.get("expired", "missing") == "missing"
+    cache.set("expired", "stale", ttl=-1)
+    assert cache.purge_expired() == 1
+
+
+def test_get_or_fetch_coalesces_concurrent_requests():
+    cache = ResponseCache()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "value"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("key", fetch))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 4
+    assert len(calls) == 1
+
+
+def test_aget_or_fetch_does_not_cache_exceptions():
+    cache = ResponseCache()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota exceeded")
+
+    async def succeeding():
+        return 42
+
+    async def run():
+        results = await asyncio.gather(*[cache.aget_or_fetch("key", failing) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(calls) == 1
+        return await cache.aget_or_fetch("key", succeeding)
+
+    assert asyncio.run(run()) == 42
+    assert cache.get("key") == 42
+
+
+def test_cancelled_owner_does_not_cancel_coalesced_waiters():
+    cache = ResponseCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def run():
+        owner = asyncio.ensure_future(asyncio.wait_for(cache.aget_or_fetch("key", fetch), timeout=0.01))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.aget_or_fetch("key", fetch))
+        results = await asyncio.gather(owner, waiter, return_exceptions=True)
+        assert isinstance(results[0], asyncio.TimeoutError)
+        return results[1]
+
+    assert asyncio.run(run()) == "value"
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from proposalAgent.tools.academic_analysis.citation_graph import CitationGraphBuilder
+
+
+@pytest.fixture
+def graph():
+    builder = CitationGraphBuilder()
+    a = builder.add_paper("Paper A", year=2020, authors=["Alice", "Bob"], citations=10, field="cs")
+    b = builder.add_paper("Paper B", year=2020, authors=["Alice", "Carol"], citations=30, field="cs")
+    c = builder.add_paper("Paper C", year=2020, authors=["Bob", "Carol"], citations=5, field="bio")
+    d = builder.add_paper("Paper D", year=2021, authors=["Dave"], field="cs")
+    # D 引用 A、B，A 引用 B
+    builder.add_citation(d, a)
+    builder.add_citation(d, b)
+    builder.add_citation(a, b)
+    builder.add_citation(c, c)  # 自引被忽略
+    return builder.build()
+
+
+def test_duplicate_papers_are_merged():
+    builder = CitationGraphBuilder()
+    first = builder.add_paper("Graph  Neural-Networks", authors=["Alice"])
+    second = builder.add_paper("graph neural networks", year=2019, authors=["Bob"], citations=3)
+    graph = builder.build()
+    assert first == second
+    assert len(graph) == 1
+    assert graph.years[0] == 2019 and graph.citations[0] == 3
+
+
+def test_pagerank_sums_to_one_and_ranks_most_cited_first(graph):
+    rank = graph.pagerank()
+    assert rank.sum() == pytest.approx(1.0)
+    assert graph.num_edges == 3
+    assert int(np.argmax(rank)) == graph.keys.index("title:paperb")
+
+
+def test_pagerank_of_graph_without_edges_is_uniform():
+    builder = CitationGraphBuilder()
+    for title in ("x", "y", "z", "w"):
+        builder.add_paper(title)
+    np.testing.assert_allclose(builder.build().pagerank(), np.full(4, 0.25))
+
+
+def test_field_normalized_citations_use_field_and_year_groups(graph):
+    fnci = graph.field_normalized_citations()
+    # cs/2020 组：A=10、B=30，平均 20
+    assert fnci[0] == pytest.approx(0.5)
+    assert fnci[1] == pytest.approx(1.5)
+    # 唯一成员的组归一化后为 1；D 没有外部被引，用图内入度 0
+    assert fnci[2] == pytest.approx(1.0)
+    assert fnci[3] == 0.0
+
+
+def test_coauthorship_counts_shared_papers_and_overlap(graph):
+    alice, bob, carol = (graph.author_names.index(name) for name in ("alice", "bob", "carol"))
+    shared, overlap = graph.coauthorship([alice, bob, carol])
+    np.testing.assert_array_equal(shared, [[2, 1, 1], [1, 2, 1], [1, 1, 2]])
+    # 去掉团队成员本身后三人没有其他合作者
+    np.testing.assert_array_equal(overlap, np.zeros((3, 3)))
+
+
+def test_metrics_marks_unknown_members(graph):
+    metrics = graph.metrics(["Alice", "Nobody"])
+    summary = metrics.to_dict()
+    assert summary["authors"]["Alice"]["papers"] == 2
+    assert summary["authors"]["Nobody"]["papers"] == 0
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from proposalAgent.agents.stage1.citation_metrics import parse_team_members
+
+
+def test_parse_team_members_dedupes_and_keeps_order():
+    text = '成员如下：\n["张三", "李四", " 张三 ", "https://scholar.google.com/citations?user=abcdefGHIJ12"]'
+    assert parse_team_members(text) == ["张三", "李四", "https://scholar.google.com/citations?user=abcdefGHIJ12"]
+
+
+def test_parse_team_members_returns_empty_on_bad_output():
+    assert parse_team_members("没有找到团队成员") == []
+    assert parse_team_members("[张三, 李四]") == []
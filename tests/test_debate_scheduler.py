@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("chromadb")
+
+from proposalAgent.graphs.debate_scheduler import DebateScheduler
+
+
+class _SlowGraph:
+    def __init__(self, running):
+        self.running = running
+
+    async def ainvoke(self, state):
+        self.running.append(state["current_discipline"])
+        await asyncio.sleep(0.05)
+        return {"discipline": state["current_discipline"]}
+
+
+def test_debates_waiting_on_a_provider_do_not_hold_global_slots():
+    scheduler = DebateScheduler(max_concurrency=2, provider_limits={"slow": 1})
+
+    async def main():
+        running = []
+        graph = _SlowGraph(running)
+        slow = [
+            asyncio.ensure_future(scheduler._run_debate("d", graph, {"current_discipline": f"slow-{i}"}, "slow"))
+            for i in range(3)
+        ]
+        fast = asyncio.ensure_future(scheduler._run_debate("d", graph, {"current_discipline": "fast"}, "fast"))
+        await asyncio.sleep(0.01)
+        # 一场 slow 正在执行，其余两场排在 provider 的队里，不占全局名额，fast 可以立即开始
+        started = list(running)
+        await asyncio.gather(*slow, fast)
+        return started
+
+    assert sorted(asyncio.run(main())) == ["fast", "slow-0"]
@@ -0,0 +1,28 @@
+import numpy as np
+
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+
+
+def test_search_returns_exact_cosine_top_k():
+    index = DisciplineIndex(["数学", "物理学", "化学"], [[1, 0], [0, 1], [1, 1]])
+    indices, scores = index.search([[2, 0.1]], k=2)
+    assert indices.tolist() == [[0, 2]]
+    assert scores[0, 0] > scores[0, 1]
+
+
+def test_query_matches_chroma_result_shape_and_ids(tmp_path):
+    index = DisciplineIndex(
+        ["数学", "物理学"], [[1, 0], [0, 1]], ids=["key-math", "key-physics"], metadatas=[{"level": 2}, None]
+    )
+    index.save(str(tmp_path))
+    result = DisciplineIndex.load(str(tmp_path)).query([[0.1, 1]], n_results=2)
+    assert result["ids"] == [["key-physics", "key-math"]]
+    assert result["documents"] == [["物理学", "数学"]]
+    assert result["metadatas"] == [[None, {"level": 2}]]
+    np.testing.assert_allclose(result["distances"][0][0], 1 - 1 / np.sqrt(1.01), atol=1e-6)
+
+
+def test_index_saved_without_records_uses_names_as_ids(tmp_path):
+    DisciplineIndex(["数学"], [[1, 0]]).save(str(tmp_path))
+    (tmp_path / "discipline_records.json").unlink()
+    assert DisciplineIndex.load(str(tmp_path)).query([[1, 0]], n_results=1)["ids"] == [["数学"]]
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from proposalAgent.tools.feasibility_analysis.discipline_index import DisciplineIndex
+from proposalAgent.tools.feasibility_analysis.discipline_tree import DisciplineTree, InterdisciplinarityScorer
+
+TREE = [
+    {"工学": [{"计算机科学": ["人工智能", "软件工程"]}, {"电子信息": []}]},
+    {"理学": [{"数学": []}, {"物理学": []}]},
+]
+
+
+@pytest.fixture
+def tree():
+    return DisciplineTree.from_json(TREE)
+
+
+def test_structure(tree):
+    assert tree.second_level_names == ["计算机科学", "电子信息", "数学", "物理学"]
+    assert tree.depth[tree.node_of("人工智能")] == 3
+    assert tree.names[tree.ancestor_at([tree.node_of("人工智能")], 1)[0]] == "工学"
+
+
+def test_lca_and_distance(tree):
+    ai, se, ee, math = (tree.node_of(name) for name in ("人工智能", "软件工程", "电子信息", "数学"))
+    assert tree.names[int(tree.lca(ai, se))] == "计算机科学"
+    assert tree.names[int(tree.lca(ai, ee))] == "工学"
+    assert tree.names[int(tree.lca(ai, math))] == "<root>"
+    assert tree.distance(ai, se) == 2
+    assert tree.distance(ai, math) == 5
+    # 数组批量查询与标量一致
+    np.testing.assert_array_equal(tree.distance([ai, ai, ee], [se, math, ee]), [2, 5, 0])
+
+
+def test_lca_matches_naive_parent_walk(tree):
+    def naive(u, v):
+        ancestors = set()
+        while u != -1:
+            ancestors.add(u)
+            u = tree.parent[u]
+        while v not in ancestors:
+            v = tree.parent[v]
+        return v
+
+    nodes = np.arange(len(tree.names))
+    u, v = np.meshgrid(nodes, nodes, indexing="ij")
+    expected = np.vectorize(naive)(u, v)
+    np.testing.assert_array_equal(tree.lca(u, v), expected)
+
+
+def test_diameter_equals_max_pairwise_distance(tree):
+    nodes = [tree.node_of(name) for name in ("人工智能", "电子信息", "物理学")]
+    assert tree.diameter(nodes) == tree.pairwise_distances(nodes).max() == 5
+    assert tree.diameter(nodes[:1]) == 0
+
+
+def test_scorer_ranks_cross_field_queries_higher(tree):
+    names = tree.second_level_names
+    index = DisciplineIndex(names, np.eye(len(names)))
+    scorer = InterdisciplinarityScorer(tree, index)
+    same_field = scorer.score(np.eye(4)[[0, 1]], k=1)
+    cross_field = scorer.score(np.eye(4)[[0, 3]], k=1)
+    assert same_field["first_level_disciplines"] == ["工学"]
+    assert cross_field["first_level_disciplines"] == ["工学", "理学"]
+    assert 0 < same_field["score"] < cross_field["score"] <= 1
+    assert scorer.score(np.zeros((1, 4)) + 1e-6, k=1, min_similarity=0.9)["score"] == 0.0
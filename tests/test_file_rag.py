@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("google.genai")
+pytest.importorskip("aiohttp")
+
+from proposalAgent.tools.file_rag import chunk_pages, pages_from_structure
+from proposalAgent.tools.structure_util import SECTION_SEPARATOR
+
+
+def test_pages_from_structure_assigns_text_before_each_tag():
+    structure = f"研究目标 [P2] 技术路线 [P3-4] 补充说明{SECTION_SEPARATOR}团队介绍"
+    assert [(page, text.strip()) for page, text in pages_from_structure(structure)] == [
+        (2, "研究目标"),
+        (3, "技术路线"),
+        (3, "补充说明"),
+        (None, "团队介绍"),
+    ]
+
+
+def test_chunk_pages_respects_size_overlap_and_pages():
+    text = "\n\n".join(f"paragraph {i} " + "x" * 40 for i in range(6))
+    chunks = chunk_pages([(1, text), (2, "short page")], chunk_size=120, overlap=20)
+    assert all(len(chunk.text) <= 120 + 20 + 1 for chunk in chunks)
+    assert [chunk.chunk_id for chunk in chunks] == list(range(len(chunks)))
+    # 片段不跨页，新片段以上一片段末尾开头
+    assert chunks[-1].page == 2 and chunks[-1].text == "short page"
+    page_one = [chunk for chunk in chunks if chunk.page == 1]
+    assert len(page_one) > 1
+    assert page_one[1].text.startswith(page_one[0].text[-20:])
+
+
+class _KeywordEmbedder:
+    """按关键词出现与否生成向量，离线测试检索用。"""
+
+    KEYWORDS = ["预算", "团队", "目标"]
+
+    def __init__(self, config=None):
+        pass
+
+    def _embed(self, text):
+        return [float(word in text) for word in self.KEYWORDS] + [0.1]
+
+    def get_embedding(self, text):
+        return self._embed(text)
+
+    async def aget_embeddings(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+def test_search_proposal_tool_reads_the_proposal_from_graph_state(monkeypatch):
+    import asyncio
+
+    from langchain_core.messages import AIMessage
+    from langgraph.graph import START, MessagesState, StateGraph
+    from langgraph.prebuilt import ToolNode
+
+    from proposalAgent.tools import file_rag
+
+    class State(MessagesState):
+        filepath: str
+        research_structure: str
+
+    monkeypatch.setattr(file_rag, "Embedder", _KeywordEmbedder)
+    structure = f"研究目标是构建评审系统 [P2]{SECTION_SEPARATOR}项目预算共 50 万元 [P7]"
+    workflow = StateGraph(State)
+    workflow.add_node("tools", ToolNode([file_rag.create_state_proposal_search_tool({"rag_top_k": 1})]))
+    workflow.add_edge(START, "tools")
+    state = {
+        "filepath": "",
+        "research_structure": structure,
+        "messages": [AIMessage("", tool_calls=[{"name": "search_proposal", "args": {"question": "预算是多少"}, "id": "call-1"}])],
+    }
+    try:
+        result = asyncio.run(workflow.compile().ainvoke(state))
+    finally:
+        file_rag.release_proposal_index(research_structure=structure)
+    assert result["messages"][-1].content.startswith("[P7] 项目预算")
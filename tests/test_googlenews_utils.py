@@ -0,0 +1,31 @@
+import asyncio
+from datetime import date
+
+from proposalAgent.model_config import TONGYI_CONFIG
+from proposalAgent.tools import googlenews_utils
+
+
+def test_failed_window_keeps_fetched_items_and_stays_missing(tmp_path, monkeypatch):
+    calls = []
+    titles = {1: "Graph review benchmark released", 2: "Funding agency adopts AI screening", 3: "Protein model wins award", 4: "University opens robotics lab"}
+
+    async def crawl_window(query, start, end, queue, max_pages, strict=False):
+        calls.append((start.date(), end.date()))
+        day = start.strftime("%Y-%m-%d")
+        await queue.put([{"title": titles[start.day], "link": f"https://news/{day}", "published": day}])
+        if start.day == 3:
+            raise RuntimeError("HTTP 503")
+
+    monkeypatch.setattr(googlenews_utils, "_crawl_window", crawl_window)
+    monkeypatch.setitem(TONGYI_CONFIG, "news_cache_path", str(tmp_path / "news.sqlite"))
+
+    items = asyncio.run(googlenews_utils.agetNewsData("graph review", "2024-01-01", "2024-01-04", slices=4))
+    # 失败窗口（1 月 3 日）已抓到的新闻也一并返回
+    assert sorted(item["link"] for item in items) == [f"https://news/2024-01-0{day}" for day in range(1, 5)]
+
+    cache = googlenews_utils.get_news_cache(str(tmp_path / "news.sqlite"))
+    assert cache.missing_ranges("graph review", "2024-01-01", "2024-01-04") == [(date(2024, 1, 3), date(2024, 1, 3))]
+
+    calls.clear()
+    asyncio.run(googlenews_utils.agetNewsData("graph review", "2024-01-01", "2024-01-04", slices=4))
+    assert calls == [(date(2024, 1, 3), date(2024, 1, 3))]
@@ -0,0 +1,44 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from proposalAgent.utils.llm_cache import LLMResponseCache
+
+
+def test_llm_cache_exact_hit_skips_model_call():
+    cache = LLMResponseCache()
+    model = FakeListChatModel(responses=["第一次回答", "不应被调用"], cache=cache)
+    assert model.invoke("评审这份申请书").content == "第一次回答"
+    assert model.invoke("评审这份申请书").content == "第一次回答"
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["exact_hits"] == 1
+
+
+def test_llm_cache_semantic_hit_embeds_each_prompt_once():
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return [1.0, 0.0] if "申请书" in text else [0.0, 1.0]
+
+    cache = LLMResponseCache(embed=embed, threshold=0.9)
+    model = FakeListChatModel(responses=["评审意见", "天气晴"], cache=cache)
+    assert model.invoke("请评审申请书").content == "评审意见"
+    # 未命中后的 update 复用 lookup 时计算的向量
+    assert len(embedded) == 1
+    assert model.invoke("请再评审一次申请书").content == "评审意见"
+    assert model.invoke("今天天气如何").content == "天气晴"
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1 and stats["misses"] == 2
+    assert len(embedded) == 3
+
+
+def test_llm_cache_embedding_failure_degrades_to_exact_matching():
+    def embed(text):
+        raise RuntimeError("input too long for the embedding model")
+
+    cache = LLMResponseCache(embed=embed)
+    model = FakeListChatModel(responses=["评审意见", "第二次回答"], cache=cache)
+    assert model.invoke("请评审申请书").content == "评审意见"
+    assert model.invoke("请评审申请书").content == "评审意见"
+    assert model.invoke("另一个问题").content == "第二次回答"
+    stats = cache.stats()
+    assert stats["exact_hits"] == 1 and stats["misses"] == 2 and stats["semantic_hits"] == 0
@@ -0,0 +1,24 @@
+from datetime import date
+
+from proposalAgent.tools.news_cache import NewsCache
+
+
+def test_missing_ranges_skip_covered_days(tmp_path):
+    cache = NewsCache(str(tmp_path / "news.sqlite"))
+    today = date(2024, 3, 20)
+    assert cache.missing_ranges("AI", "2024-03-01", "2024-03-10") == [(date(2024, 3, 1), date(2024, 3, 10))]
+
+    cache.store("AI", "2024-03-04", "2024-03-06", [{"link": "a", "published": "2024-03-05"}], today=today)
+    # 查询按规范化后的文本匹配
+    assert cache.missing_ranges("  ai ", "2024-03-01", "2024-03-10") == [
+        (date(2024, 3, 1), date(2024, 3, 3)),
+        (date(2024, 3, 7), date(2024, 3, 10)),
+    ]
+    assert cache.load("AI", "2024-03-01", "2024-03-10") == [{"link": "a", "published": "2024-03-05"}]
+
+
+def test_today_is_not_marked_covered(tmp_path):
+    cache = NewsCache(str(tmp_path / "news.sqlite"))
+    today = date(2024, 3, 20)
+    cache.store("AI", "03/18/2024", "03/20/2024", [], today=today)
+    assert cache.missing_ranges("AI", "2024-03-18", "2024-03-20") == [(date(2024, 3, 20), date(2024, 3, 20))]
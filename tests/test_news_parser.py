@@ -0,0 +1,16 @@
+from proposalAgent.tools.news_parser import NearDuplicateFilter
+
+
+def test_near_duplicate_filter_drops_reworded_copies():
+    items = [
+        {"title": "Researchers release a new graph neural network benchmark", "snippet": "The benchmark covers 40 datasets.", "link": "a"},
+        {"title": "Researchers release a new graph neural network benchmark!", "snippet": "The benchmark covers 40 datasets", "link": "b"},
+        {"title": "Protein folding model wins award", "snippet": "A diffusion model for protein structure.", "link": "c"},
+        {"title": "Something else entirely", "snippet": "", "link": "a"},
+    ]
+    assert [item["link"] for item in NearDuplicateFilter().filter(items)] == ["a", "c"]
+
+
+def test_near_duplicate_filter_keeps_short_items_with_distinct_links():
+    items = [{"title": "AI", "link": "x"}, {"title": "AI", "link": "y"}, {"title": "", "link": "x"}]
+    assert [item["link"] for item in NearDuplicateFilter().filter(items)] == ["x", "y"]
@@ -0,0 +1,18 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from proposalAgent.tools.academic_analysis import wos_util
+
+
+def test_missing_api_key_fails_clearly(monkeypatch):
+    monkeypatch.delenv("WOS_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="WOS_API_KEY"):
+        asyncio.run(wos_util.acitation_counts(["10.1000/xyz"]))
+
+
+def test_api_key_is_read_from_environment(monkeypatch):
+    monkeypatch.setenv("WOS_API_KEY", "test-key")
+    assert wos_util.wos_api_key() == "test-key"